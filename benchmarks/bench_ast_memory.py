@@ -0,0 +1,99 @@
+"""
+Benchmark: peak RSS, retained AST size and parse time for a generated
+program of about 50k lines.
+
+Each measurement runs in a fresh interpreter so peak RSS is not inflated by
+earlier runs.
+
+    python benchmarks/bench_ast_memory.py [LINES]
+"""
+
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from bench_util import repo_path  # noqa: F401  (sets up sys.path)
+
+LINES_PER_FUNCTION = 16
+
+
+def program_source(lines: int) -> str:
+    """About `lines` lines of functions with typical statements"""
+    parts = []
+    for i in range(max(1, lines // LINES_PER_FUNCTION)):
+        parts.append(
+            f"function f{i}:\n"
+            f"  inputs:\n"
+            f"    a: Integer\n"
+            f"    b: Integer\n"
+            f"  outputs:\n"
+            f"    r: Integer\n"
+            f"  implementation: {{\n"
+            f"    x = a * {i} + b\n"
+            f"    y = str_concat(\"v\", int_to_str(x))\n"
+            f"    while x > 0: {{\n"
+            f"      x = x - 1\n"
+            f"    }}\n"
+            f"    if a < b and x == 0: {{\n"
+            f"      return f{i}(a - 1, b) + len(y)\n"
+            f"    }}\n"
+            f"    return x\n"
+            f"  }}\n"
+        )
+    return "".join(parts)
+
+
+def max_rss_mb() -> float:
+    """Peak resident set size of this process in MB (ru_maxrss is KB on Linux)"""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 if sys.platform != "darwin" else rss / 1e6
+
+
+def child(path: str):
+    """Lex and parse path, print peak RSS, retained AST size and best parse time"""
+    from parser import parse_file
+
+    seconds = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        program = parse_file(path)
+        seconds = min(seconds, time.perf_counter() - start)
+        del program
+    rss = max_rss_mb()
+
+    tracemalloc.start()
+    program = parse_file(path)
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{rss:.1f} {retained / 1e6:.1f} {seconds:.3f} {len(program.declarations)}")
+
+
+def main():
+    if len(sys.argv) > 2 and sys.argv[1] == "--child":
+        child(sys.argv[2])
+        return
+
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    fd, path = tempfile.mkstemp(suffix=".one")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(program_source(lines))
+
+        output = subprocess.check_output([sys.executable, os.path.abspath(__file__), "--child", path],
+                                         universal_newlines=True)
+        rss, retained, seconds, functions = output.split()
+        print(f"{lines} lines, {functions} functions")
+        print(f"  peak RSS      {float(rss):8.1f} MB")
+        print(f"  retained AST  {float(retained):8.1f} MB")
+        print(f"  parse time    {float(seconds):8.2f} s")
+    finally:
+        os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Benchmark: code generation time for functions with many branches.
+
+Each generated function has N sequential if/else statements (two labels
+each). With per-label fixup lists, codegen time per branch should stay
+flat as N grows from 10k to 100k.
+
+    python benchmarks/bench_codegen_labels.py [N ...]
+"""
+
+import sys
+import time
+
+from bench_util import repo_path  # noqa: F401  (sets up sys.path)
+
+from lexer import lex_string
+from parser import Parser
+from codegen import generate_bytecode
+
+
+def branchy_source(branches: int) -> str:
+    """A function made of `branches` if/else statements"""
+    lines = [
+        "function branchy:",
+        "  inputs:",
+        "    x: Integer",
+        "  outputs:",
+        "    r: Integer",
+        "  implementation: {",
+        "    r = 0",
+    ]
+    for i in range(branches):
+        lines.append(f"    if x == {i}: {{")
+        lines.append(f"      r = r + {i}")
+        lines.append("    } else: {")
+        lines.append("      r = r - 1")
+        lines.append("    }")
+    lines.append("    return r")
+    lines.append("  }")
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10000, 25000, 50000, 100000]
+
+    print(f"{'branches':>10}{'instructions':>14}{'codegen':>12}{'per branch':>14}")
+    for branches in sizes:
+        program = Parser(lex_string(branchy_source(branches))).parse()
+
+        start = time.perf_counter()
+        module = generate_bytecode(program)
+        elapsed = time.perf_counter() - start
+
+        count = len(module.functions["branchy"].instructions)
+        print(f"{branches:>10}{count:>14}{elapsed * 1000:>10.1f}ms"
+              f"{elapsed / branches * 1e6:>12.2f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark: compile and run machine-generated expressions nested DEPTH
+levels deep (default 100k), timing each phase.
+
+Expression parsing, type checking and code generation use explicit stacks,
+so these run in bounded Python stack; the recursive versions hit the
+recursion limit at a depth of about a thousand.
+
+    python benchmarks/bench_deep_nesting.py [DEPTH ...]
+"""
+
+import sys
+import time
+
+from bench_util import repo_path  # noqa: F401  (sets up sys.path)
+
+from parser import parse_string
+from type_checker import TypeChecker
+from codegen import generate_bytecode
+from vm import VM
+
+PRELUDE = """function id:
+  inputs:
+    x: Integer
+  outputs:
+    r: Integer
+  implementation: {
+    return x
+  }
+
+function main:
+  outputs:
+    r: Integer
+  implementation: {
+    x = 1
+"""
+
+
+def return_value(expr: str) -> str:
+    return f"    return {expr}\n  }}\n"
+
+
+def branch_on(cond: str) -> str:
+    return f"    if {cond}: {{\n      return 1\n    }}\n    return 0\n  }}\n"
+
+
+# name -> (body for a depth, expected result of main)
+SHAPES = {
+    "right-nested +": (lambda n: return_value("1 + (" * n + "1" + ")" * n), lambda n: n + 1),
+    "left chain +": (lambda n: return_value("0" + " + 1" * n), lambda n: n),
+    "parentheses": (lambda n: return_value("(" * n + "7" + ")" * n), lambda n: 7),
+    "unary minus": (lambda n: return_value("- " * n + "1"), lambda n: (-1) ** n),
+    "nested calls": (lambda n: return_value("id(" * n + "5" + ")" * n), lambda n: 5),
+    "nested lists": (lambda n: return_value("[" * n + "3" + "]" * n + "[0]" * n), lambda n: 3),
+    "and condition": (lambda n: branch_on(" and ".join(["x == 1"] * n)), lambda n: 1),
+    "not condition": (lambda n: branch_on("not " * n + "x == 1"), lambda n: 1 - n % 2),
+}
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def check(program):
+    checker = TypeChecker()
+    if not checker.check_program(program):
+        raise SystemExit(f"type errors: {checker.errors[:3]}")
+
+
+def main():
+    depths = [int(arg) for arg in sys.argv[1:]] or [100000]
+
+    print(f"{'shape':<16}{'depth':>8}{'parse':>10}{'check':>10}{'codegen':>10}{'run':>10}")
+    for depth in depths:
+        for name, (body, expected) in SHAPES.items():
+            source = PRELUDE + body(depth)
+            program, parse_time = timed(parse_string, source, "<deep>")
+            _, check_time = timed(check, program)
+            module, codegen_time = timed(generate_bytecode, program)
+            result, run_time = timed(VM(module).run)
+            if result != expected(depth):
+                raise SystemExit(f"{name}: main returned {result!r}, expected {expected(depth)!r}")
+            print(f"{name:<16}{depth:>8}{parse_time:>9.2f}s{check_time:>9.2f}s"
+                  f"{codegen_time:>9.2f}s{run_time:>9.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Benchmark: table-driven dispatch vs the original if/elif chain.
+
+Runs examples/factorial.one and a loop-heavy program on both VM engines.
+
+    python benchmarks/bench_dispatch.py
+"""
+
+from bench_util import best_of, quietly, compile_path, compile_source, repo_path
+
+from vm import VM, ENGINES
+
+
+LOOP_PROGRAM = """
+function count_loop:
+  inputs:
+    n: Integer
+  outputs:
+    result: Integer
+  implementation: {
+    total = 0
+    i = 0
+    while i < n: {
+      if i % 3 == 0: {
+        total = total + i * 2
+      } else: {
+        total = total - 1
+      }
+      i = i + 1
+    }
+    return total
+  }
+
+function main:
+  outputs:
+    exit_code: Integer
+  implementation: {
+    println(count_loop(200000))
+    return 0
+  }
+"""
+
+
+def run_module(module, engine: str, times: int = 1):
+    for _ in range(times):
+        quietly(VM(module, engine=engine).run)
+
+
+def main():
+    workloads = [
+        ("factorial.one x2000", compile_path(repo_path("examples", "factorial.one")), 2000),
+        ("loop 200k iterations", compile_source(LOOP_PROGRAM), 1),
+    ]
+
+    print(f"{'workload':<24}" + "".join(f"{e:>12}" for e in ENGINES) + f"{'speedup':>10}")
+    for name, module, times in workloads:
+        timings = {e: best_of(lambda: run_module(module, e, times), repeat=3) for e in ENGINES}
+        speedup = timings["switch"] / timings["table"]
+        row = "".join(f"{timings[e] * 1000:>10.1f}ms" for e in ENGINES)
+        print(f"{name:<24}{row}{speedup:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark: time from a saved module to the end of a run that calls only
+a few of its functions, for the old pickle format and the .1bc image
+(mmap plus decoding each function on first call).
+
+    python benchmarks/bench_image_load.py [FUNCTIONS] [CALLED]
+"""
+
+import os
+import pickle
+import sys
+import tempfile
+
+from bench_util import repo_path, best_of, quietly  # noqa: F401  (sets up sys.path)
+
+from parser import parse_string
+from codegen import generate_bytecode, compact_module
+from bytecode_image import dump_module, load_module
+from vm import VM
+
+
+def program_source(functions: int, called: int) -> str:
+    """`functions` functions of about 60 instructions; main calls the first `called`"""
+    parts = []
+    for i in range(functions):
+        parts.append(
+            f"function f{i}:\n"
+            f"  inputs:\n"
+            f"    n: Integer\n"
+            f"  outputs:\n"
+            f"    r: Integer\n"
+            f"  implementation: {{\n"
+            f"    total = 0\n"
+            f"    k = 0\n"
+            f"    while k < n: {{\n"
+            f"      if k % 3 == 0 and k != {i}: {{\n"
+            f"        total = total + k * {i}\n"
+            f"      }} else: {{\n"
+            f"        total = total - len(int_to_str(k))\n"
+            f"      }}\n"
+            f"      k = k + 1\n"
+            f"    }}\n"
+            f"    label = str_concat(\"result of f{i}: \", int_to_str(total))\n"
+            f"    return total + len(label)\n"
+            f"  }}\n\n"
+        )
+    calls = " + ".join(f"f{i}(3)" for i in range(called)) or "0"
+    parts.append(
+        "function main:\n"
+        "  outputs:\n"
+        "    r: Integer\n"
+        "  implementation: {\n"
+        f"    return {calls}\n"
+        "  }\n"
+    )
+    return "".join(parts)
+
+
+def load_pickle(path: str):
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def main():
+    functions = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    called = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    module = compact_module(generate_bytecode(parse_string(program_source(functions, called))),
+                            drop_instructions=True)
+    expected = VM(module).run()
+
+    directory = tempfile.mkdtemp()
+    pickle_path = os.path.join(directory, "program.pickle")
+    image_path = os.path.join(directory, "program.1bc")
+    try:
+        with open(pickle_path, "wb") as f:
+            pickle.dump(module, f)
+        with open(image_path, "wb") as f:
+            dump_module(module, f)
+
+        print(f"{functions} functions, main calls {called}")
+        print(f"  pickle  {os.path.getsize(pickle_path) / 1e3:8.1f} KB")
+        print(f"  .1bc    {os.path.getsize(image_path) / 1e3:8.1f} KB")
+
+        def eager():
+            loaded = load_module(image_path)
+            for name in loaded.functions:
+                loaded.functions[name]
+            return loaded
+
+        loaders = (("pickle", lambda: load_pickle(pickle_path)),
+                   (".1bc lazy", lambda: load_module(image_path)),
+                   (".1bc eager", eager))
+        for label, load in loaders:
+            if VM(load()).run() != expected:
+                raise SystemExit(f"{label}: wrong result")
+            load_time = best_of(load)
+            total_time = best_of(lambda: VM(load()).run())
+            print(f"  {label:<11} load {load_time * 1000:7.2f}ms   load + run {total_time * 1000:7.2f}ms")
+    finally:
+        os.unlink(pickle_path)
+        os.unlink(image_path)
+        os.rmdir(directory)
+
+
+if __name__ == "__main__":
+    main()
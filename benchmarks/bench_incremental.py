@@ -0,0 +1,103 @@
+"""
+Benchmark: rebuilding a large file after a one-function edit, from
+scratch with Compiler and incrementally with IncrementalCompiler.
+
+    python benchmarks/bench_incremental.py [FUNCTIONS]
+"""
+
+import os
+import sys
+import tempfile
+
+from bench_util import repo_path, best_of, quietly  # noqa: F401  (sets up sys.path)
+
+from compiler import Compiler, IncrementalCompiler
+from codegen import disassemble_module
+
+
+def function_source(i: int, edit: int = 0, output: str = "Integer") -> str:
+    """A function of a dozen statements; edit changes one constant"""
+    return (
+        f"function f{i}:\n"
+        f"  inputs:\n"
+        f"    n: Integer\n"
+        f"  outputs:\n"
+        f"    r: {output}\n"
+        f"  implementation: {{\n"
+        f"    total = {edit}\n"
+        f"    k = 0\n"
+        f"    while k < n: {{\n"
+        f"      if k % 3 == 0 and k != {i}: {{\n"
+        f"        total = total + k * {i}\n"
+        f"      }} else: {{\n"
+        f"        total = total - len(int_to_str(k))\n"
+        f"      }}\n"
+        f"      k = k + 1\n"
+        f"    }}\n"
+        f"    return total + f{max(i - 1, 0)}(0)\n"
+        f"  }}\n\n"
+    )
+
+
+def program_source(functions: int, edited: int = -1, edit: int = 0, output: str = "Integer") -> str:
+    """functions functions; function `edited` gets the edit and output type"""
+    parts = [function_source(i, edit, output) if i == edited else function_source(i)
+             for i in range(functions)]
+    parts.append(
+        "function main:\n"
+        "  outputs:\n"
+        "    r: Integer\n"
+        "  implementation: {\n"
+        f"    return f{functions - 1}(3)\n"
+        "  }\n"
+    )
+    return "".join(parts)
+
+
+def main():
+    functions = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    middle = functions // 2
+
+    fd, path = tempfile.mkstemp(suffix=".one")
+    os.close(fd)
+    try:
+        def write(source: str):
+            with open(path, "w") as f:
+                f.write(source)
+
+        full = Compiler()
+        incremental = IncrementalCompiler()
+        write(program_source(functions))
+        incremental.compile_file(path)
+
+        edits = (("body edit", dict(edit=1), dict(edit=2)),
+                 ("signature edit", dict(output="Float"), dict(output="Integer")))
+
+        print(f"{functions} functions, one edited in the middle")
+        for label, first, second in edits:
+            versions = [program_source(functions, middle, **first),
+                        program_source(functions, middle, **second)]
+
+            def rebuild(compiler):
+                for source in versions:
+                    write(source)
+                    compiler.compile_file(path)
+
+            full_time = best_of(lambda: rebuild(full)) / 2
+            incremental_time = best_of(lambda: rebuild(incremental)) / 2
+            stats = incremental.format_build_stats()
+
+            if disassemble_module(incremental.compile_file(path)) != \
+               disassemble_module(full.compile_file(path)):
+                raise SystemExit(f"{label}: incremental build differs")
+
+            print(f"  {label:<15} full {full_time * 1000:8.2f}ms   "
+                  f"incremental {incremental_time * 1000:7.2f}ms   "
+                  f"({full_time / incremental_time:.0f}x)")
+            print(f"  {'':<15} {stats}")
+    finally:
+        os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Benchmark: compile + run time of a large program that calls only a few
+of its functions, compiling everything up front and compiling each
+function on its first call (--lazy).
+
+    python benchmarks/bench_lazy.py [FUNCTIONS] [CALLED]
+"""
+
+import os
+import sys
+import tempfile
+
+from bench_util import repo_path, best_of, quietly
+
+from compiler import Compiler
+from vm import VM
+from bench_image_load import program_source
+
+
+def compile_and_run(path: str, lazy: bool):
+    module = Compiler(lazy=lazy).compile_file(path)
+    return module, VM(module).run()
+
+
+def main():
+    functions = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    called = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    fd, path = tempfile.mkstemp(suffix=".one")
+    with os.fdopen(fd, "w") as f:
+        f.write(program_source(functions, called))
+
+    programs = [(f"{functions} functions, main calls {called}", path),
+                ("compiler/tokenizer.one", repo_path("compiler", "tokenizer.one")),
+                ("compiler/self_hosting_demo.one", repo_path("compiler", "self_hosting_demo.one"))]
+    try:
+        for label, program in programs:
+            _, expected = quietly(compile_and_run, program, False)
+            module, result = quietly(compile_and_run, program, True)
+            if result != expected:
+                raise SystemExit(f"{label}: lazy result differs")
+
+            eager_time = best_of(lambda: quietly(compile_and_run, program, False))
+            lazy_time = best_of(lambda: quietly(compile_and_run, program, True))
+            print(f"{label}")
+            print(f"  eager {eager_time * 1000:8.2f}ms   lazy {lazy_time * 1000:8.2f}ms   "
+                  f"({len(module.functions.compiled())} of {len(module.functions)} functions compiled)")
+    finally:
+        os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
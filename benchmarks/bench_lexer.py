@@ -0,0 +1,81 @@
+"""
+Benchmark: lexer throughput in MB/s and memory per token for the
+character-level Lexer (list of Token objects) and the master-regex
+RegexLexer (packed TokenBuffer).
+
+First checks that both lexers produce identical tokens (or identical errors)
+for every file in examples/ and compiler/, then times them on those files
+concatenated and repeated to about 1 MB.
+
+    python benchmarks/bench_lexer.py
+"""
+
+import glob
+import sys
+import tracemalloc
+
+from bench_util import repo_path, best_of
+
+from lexer import LEXERS, LexerError
+
+TARGET_BYTES = 1_000_000
+
+
+def corpus_files():
+    return sorted(glob.glob(repo_path("examples", "*.one")) +
+                  glob.glob(repo_path("compiler", "*.one")))
+
+
+def lex(engine: str, source: str, filename: str):
+    """Tokens, or the error text if lexing fails"""
+    try:
+        return list(LEXERS[engine](source, filename).tokenize())
+    except LexerError as e:
+        return str(e)
+
+
+def verify(files) -> bool:
+    ok = True
+    for path in files:
+        with open(path, encoding="utf-8") as f:
+            source = f.read()
+        results = {engine: lex(engine, source, path) for engine in LEXERS}
+        if len({repr(result) for result in results.values()}) != 1:
+            print(f"MISMATCH {path}")
+            ok = False
+    print(f"verified {len(files)} files: {'identical' if ok else 'DIFFERENT'}")
+    return ok
+
+
+def main():
+    files = corpus_files()
+    if not verify(files):
+        sys.exit(1)
+
+    sources = []
+    for path in files:
+        with open(path, encoding="utf-8") as f:
+            source = f.read()
+        if not isinstance(lex("char", source, path), str):
+            sources.append(source)
+    chunk = "\n".join(sources) + "\n"
+    corpus = chunk * max(1, TARGET_BYTES // len(chunk))
+    size = len(corpus.encode("utf-8"))
+    print(f"corpus: {size / 1e6:.2f} MB, {len(lex('regex', corpus, '<bench>'))} tokens")
+
+    for engine in LEXERS:
+        seconds = best_of(lambda: LEXERS[engine](corpus, "<bench>").tokenize(), repeat=3)
+        print(f"  {engine:<6} {seconds * 1000:8.1f}ms  {size / 1e6 / seconds:6.2f} MB/s")
+
+    print("memory held by the token sequence:")
+    for engine in LEXERS:
+        tracemalloc.start()
+        tokens = LEXERS[engine](corpus, "<bench>").tokenize()
+        held, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"  {engine:<6} {held / 1e6:8.1f} MB  {held / len(tokens):6.1f} bytes/token")
+        del tokens
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark: compile time of a large generated program with function
+bodies checked and generated in 1, 2, 4, ... worker processes (--jobs).
+
+Checks that every job count produces the same bytecode and the same
+type errors, in the same order.
+
+    python benchmarks/bench_parallel.py [FUNCTIONS] [MAX_JOBS]
+"""
+
+import io
+import os
+import sys
+import tempfile
+from contextlib import redirect_stdout
+
+from bench_util import best_of
+
+from compiler import Compiler, CompilationError
+from codegen import disassemble_module
+from bench_incremental import program_source
+
+
+def compile_output(path: str, jobs: int) -> str:
+    """Disassembly of path, or the errors compiling it prints"""
+    printed = io.StringIO()
+    with redirect_stdout(printed):
+        try:
+            return disassemble_module(Compiler(jobs=jobs).compile_file(path))
+        except CompilationError:
+            return printed.getvalue()
+
+
+def main():
+    functions = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    max_jobs = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1
+
+    job_counts = [1]
+    while job_counts[-1] * 2 <= max_jobs:
+        job_counts.append(job_counts[-1] * 2)
+    if job_counts[-1] != max_jobs:
+        job_counts.append(max_jobs)
+
+    fd, path = tempfile.mkstemp(suffix=".one")
+    os.close(fd)
+    broken_fd, broken_path = tempfile.mkstemp(suffix=".one")
+    os.close(broken_fd)
+    try:
+        with open(path, "w") as f:
+            f.write(program_source(functions))
+        with open(broken_path, "w") as f:
+            # Undefined names spread over the whole file
+            f.write(program_source(functions).replace("k != 1", "k != missing"))
+
+        for label, program in (("bytecode", path), ("type errors", broken_path)):
+            expected = compile_output(program, 1)
+            for jobs in job_counts[1:]:
+                if compile_output(program, jobs) != expected:
+                    raise SystemExit(f"{label} differ with {jobs} jobs")
+
+        print(f"{functions} functions, {os.cpu_count()} CPUs")
+        serial_time = None
+        for jobs in job_counts:
+            compile_time = best_of(lambda: Compiler(jobs=jobs).compile_file(path), repeat=3)
+            serial_time = serial_time or compile_time
+            print(f"  {jobs:3d} jobs {compile_time * 1000:9.2f}ms   ({serial_time / compile_time:.2f}x)")
+    finally:
+        os.unlink(path)
+        os.unlink(broken_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Benchmark: parse throughput of the explicit-stack Pratt expression parser
+vs the original seven-level recursive-descent chain (kept here as
+LegacyParser).
+
+Checks that both produce identical ASTs for examples/, compiler/ and a
+generated expression-heavy program, then times parsing pre-lexed tokens.
+
+    python benchmarks/bench_parser.py [FUNCTIONS]
+"""
+
+import glob
+import sys
+
+from bench_util import repo_path, best_of
+
+from lexer import TokenType, lex_string
+from parser import (Parser, ASTNode, BinaryOp, UnaryOp, Call, Member, Index, ListLiteral,
+                    ParseError)
+
+
+class LegacyParser(Parser):
+    """Parser with the original recursive one-method-per-precedence-level expressions"""
+
+    def expression(self):
+        return self.or_expression()
+
+    def or_expression(self):
+        left = self.and_expression()
+        while self.match(TokenType.OR):
+            operator = self.previous().lexeme
+            right = self.and_expression()
+            left = BinaryOp(left.location, left, operator, right)
+        return left
+
+    def and_expression(self):
+        left = self.equality()
+        while self.match(TokenType.AND):
+            operator = self.previous().lexeme
+            right = self.equality()
+            left = BinaryOp(left.location, left, operator, right)
+        return left
+
+    def equality(self):
+        left = self.comparison()
+        while self.match(TokenType.EQ, TokenType.NE):
+            operator = self.previous().lexeme
+            right = self.comparison()
+            left = BinaryOp(left.location, left, operator, right)
+        return left
+
+    def comparison(self):
+        left = self.addition()
+        while self.match(TokenType.LT, TokenType.GT, TokenType.LE, TokenType.GE):
+            operator = self.previous().lexeme
+            right = self.addition()
+            left = BinaryOp(left.location, left, operator, right)
+        return left
+
+    def addition(self):
+        left = self.multiplication()
+        while self.match(TokenType.PLUS, TokenType.MINUS):
+            operator = self.previous().lexeme
+            right = self.multiplication()
+            left = BinaryOp(left.location, left, operator, right)
+        return left
+
+    def multiplication(self):
+        left = self.unary()
+        while self.match(TokenType.STAR, TokenType.SLASH, TokenType.PERCENT):
+            operator = self.previous().lexeme
+            right = self.unary()
+            left = BinaryOp(left.location, left, operator, right)
+        return left
+
+    def unary(self):
+        if self.match(TokenType.MINUS, TokenType.NOT, TokenType.TILDE):
+            operator = self.previous().lexeme
+            operand = self.unary()
+            return UnaryOp(self.previous().location, operator, operand)
+        return self.postfix()
+
+    def postfix(self):
+        expr = self.primary()
+        while True:
+            if self.match(TokenType.LPAREN):
+                call = Call(expr.location, expr)
+                if not self.check(TokenType.RPAREN):
+                    while True:
+                        call.arguments.append(self.expression())
+                        if not self.match(TokenType.COMMA):
+                            break
+                self.consume(TokenType.RPAREN, "Expected ')' after arguments")
+                expr = call
+            elif self.match(TokenType.DOT):
+                member_token = self.consume(TokenType.IDENTIFIER, "Expected member name")
+                expr = Member(expr.location, expr, member_token.lexeme)
+            elif self.match(TokenType.LBRACKET):
+                index = self.expression()
+                self.consume(TokenType.RBRACKET, "Expected ']' after index")
+                expr = Index(expr.location, expr, index)
+            else:
+                return expr
+
+    def primary(self):
+        if self.match(TokenType.LPAREN):
+            expr = self.expression()
+            self.consume(TokenType.RPAREN, "Expected ')' after expression")
+            return expr
+        if self.match(TokenType.LBRACKET):
+            list_lit = ListLiteral(self.previous().location)
+            if not self.check(TokenType.RBRACKET):
+                while True:
+                    list_lit.elements.append(self.expression())
+                    if not self.match(TokenType.COMMA):
+                        break
+            self.consume(TokenType.RBRACKET, "Expected ']' after list elements")
+            return list_lit
+        return super().primary()
+
+
+def expression_source(functions: int) -> str:
+    """Functions full of mixed-precedence expressions"""
+    parts = []
+    for i in range(functions):
+        parts.append(
+            f"function f{i}:\n"
+            f"  inputs:\n"
+            f"    a: Integer\n"
+            f"    b: Integer\n"
+            f"  outputs:\n"
+            f"    r: Integer\n"
+            f"  implementation: {{\n"
+            f"    x = a * {i} + b - -a % 7 / (b + 1) * 2\n"
+            f"    y = a < b and b >= {i} or not a == b and x != 0\n"
+            f"    z = f{i}(a + 1, b * 2)[0] + g(x, y, -b) - h(a)\n"
+            f"    return x + y * z - a / b\n"
+            f"  }}\n\n"
+        )
+    return "".join(parts)
+
+
+def shape(node):
+    """Nested tuples of everything in an AST, for equality checks"""
+    if isinstance(node, list):
+        return tuple(shape(item) for item in node)
+    if isinstance(node, ASTNode):
+        return (type(node).__name__, shape(node.location)) + tuple(
+            (name, shape(value)) for name, value in node.fields() if name != "symbols")
+    return repr(node)
+
+
+def parse(parser_class, tokens):
+    try:
+        return parser_class(tokens).parse()
+    except ParseError as e:
+        return str(e)
+
+
+def main():
+    functions = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    sources = []
+    for path in sorted(glob.glob(repo_path("examples", "*.one")) +
+                       glob.glob(repo_path("compiler", "*.one"))):
+        with open(path, encoding="utf-8") as f:
+            sources.append((path, f.read()))
+    generated = expression_source(functions)
+    sources.append(("<generated>", generated))
+
+    for name, source in sources:
+        tokens = list(lex_string(source, name))
+        if shape(parse(Parser, tokens)) != shape(parse(LegacyParser, tokens)):
+            print(f"MISMATCH {name}")
+            sys.exit(1)
+    print(f"verified {len(sources)} sources: identical ASTs")
+
+    tokens = list(lex_string(generated, "<generated>"))
+    print(f"{functions} functions, {len(tokens)} tokens")
+    for label, parser_class in (("pratt", Parser), ("legacy", LegacyParser)):
+        seconds = best_of(lambda: parser_class(tokens).parse(), repeat=3)
+        print(f"  {label:<7} {seconds * 1000:8.1f}ms  {len(tokens) / seconds / 1000:8.1f}k tokens/s")
+
+
+if __name__ == "__main__":
+    main()
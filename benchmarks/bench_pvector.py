@@ -0,0 +1,79 @@
+"""
+Benchmark: list_append/list_set/list_get on the persistent vector runtime
+list vs the previous copy-on-every-call plain lists.
+
+The copying version is quadratic, so it only runs up to LEGACY_LIMIT.
+
+    python benchmarks/bench_pvector.py
+"""
+
+import random
+import time
+
+from bench_util import repo_path  # noqa: F401  (sets up sys.path)
+
+from one_builtins import builtin_list_append, builtin_list_get, builtin_list_set
+
+LEGACY_LIMIT = 30000
+
+
+def legacy_append(lst, item):
+    new_list = lst.copy()
+    new_list.append(item)
+    return new_list
+
+
+def legacy_set(lst, index, value):
+    new_list = lst.copy()
+    if 0 <= index < len(lst):
+        new_list[index] = value
+    return new_list
+
+
+def legacy_get(lst, index):
+    if index < 0 or index >= len(lst):
+        return None
+    return lst[index]
+
+
+def run(size: int, append, get, set_item, empty):
+    """Build a list by appending, then do `size` random gets and 1000 sets"""
+    rng = random.Random(size)
+    indexes = [rng.randrange(size) for _ in range(size)]
+
+    start = time.perf_counter()
+    lst = empty
+    for i in range(size):
+        lst = append(lst, i)
+    built = time.perf_counter()
+
+    total = 0
+    for i in indexes:
+        total += get(lst, i)
+    got = time.perf_counter()
+
+    for i in indexes[:1000]:
+        lst = set_item(lst, i, -i)
+    done = time.perf_counter()
+
+    return built - start, got - built, done - got
+
+
+def main():
+    from pvector import PVector
+
+    print(f"{'size':>9}  {'impl':<8}{'append all':>12}{'get all':>12}{'1000 sets':>12}")
+    for size in (10**3, 10**4, 10**5, 10**6):
+        impls = [("pvector", builtin_list_append, builtin_list_get, builtin_list_set, PVector())]
+        if size <= LEGACY_LIMIT:
+            impls.append(("copying", legacy_append, legacy_get, legacy_set, []))
+
+        for name, append, get, set_item, empty in impls:
+            timings = run(size, append, get, set_item, empty)
+            print(f"{size:>9}  {name:<8}" + "".join(f"{t * 1000:>10.1f}ms" for t in timings))
+        if size > LEGACY_LIMIT:
+            print(f"{size:>9}  {'copying':<8}{'(skipped: quadratic)':>36}")
+
+
+if __name__ == "__main__":
+    main()
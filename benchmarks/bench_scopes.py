@@ -0,0 +1,144 @@
+"""
+Benchmark: type checking functions with thousands of locals and deeply
+nested blocks, with resolved (depth, index) bindings and a flat table of
+local types vs the original chain of per-block dictionaries (kept here
+as LegacyTypeChecker).
+
+Checks that both record the same errors and expression types, then times
+checking and code generation.
+
+    python benchmarks/bench_scopes.py [LOCALS] [DEPTH]
+"""
+
+import sys
+
+from bench_util import best_of
+
+from parser import parse_string, ASTNode, Identifier
+from type_checker import TypeChecker, INTEGER_TYPE
+from codegen import generate_bytecode
+
+# Outer locals each nested block reads; the env chain searches every
+# enclosing block for each of them
+READS_PER_BLOCK = 40
+
+
+class LegacyTypeChecker(TypeChecker):
+    """Type checker that keeps locals in a TypeEnvironment per block"""
+
+    def check_function(self, func):
+        self.current_env = self.global_env.child()
+        for param in func.inputs:
+            self.current_env.define(param.name, self.resolve_type_annotation(param.type_annotation))
+        if func.body:
+            self.check_block(func.body)
+        self.current_env = self.global_env
+
+    def check_scoped(self, block):
+        self.current_env = self.current_env.child()
+        self.check_block(block)
+        self.current_env = self.current_env.parent
+
+    def check_if(self, if_stmt):
+        self.check_expression(if_stmt.condition)
+        self.check_scoped(if_stmt.then_block)
+        if if_stmt.else_block:
+            self.check_scoped(if_stmt.else_block)
+
+    check_ensure = check_if
+
+    def check_while(self, while_stmt):
+        self.check_expression(while_stmt.condition)
+        self.check_scoped(while_stmt.body)
+
+    def check_assignment(self, assign):
+        value_type = self.check_expression(assign.value)
+        if isinstance(assign.target, Identifier):
+            self.current_env.define(assign.target.name, value_type)
+        return value_type
+
+    def check_identifier(self, ident):
+        typ = self.current_env.lookup(ident.name)
+        if typ is None:
+            self.error(f"Undefined variable: {ident.name}", ident.location)
+            return INTEGER_TYPE
+        return typ
+
+
+def program_source(locals_count: int, depth: int) -> str:
+    """main with locals_count locals, then blocks nested depth deep that
+    each read READS_PER_BLOCK of them"""
+    lines = ["function main:",
+             "  outputs:",
+             "    r: Integer",
+             "  implementation: {"]
+    for i in range(locals_count):
+        lines.append(f"    v{i} = {i}")
+
+    indent = "    "
+    for level in range(depth):
+        keyword = "while" if level % 2 else "if"
+        lines.append(f"{indent}{keyword} v{level % locals_count} < {locals_count}: {{")
+        indent += "  "
+        reads = " + ".join(f"v{(level * 7 + k) % locals_count}" for k in range(READS_PER_BLOCK))
+        lines.append(f"{indent}d{level} = {reads} + d{level - 1}" if level else f"{indent}d0 = {reads}")
+        lines.append(f"{indent}v{level % locals_count} = d{level} - v{(level + 1) % locals_count}")
+        if level % 2:
+            lines.append(f"{indent}break")
+    for level in reversed(range(depth)):
+        indent = indent[:-2]
+        lines.append(f"{indent}}}")
+
+    lines.append(f"    return v0 + v{locals_count - 1}")
+    lines.append("  }")
+    return "\n".join(lines) + "\n"
+
+
+def expression_types(program) -> list:
+    """str of every expression's recorded type, in a fixed order"""
+    types = []
+    pending = list(program.declarations)
+    while pending:
+        node = pending.pop()
+        typ = node.metadata.get('type')
+        if typ is not None:
+            types.append(str(typ))
+        for _, value in node.fields():
+            if isinstance(value, list):
+                pending.extend(v for v in value if isinstance(v, ASTNode))
+            elif isinstance(value, ASTNode):
+                pending.append(value)
+    return types
+
+
+def check(checker_class, program):
+    checker = checker_class()
+    checker.check_program(program)
+    return checker
+
+
+def main():
+    locals_count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    depth = int(sys.argv[2]) if len(sys.argv) > 2 else 150
+
+    program = parse_string(program_source(locals_count, depth))
+
+    legacy = check(LegacyTypeChecker, program)
+    legacy_types = expression_types(program)
+    resolved = check(TypeChecker, program)
+    if [str(e) for e in legacy.errors] != [str(e) for e in resolved.errors] or \
+       expression_types(program) != legacy_types:
+        raise SystemExit("resolved type checker disagrees with the legacy one")
+
+    legacy_time = best_of(lambda: check(LegacyTypeChecker, program))
+    resolved_time = best_of(lambda: check(TypeChecker, program))
+    codegen_time = best_of(lambda: generate_bytecode(program))
+
+    print(f"{locals_count} locals, blocks nested {depth} deep")
+    print(f"  type check  env chain {legacy_time * 1000:8.2f}ms   "
+          f"resolved {resolved_time * 1000:8.2f}ms   ({legacy_time / resolved_time:.1f}x)")
+    print(f"  codegen     {codegen_time * 1000:8.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark: peak memory and time for lexing + parsing a large generated
+program, with the whole token list (lex_file + Parser) vs one streaming
+pass (iter_tokens + StreamingParser) reading a binary file and an mmap.
+
+    python benchmarks/bench_streaming.py [FUNCTIONS]
+"""
+
+import mmap
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from bench_util import repo_path  # noqa: F401  (sets up sys.path)
+
+from lexer import lex_file
+from parser import Parser, parse_stream
+
+
+def program_source(functions: int) -> str:
+    """`functions` small functions with a few statements each"""
+    parts = []
+    for i in range(functions):
+        parts.append(
+            f"function f{i}:\n"
+            f"  inputs:\n"
+            f"    x: Integer\n"
+            f"  outputs:\n"
+            f"    r: Integer\n"
+            f"  implementation: {{\n"
+            f"    y = x * {i} + 1\n"
+            f"    if y > {i}: {{\n"
+            f"      y = y - \"unused\" == \"text\"\n"
+            f"    }}\n"
+            f"    return y\n"
+            f"  }}\n\n"
+        )
+    return "".join(parts)
+
+
+def measure(parse):
+    """(seconds, peak traced bytes) for parse(); timed without tracing"""
+    start = time.perf_counter()
+    parse()
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    parse()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def main():
+    functions = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    source = program_source(functions)
+
+    fd, path = tempfile.mkstemp(suffix=".one")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(source)
+        size = os.path.getsize(path)
+        print(f"{functions} functions, {size / 1e6:.1f} MB source")
+
+        def token_list():
+            return Parser(lex_file(path)).parse()
+
+        def stream_file():
+            with open(path, "rb") as f:
+                return parse_stream(f, path)
+
+        def stream_mmap():
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                return parse_stream(m, path)
+
+        for name, parse in (("token list", token_list), ("stream file", stream_file),
+                            ("stream mmap", stream_mmap)):
+            seconds, peak = measure(parse)
+            print(f"  {name:<12} {seconds:7.2f}s  peak {peak / 1e6:8.1f} MB")
+    finally:
+        os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Benchmark: building a string one piece at a time with str_concat (rope
+runtime), sb_append (string builder) and the previous eager `str(a) + str(b)`.
+
+The eager version is quadratic, so it only runs up to LEGACY_LIMIT.
+
+    python benchmarks/bench_strings.py
+"""
+
+import time
+
+from bench_util import repo_path  # noqa: F401  (sets up sys.path)
+
+from one_builtins import (builtin_str_concat, builtin_len, builtin_char_at,
+                          builtin_sb_new, builtin_sb_append, builtin_sb_build)
+
+LEGACY_LIMIT = 100000
+
+
+def legacy_concat(a, b):
+    return str(a) + str(b)
+
+
+def run_concat(size: int, concat) -> float:
+    """Append `size` one-char pieces, then read the length and last char"""
+    start = time.perf_counter()
+    s = ""
+    for i in range(size):
+        s = concat(s, "x")
+    assert builtin_len(s) == size and builtin_char_at(s, size - 1) == "x"
+    return time.perf_counter() - start
+
+
+def run_builder(size: int) -> float:
+    start = time.perf_counter()
+    sb = builtin_sb_new()
+    for i in range(size):
+        sb = builtin_sb_append(sb, "x")
+    s = builtin_sb_build(sb)
+    assert builtin_len(s) == size and builtin_char_at(s, size - 1) == "x"
+    return time.perf_counter() - start
+
+
+def main():
+    print(f"{'pieces':>9}  {'rope':>10}  {'builder':>10}  {'eager':>10}")
+    for size in (10**3, 10**4, 10**5, 10**6):
+        rope = run_concat(size, builtin_str_concat)
+        builder = run_builder(size)
+        if size <= LEGACY_LIMIT:
+            eager = f"{run_concat(size, legacy_concat) * 1000:>8.1f}ms"
+        else:
+            eager = f"{'(skipped)':>10}"
+        print(f"{size:>9}  {rope * 1000:>8.1f}ms  {builder * 1000:>8.1f}ms  {eager}")
+
+
+if __name__ == "__main__":
+    main()
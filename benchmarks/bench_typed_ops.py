@@ -0,0 +1,160 @@
+"""
+Benchmark: VM time with the type-specialized opcodes the checker enables
+(ADD_INT, CONCAT_STR, INDEX_STR, ...) vs the generic ones emitted for an
+unchecked AST.
+
+    python benchmarks/bench_typed_ops.py
+"""
+
+import io
+from contextlib import redirect_stdout
+
+from bench_util import best_of, quietly
+
+from parser import parse_string
+from type_checker import type_check_program
+from codegen import generate_bytecode, disassemble_module
+from vm import VM
+
+
+PROGRAM = """
+function sum_loop:
+  inputs:
+    n: Integer
+  outputs:
+    result: Integer
+  implementation: {
+    total = 0
+    i = 0
+    while i < n: {
+      total = total + i + 1
+      i = i + 1
+    }
+    return total
+  }
+
+function scan_text:
+  inputs:
+    text: String
+    rounds: Integer
+  outputs:
+    result: Integer
+  implementation: {
+    count = 0
+    r = 0
+    while r < rounds: {
+      i = 0
+      while i < len(text): {
+        if text[i] == "a": {
+          count = count + 1
+        }
+        i = i + 1
+      }
+      r = r + 1
+    }
+    return count
+  }
+
+function build_text:
+  inputs:
+    n: Integer
+  outputs:
+    result: String
+  implementation: {
+    text = ""
+    i = 0
+    while i < n: {
+      text = text + "ab"
+      i = i + 1
+    }
+    return text
+  }
+
+function main:
+  outputs:
+    exit_code: Integer
+  implementation: {
+    println(int_to_str(sum_loop(100000)))
+    text = build_text(20000)
+    println(int_to_str(scan_text(substr(text, 0, 500), 100)))
+    return 0
+  }
+"""
+
+
+# Call arguments are not checked against parameter types, so a typed
+# opcode can see other types at run time and must behave like the generic one
+MISTYPED_PROGRAM = """
+function twice:
+  inputs:
+    s: String
+  outputs:
+    result: String
+  implementation: {
+    return s + s
+  }
+
+function first:
+  inputs:
+    s: String
+  outputs:
+    result: String
+  implementation: {
+    return s[0]
+  }
+
+function inc:
+  inputs:
+    n: Integer
+  outputs:
+    result: Integer
+  implementation: {
+    return n + 1
+  }
+
+function main:
+  outputs:
+    exit_code: Integer
+  implementation: {
+    println(twice(5))
+    println(first([7, 8]))
+    println(inc(0.5))
+    return 0
+  }
+"""
+
+
+def compile_program(checked: bool, source: str = PROGRAM):
+    program = parse_string(source)
+    if checked:
+        type_check_program(program)
+    return generate_bytecode(program)
+
+
+def output(module) -> str:
+    """What running module prints"""
+    printed = io.StringIO()
+    with redirect_stdout(printed):
+        VM(module).run()
+    return printed.getvalue()
+
+
+def main():
+    generic = compile_program(checked=False)
+    typed = compile_program(checked=True)
+
+    if disassemble_module(generic) == disassemble_module(typed):
+        raise SystemExit("no specialized opcodes were emitted")
+    if output(generic) != output(typed):
+        raise SystemExit("specialized opcodes changed the result")
+    if output(compile_program(False, MISTYPED_PROGRAM)) != output(compile_program(True, MISTYPED_PROGRAM)):
+        raise SystemExit("specialized opcodes changed the result of mistyped arguments")
+
+    generic_time = best_of(lambda: quietly(VM(generic).run))
+    typed_time = best_of(lambda: quietly(VM(typed).run))
+    print(f"generic opcodes     {generic_time * 1000:8.1f}ms")
+    print(f"specialized opcodes {typed_time * 1000:8.1f}ms   ({generic_time / typed_time:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Shared helpers for the bootstrap compiler benchmarks.
+Puts bootstrap/ on sys.path so the compiler modules import the same way
+they do when running bootstrap/compiler.py.
+"""
+
+import io
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BOOTSTRAP = os.path.join(ROOT, "bootstrap")
+
+if BOOTSTRAP not in sys.path:
+    sys.path.insert(0, BOOTSTRAP)
+
+
+def repo_path(*parts: str) -> str:
+    """Path relative to the repository root"""
+    return os.path.join(ROOT, *parts)
+
+
+def best_of(func, repeat: int = 5) -> float:
+    """Run func repeat times and return the fastest wall time in seconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def quietly(func, *args, **kwargs):
+    """Call func with stdout captured (1 programs print a lot)"""
+    with redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+
+def compile_source(source: str, filename: str = "<bench>"):
+    """Compile 1 source text to a BytecodeModule"""
+    from compiler import Compiler
+    return Compiler().compile_string(source, filename)
+
+
+def compile_path(path: str):
+    """Compile a .one file to a BytecodeModule"""
+    from compiler import Compiler
+    return Compiler().compile_file(path)
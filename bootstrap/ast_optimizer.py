@@ -0,0 +1,548 @@
+"""
+AST optimizer for 1 language bootstrap compiler.
+Folds constant expressions, removes statically dead branches and inlines
+small functions. Runs after type checking, but does not trust the
+inferred types: call arguments are never checked against parameter
+types, so a parameter may hold a value of any type.
+"""
+
+import copy
+import operator
+from typing import List, Dict, Any, Optional
+from parser import *
+from type_checker import literal_type
+from one_builtins import BUILTINS
+from rope import as_text
+
+
+# Binary operators evaluated exactly the way the VM evaluates them
+FOLDABLE_BINARY_OPS = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '/': operator.truediv,
+    '%': operator.mod,
+    '**': operator.pow,
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '>': operator.gt,
+    '<=': operator.le,
+    '>=': operator.ge,
+    'and': lambda a, b: a and b,
+    'or': lambda a, b: a or b,
+}
+
+# Builtins without side effects that may run at compile time
+PURE_BUILTINS = {
+    'len', 'substr', 'char_at', 'str_concat', 'str_eq', 'str_to_int',
+    'int_to_str', 'is_digit', 'is_alpha', 'is_alnum',
+}
+
+# Values a Literal node may hold
+LITERAL_TYPES = (bool, int, float, str, type(None))
+
+# Limits that keep folding from building huge values at compile time
+MAX_FOLDED_EXPONENT = 256
+MAX_FOLDED_LENGTH = 4096
+
+# Largest function body (in expression nodes) that gets inlined
+MAX_INLINE_NODES = 16
+
+# Names the VM resolves before user functions, so calls to them never inline
+RESERVED_CALLS = set(BUILTINS) | {'print', 'println'}
+
+# What the optimizer can prove about a value's runtime type: always an int,
+# or always an int or a float. None means it may be anything.
+KIND_INT = 'int'
+KIND_NUMBER = 'number'
+
+# Operators with a numeric result for numeric operands; the second set
+# also keeps two ints an int
+NUMERIC_OPS = {'+', '-', '*', '/', '%', '**'}
+INT_OPS = {'+', '-', '*', '%'}
+
+
+def is_literal(node: ASTNode) -> bool:
+    """Check if node is a literal"""
+    return isinstance(node, Literal)
+
+
+def is_int_literal(node: ASTNode, value: int) -> bool:
+    """Check if node is exactly the integer literal value (not a bool or float)"""
+    return isinstance(node, Literal) and type(node.value) is int and node.value == value
+
+
+def literal_kind(value: Any) -> Optional[str]:
+    """Kind of a literal value (bools are not numbers here)"""
+    if type(value) is int:
+        return KIND_INT
+    if type(value) is float:
+        return KIND_NUMBER
+    return None
+
+
+def combine_kinds(op: str, left: Optional[str], right: Optional[str]) -> Optional[str]:
+    """Kind of `left op right`"""
+    if op not in NUMERIC_OPS or left is None or right is None:
+        return None
+    if op in INT_OPS and left == KIND_INT and right == KIND_INT:
+        return KIND_INT
+    return KIND_NUMBER
+
+
+def expression_kind(expr: ASTNode, local_kinds: Dict[str, str]) -> Optional[str]:
+    """Kind of an unoptimized expression given the kinds of locals"""
+    if isinstance(expr, Literal):
+        return literal_kind(expr.value)
+    if isinstance(expr, Identifier):
+        return local_kinds.get(expr.name)
+    if isinstance(expr, UnaryOp) and expr.operator == '-':
+        return expression_kind(expr.operand, local_kinds)
+    if isinstance(expr, BinaryOp) and expr.operator in NUMERIC_OPS:
+        return combine_kinds(expr.operator, expression_kind(expr.left, local_kinds),
+                             expression_kind(expr.right, local_kinds))
+    return None
+
+
+def numeric_locals(func: Function) -> Dict[str, str]:
+    """Kind of each local that only ever holds numbers.
+
+    A parameter never qualifies. Any other local does when every value
+    assigned to it is built from numeric literals and such locals. Starts
+    from all assigned names being ints and weakens until nothing changes.
+    """
+    assignments = []
+    pending = [func.body] if func.body else []
+    while pending:
+        node = pending.pop()
+        if isinstance(node, Block):
+            pending.extend(node.statements)
+        elif isinstance(node, Assignment):
+            if isinstance(node.target, Identifier):
+                assignments.append(node)
+        elif isinstance(node, (If, Ensure)):
+            pending.append(node.then_block)
+            if node.else_block:
+                pending.append(node.else_block)
+        elif isinstance(node, While):
+            pending.append(node.body)
+
+    params = {param.name for param in func.inputs}
+    kinds = {assign.target.name: KIND_INT for assign in assignments
+             if assign.target.name not in params}
+
+    changed = True
+    while changed:
+        changed = False
+        for assign in assignments:
+            name = assign.target.name
+            kind = kinds.get(name)
+            if kind is None:
+                continue
+
+            value_kind = expression_kind(assign.value, kinds)
+            if assign.operator != '=':  # x += e is x = x + e
+                value_kind = combine_kinds(assign.operator[0], kind, value_kind)
+
+            if value_kind is None:
+                del kinds[name]
+                changed = True
+            elif value_kind != kind and kind == KIND_INT:
+                kinds[name] = KIND_NUMBER
+                changed = True
+
+    return kinds
+
+
+def expression_nodes(expr: ASTNode) -> List[ASTNode]:
+    """All nodes of an expression tree, or None if it has a kind we cannot copy"""
+    nodes = []
+    pending = [expr]
+    while pending:
+        node = pending.pop()
+        nodes.append(node)
+        if isinstance(node, BinaryOp):
+            pending.extend((node.left, node.right))
+        elif isinstance(node, UnaryOp):
+            pending.append(node.operand)
+        elif isinstance(node, Call):
+            pending.append(node.function)
+            pending.extend(node.arguments)
+        elif isinstance(node, Index):
+            pending.extend((node.object, node.index))
+        elif isinstance(node, ListLiteral):
+            pending.extend(node.elements)
+        elif not isinstance(node, (Literal, Identifier)):
+            return None
+    return nodes
+
+
+class InlineCandidate:
+    """A function whose body is a single `return <expression>`"""
+
+    def __init__(self, func: Function):
+        self.name = func.name
+        self.params = [param.name for param in func.inputs]
+        self.expression = func.body.statements[0].value
+
+    def is_constant(self) -> bool:
+        """True for zero-argument functions returning a literal"""
+        return not self.params and is_literal(self.expression)
+
+
+def find_inline_candidates(program: Program) -> Dict[str, InlineCandidate]:
+    """Find small non-recursive functions that are safe to inline.
+
+    The body must be one `return` of an expression that only reads the
+    function's own parameters and does not call the function itself.
+    """
+    functions: Dict[str, Function] = {}
+    for decl in program.declarations:
+        if isinstance(decl, Function):
+            functions[decl.name] = decl  # Later definitions win, as in the VM
+
+    candidates = {}
+    for name, func in functions.items():
+        if name in RESERVED_CALLS or not func.body or len(func.body.statements) != 1:
+            continue
+
+        stmt = func.body.statements[0]
+        if not isinstance(stmt, Return) or stmt.value is None:
+            continue
+
+        nodes = expression_nodes(stmt.value)
+        if nodes is None or len(nodes) > MAX_INLINE_NODES:
+            continue
+
+        params = {param.name for param in func.inputs}
+        callees = {node.function.name for node in nodes
+                   if isinstance(node, Call) and isinstance(node.function, Identifier)}
+        call_targets = {id(node.function) for node in nodes if isinstance(node, Call)}
+        reads = {node.name for node in nodes
+                 if isinstance(node, Identifier) and id(node) not in call_targets}
+
+        if name in callees or not reads <= params:
+            continue
+
+        candidates[name] = InlineCandidate(func)
+
+    return candidates
+
+
+def substitute(expr: ASTNode, bindings: Dict[str, ASTNode]) -> ASTNode:
+    """Copy expr, replacing parameter reads with copies of the bound arguments"""
+    if isinstance(expr, Identifier) and expr.name in bindings:
+        return copy.deepcopy(bindings[expr.name])
+
+    node = copy.copy(expr)
+    node.metadata = dict(expr.metadata)
+
+    if isinstance(node, BinaryOp):
+        node.left = substitute(node.left, bindings)
+        node.right = substitute(node.right, bindings)
+    elif isinstance(node, UnaryOp):
+        node.operand = substitute(node.operand, bindings)
+    elif isinstance(node, Call):
+        # The callee name is not a parameter read
+        node.arguments = [substitute(arg, bindings) for arg in node.arguments]
+    elif isinstance(node, Index):
+        node.object = substitute(node.object, bindings)
+        node.index = substitute(node.index, bindings)
+    elif isinstance(node, ListLiteral):
+        node.elements = [substitute(elem, bindings) for elem in node.elements]
+
+    return node
+
+
+class ASTOptimizer:
+    """Constant folding and dead-branch elimination over a checked AST"""
+
+    def __init__(self):
+        self.folded = 0            # Expressions replaced by a literal
+        self.simplified = 0        # Algebraic identities removed
+        self.branches_removed = 0  # If/Ensure/While statements resolved statically
+        self.constant_calls = 0    # Calls replaced by a constant function's value
+        self.inlined_calls = 0     # Other calls replaced by the callee's expression
+
+        # Set by inline_functions; names being expanded guard against cycles
+        self.candidates: Dict[str, InlineCandidate] = {}
+        self.expanding: set = set()
+
+        # Kinds of the current function's numeric locals, and of the
+        # optimized arithmetic nodes in it
+        self.local_kinds: Dict[str, str] = {}
+        self.kinds: Dict[ASTNode, Optional[str]] = {}
+
+    def optimize(self, program: Program) -> Program:
+        """Optimize every function in the program in place"""
+        for decl in program.declarations:
+            if isinstance(decl, Function):
+                self.optimize_function(decl)
+        return program
+
+    def optimize_function(self, func: Function):
+        """Optimize one function's body in place"""
+        if not func.body:
+            return
+
+        self.local_kinds = numeric_locals(func)
+        self.kinds = {}
+        try:
+            self.optimize_block(func.body)
+        finally:
+            self.local_kinds = {}
+            self.kinds = {}
+
+    def stats(self) -> Dict[str, int]:
+        """Counts of each rewrite"""
+        return {
+            'folded': self.folded,
+            'simplified': self.simplified,
+            'branches removed': self.branches_removed,
+            'constant calls': self.constant_calls,
+            'calls inlined': self.inlined_calls,
+        }
+
+    def inline_functions(self, program: Program) -> Program:
+        """Inline calls to small functions, then fold the result again"""
+        self.candidates = find_inline_candidates(program)
+        if self.candidates:
+            self.optimize(program)
+        return program
+
+    # Statements
+
+    def optimize_block(self, block: Block):
+        """Optimize statements, splicing in branches that are statically taken"""
+        statements = []
+        for stmt in block.statements:
+            statements.extend(self.optimize_statement(stmt))
+        block.statements = statements
+
+    def optimize_statement(self, stmt: ASTNode) -> List[ASTNode]:
+        """Optimize a statement; returns the statements that replace it"""
+        if isinstance(stmt, Return):
+            if stmt.value:
+                stmt.value = self.optimize_expression(stmt.value)
+            return [stmt]
+        elif isinstance(stmt, (If, Ensure)):
+            return self.optimize_conditional(stmt)
+        elif isinstance(stmt, While):
+            return self.optimize_while(stmt)
+        elif isinstance(stmt, Assignment):
+            stmt.value = self.optimize_expression(stmt.value)
+            return [stmt]
+        elif stmt.node_type in (ASTNodeType.BREAK, ASTNodeType.CONTINUE):
+            return [stmt]
+        else:
+            return [self.optimize_expression(stmt)]
+
+    def optimize_conditional(self, stmt: ASTNode) -> List[ASTNode]:
+        """Optimize if/ensure, keeping only the live branch when the condition is constant"""
+        stmt.condition = self.optimize_expression(stmt.condition)
+        self.optimize_block(stmt.then_block)
+        if stmt.else_block:
+            self.optimize_block(stmt.else_block)
+
+        if not is_literal(stmt.condition):
+            return [stmt]
+
+        self.branches_removed += 1
+        if stmt.condition.value:
+            return stmt.then_block.statements
+        if stmt.else_block:
+            return stmt.else_block.statements
+        return []
+
+    def optimize_while(self, stmt: While) -> List[ASTNode]:
+        """Optimize while loop, dropping it when the condition is constant false"""
+        stmt.condition = self.optimize_expression(stmt.condition)
+
+        if is_literal(stmt.condition) and not stmt.condition.value:
+            self.branches_removed += 1
+            return []
+
+        self.optimize_block(stmt.body)
+        return [stmt]
+
+    # Expressions
+
+    def optimize_expression(self, expr: ASTNode) -> ASTNode:
+        """Optimize expression; returns the node that replaces it"""
+        if isinstance(expr, BinaryOp):
+            return self.optimize_binary_op(expr)
+        elif isinstance(expr, UnaryOp):
+            return self.optimize_unary_op(expr)
+        elif isinstance(expr, Call):
+            return self.optimize_call(expr)
+        elif isinstance(expr, Index):
+            expr.object = self.optimize_expression(expr.object)
+            expr.index = self.optimize_expression(expr.index)
+        elif isinstance(expr, ListLiteral):
+            expr.elements = [self.optimize_expression(elem) for elem in expr.elements]
+        return expr
+
+    def make_literal(self, expr: ASTNode, value: Any) -> Literal:
+        """Replace expr with a typed literal"""
+        self.folded += 1
+        lit = Literal(expr.location, value)
+        lit.metadata['type'] = literal_type(value)
+        return lit
+
+    def optimize_binary_op(self, binop: BinaryOp) -> ASTNode:
+        """Fold literal operands, then apply algebraic identities"""
+        binop.left = self.optimize_expression(binop.left)
+        binop.right = self.optimize_expression(binop.right)
+        left, right = binop.left, binop.right
+
+        if is_literal(left) and is_literal(right):
+            folded = self.evaluate_binary(binop.operator, left.value, right.value)
+            if folded is not None:
+                return self.make_literal(binop, folded[0])
+            return binop
+
+        return self.simplify_identity(binop)
+
+    def evaluate_binary(self, op: str, a: Any, b: Any) -> Optional[tuple]:
+        """Evaluate op on two constants; returns (value,) or None if it must wait for runtime"""
+        func = FOLDABLE_BINARY_OPS.get(op)
+        if func is None:
+            return None
+
+        # Leave oversized results to the VM
+        if op == '**' and isinstance(b, (int, float)) and abs(b) > MAX_FOLDED_EXPONENT:
+            return None
+        if op == '*':
+            text, count = (a, b) if isinstance(a, str) else (b, a)
+            if isinstance(text, str) and isinstance(count, int) and \
+               len(text) * count > MAX_FOLDED_LENGTH:
+                return None
+
+        # Anything that raises (division by zero, mixed types) raises at runtime instead
+        try:
+            value = func(a, b)
+        except Exception:
+            return None
+
+        if not isinstance(value, LITERAL_TYPES):
+            return None
+        return (value,)
+
+    def kind(self, node: ASTNode) -> Optional[str]:
+        """Kind of an optimized expression in the current function"""
+        if isinstance(node, Literal):
+            return literal_kind(node.value)
+        if isinstance(node, Identifier):
+            return self.local_kinds.get(node.name)
+        return self.kinds.get(node)
+
+    def simplify_identity(self, binop: BinaryOp) -> ASTNode:
+        """Drop `x * 1`, `1 * x`, `x + 0`, `0 + x` and `x - 0` where x is proven numeric"""
+        left, right = binop.left, binop.right
+        op = binop.operator
+        left_kind, right_kind = self.kind(left), self.kind(right)
+
+        if op == '*':
+            if is_int_literal(right, 1) and left_kind is not None:
+                self.simplified += 1
+                return left
+            if is_int_literal(left, 1) and right_kind is not None:
+                self.simplified += 1
+                return right
+
+        # Float + 0 turns -0.0 into 0.0, so only integers lose their + 0
+        elif op == '+':
+            if is_int_literal(right, 0) and left_kind == KIND_INT:
+                self.simplified += 1
+                return left
+            if is_int_literal(left, 0) and right_kind == KIND_INT:
+                self.simplified += 1
+                return right
+
+        elif op == '-':
+            if is_int_literal(right, 0) and left_kind is not None:
+                self.simplified += 1
+                return left
+
+        self.kinds[binop] = combine_kinds(op, left_kind, right_kind)
+        return binop
+
+    def optimize_unary_op(self, unop: UnaryOp) -> ASTNode:
+        """Fold negation and not of a literal"""
+        unop.operand = self.optimize_expression(unop.operand)
+
+        if not is_literal(unop.operand):
+            if unop.operator == '-':
+                self.kinds[unop] = self.kind(unop.operand)
+            return unop
+
+        value = unop.operand.value
+        if unop.operator == 'not':
+            return self.make_literal(unop, not value)
+        if unop.operator == '-' and isinstance(value, (int, float)):
+            return self.make_literal(unop, -value)
+        return unop
+
+    def optimize_call(self, call: Call) -> ASTNode:
+        """Inline small user functions and fold pure builtin calls on literals"""
+        call.arguments = [self.optimize_expression(arg) for arg in call.arguments]
+
+        if not isinstance(call.function, Identifier):
+            return call
+
+        name = call.function.name
+        if name in self.candidates:
+            return self.inline_call(call, self.candidates[name])
+
+        if name not in PURE_BUILTINS or not all(is_literal(arg) for arg in call.arguments):
+            return call
+
+        try:
+            value = as_text(BUILTINS[name](*[arg.value for arg in call.arguments]))
+        except Exception:
+            return call
+
+        if not isinstance(value, LITERAL_TYPES):
+            return call
+        if isinstance(value, str) and len(value) > MAX_FOLDED_LENGTH:
+            return call
+        return self.make_literal(call, value)
+
+    def inline_call(self, call: Call, candidate: InlineCandidate) -> ASTNode:
+        """Replace a call with the callee's return expression.
+
+        Arguments must be literals or variables: they are copied to each use
+        of the parameter, so anything with effects or cost could change
+        behaviour.
+        """
+        if candidate.name in self.expanding or len(call.arguments) != len(candidate.params):
+            return call
+        if not all(isinstance(arg, (Literal, Identifier)) for arg in call.arguments):
+            return call
+
+        bindings = dict(zip(candidate.params, call.arguments))
+        expr = substitute(candidate.expression, bindings)
+
+        if candidate.is_constant():
+            self.constant_calls += 1
+        else:
+            self.inlined_calls += 1
+
+        # The inlined body may itself call candidates or fold further
+        self.expanding.add(candidate.name)
+        try:
+            return self.optimize_expression(expr)
+        finally:
+            self.expanding.discard(candidate.name)
+
+
+def optimize_ast(program: Program) -> Dict[str, int]:
+    """Fold constants, remove dead branches and inline small functions.
+
+    Returns rewrite counts.
+    """
+    optimizer = ASTOptimizer()
+    optimizer.optimize(program)
+    optimizer.inline_functions(program)
+    return optimizer.stats()
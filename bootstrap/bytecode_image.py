@@ -0,0 +1,390 @@
+"""
+Binary bytecode image (.1bc) for the 1 language bootstrap compiler.
+
+A .1bc file holds one compiled module. Every integer is little-endian.
+Offsets count from the start of the file.
+
+    Header (64 bytes)
+        magic           4s   b"1BC\\0"
+        version         H    FORMAT_VERSION
+        flags           H    reserved, 0
+        source_hash     32s  SHA-256 the image was compiled from, or zeros
+        entry_point     I    constant index of the entry function's name
+        function_count  I
+        constant_count  I
+        index_offset    I    offset of the function index
+        constant_offset I    offset of the constant offset table
+        reserved        I    0
+
+    Function index: function_count entries, in module order
+        name            I    constant index of the function name
+        body_offset     I
+        body_size       I
+
+    Constant offset table: constant_count u32 offsets, one per constant.
+    Each constant is a tag byte followed by its payload:
+        0 None, 1 False, 2 True            no payload
+        3 integer                          q
+        4 big integer                      I byte count, signed bytes
+        5 float                            d
+        6 string                           I byte count, UTF-8 bytes
+        7 tuple                            I count, count u32 constant indices,
+                                           each lower than the tuple's own index
+
+    Function body
+        param_count     I
+        param_names     I count, count u32 constant indices
+        local_names     I count, count u32 constant indices
+        operand_table   I count, count u32 constant indices
+        instructions    I count, count i32 opcodes, count i32 operand indexes
+
+load_module maps the file and decodes the header and function names only.
+Each function body, and each constant it uses, is decoded the first time
+the function is looked up. Decoding only ever builds plain values, so
+loading an untrusted image cannot run code.
+"""
+
+import mmap
+import struct
+import sys
+from array import array
+from collections.abc import Mapping
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from codegen import OpCode, Function, BytecodeModule, CompactCode, compact_function, constant_key
+from lexer import SymbolTable
+
+MAGIC = b"1BC\0"
+FORMAT_VERSION = 1
+
+HEADER = struct.Struct("<4sHH32sIIIIII")
+INDEX_ENTRY = struct.Struct("<III")
+U32 = struct.Struct("<I")
+I64 = struct.Struct("<q")
+F64 = struct.Struct("<d")
+
+# Constant tags
+TAG_NONE, TAG_FALSE, TAG_TRUE, TAG_INT, TAG_BIG_INT, TAG_FLOAT, TAG_STR, TAG_TUPLE = range(8)
+
+MAX_OPCODE = max(op.value for op in OpCode)
+
+
+class BytecodeFormatError(Exception):
+    """Malformed or unsupported .1bc image"""
+    pass
+
+
+class ImageWriter:
+    """Builds the bytes of one image"""
+
+    def __init__(self):
+        self.constants: List[bytes] = []
+        self.pool: Dict[tuple, int] = {}
+
+    def constant(self, value: Any) -> int:
+        """Pool index of value, adding it if new"""
+        key = constant_key(value)
+        index = self.pool.get(key)
+        if index is not None:
+            return index
+
+        if value is None:
+            data = bytes([TAG_NONE])
+        elif value is False:
+            data = bytes([TAG_FALSE])
+        elif value is True:
+            data = bytes([TAG_TRUE])
+        elif type(value) is int:
+            if -2 ** 63 <= value < 2 ** 63:
+                data = bytes([TAG_INT]) + I64.pack(value)
+            else:
+                raw = value.to_bytes((value.bit_length() + 8) // 8, "little", signed=True)
+                data = bytes([TAG_BIG_INT]) + U32.pack(len(raw)) + raw
+        elif type(value) is float:
+            data = bytes([TAG_FLOAT]) + F64.pack(value)
+        elif type(value) is str:
+            raw = value.encode("utf-8", "surrogatepass")
+            data = bytes([TAG_STR]) + U32.pack(len(raw)) + raw
+        elif type(value) is tuple:
+            items = [self.constant(item) for item in value]  # Always lower indices
+            data = bytes([TAG_TUPLE]) + U32.pack(len(items)) + pack_u32s(items)
+        else:
+            raise BytecodeFormatError(f"Cannot store constant of type {type(value).__name__}")
+
+        index = self.pool[key] = len(self.constants)
+        self.constants.append(data)
+        return index
+
+    def function_body(self, func: Function) -> bytes:
+        """Encoded body of func"""
+        code = compact_function(func)
+        parts = [U32.pack(func.param_count)]
+        for names in (func.param_names, func.local_names, code.operand_table):
+            parts.append(U32.pack(len(names)))
+            parts.append(pack_u32s([self.constant(name) for name in names]))
+
+        parts.append(U32.pack(len(code.opcodes)))
+        parts.append(pack_i32s(code.opcodes))
+        parts.append(pack_i32s(code.operands))
+        return b"".join(parts)
+
+    def image(self, module: BytecodeModule, source_hash: bytes = b"") -> bytes:
+        """Encoded image of module"""
+        if len(source_hash) > 32:
+            raise BytecodeFormatError("source hash is longer than 32 bytes")
+
+        entry_point = self.constant(module.entry_point)
+        names = []
+        bodies = []
+        for name, func in module.functions.items():
+            names.append(self.constant(name))
+            bodies.append(self.function_body(func))
+
+        index_offset = HEADER.size
+        body_offset = index_offset + INDEX_ENTRY.size * len(bodies)
+        index = []
+        for name, body in zip(names, bodies):
+            index.append(INDEX_ENTRY.pack(name, body_offset, len(body)))
+            body_offset += len(body)
+
+        constant_offset = body_offset
+        offset = constant_offset + U32.size * len(self.constants)
+        offsets = []
+        for data in self.constants:
+            offsets.append(offset)
+            offset += len(data)
+
+        header = HEADER.pack(MAGIC, FORMAT_VERSION, 0, source_hash.ljust(32, b"\0"), entry_point,
+                             len(bodies), len(self.constants), index_offset, constant_offset, 0)
+        return b"".join([header, *index, *bodies, pack_u32s(offsets), *self.constants])
+
+
+def pack_u32s(values) -> bytes:
+    """values as consecutive little-endian u32s"""
+    return struct.pack(f"<{len(values)}I", *values)
+
+
+def pack_i32s(values: array) -> bytes:
+    """An int array as consecutive little-endian i32s"""
+    packed = array('i', values)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def dumps_module(module: BytecodeModule, source_hash: bytes = b"") -> bytes:
+    """Encode module as a .1bc image"""
+    return ImageWriter().image(module, source_hash)
+
+
+def dump_module(module: BytecodeModule, f: BinaryIO, source_hash: bytes = b""):
+    """Write module to a binary file as a .1bc image"""
+    f.write(dumps_module(module, source_hash))
+
+
+class LazyFunctions(Mapping):
+    """Read-only name -> Function mapping over an image.
+
+    Function names are read up front; a body is decoded the first time its
+    function is looked up and then kept.
+    """
+
+    def __init__(self, image: 'ImageReader'):
+        self.image = image
+        self.index: Dict[str, int] = {}
+        for position in range(image.function_count):
+            self.index[image.function_name(position)] = position
+        self.loaded: Dict[str, Function] = {}
+
+    def get(self, name: str, default=None):
+        # The VM looks up every call target here, so hits skip Mapping.get
+        func = self.loaded.get(name)
+        if func is not None:
+            return func
+        position = self.index.get(name)
+        if position is None:
+            return default
+        func = self.loaded[name] = self.image.function(position)
+        return func
+
+    def __getitem__(self, name: str) -> Function:
+        func = self.get(name)
+        if func is None:
+            raise KeyError(name)
+        return func
+
+    def __contains__(self, name) -> bool:
+        return name in self.index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.index)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+
+class ImageReader:
+    """Decodes parts of an image from a buffer (bytes or mmap) on request"""
+
+    def __init__(self, data, symbols: Optional[SymbolTable] = None):
+        self.data = data
+        self.symbols = symbols if symbols is not None else SymbolTable()
+        try:
+            (magic, version, _, self.source_hash, self.entry_point, self.function_count,
+             self.constant_count, self.index_offset, self.constant_offset, _) = \
+                HEADER.unpack_from(data, 0)
+        except struct.error:
+            raise BytecodeFormatError("truncated header")
+
+        if magic != MAGIC:
+            raise BytecodeFormatError("not a .1bc image")
+        if version != FORMAT_VERSION:
+            raise BytecodeFormatError(f"unsupported .1bc version {version} "
+                                      f"(expected {FORMAT_VERSION})")
+        if self.index_offset + INDEX_ENTRY.size * self.function_count > len(data) or \
+           self.constant_offset + U32.size * self.constant_count > len(data):
+            raise BytecodeFormatError("truncated image")
+
+        self.constants: List[Any] = [None] * self.constant_count
+        self.decoded = bytearray(self.constant_count)  # 1 once constants[i] is set
+
+    def u32s(self, offset: int) -> Tuple[List[int], int]:
+        """A count-prefixed u32 list at offset, and the offset after it"""
+        (count,) = U32.unpack_from(self.data, offset)
+        offset += U32.size
+        return list(struct.unpack_from(f"<{count}I", self.data, offset)), offset + 4 * count
+
+    def constant(self, index: int) -> Any:
+        """Constant index, decoded on first use"""
+        if self.decoded[index]:
+            return self.constants[index]
+
+        data = self.data
+        (offset,) = U32.unpack_from(data, self.constant_offset + U32.size * index)
+        tag = data[offset]
+        offset += 1
+
+        if tag == TAG_NONE:
+            value = None
+        elif tag == TAG_FALSE:
+            value = False
+        elif tag == TAG_TRUE:
+            value = True
+        elif tag == TAG_INT:
+            (value,) = I64.unpack_from(data, offset)
+        elif tag == TAG_BIG_INT:
+            (size,) = U32.unpack_from(data, offset)
+            value = int.from_bytes(data[offset + 4:offset + 4 + size], "little", signed=True)
+        elif tag == TAG_FLOAT:
+            (value,) = F64.unpack_from(data, offset)
+        elif tag == TAG_STR:
+            (size,) = U32.unpack_from(data, offset)
+            raw = data[offset + 4:offset + 4 + size]
+            if len(raw) != size:
+                raise BytecodeFormatError(f"truncated string constant {index}")
+            value = self.symbols.intern(str(raw, "utf-8", "surrogatepass"))
+        elif tag == TAG_TUPLE:
+            items, _ = self.u32s(offset)
+            if any(item >= index for item in items):
+                raise BytecodeFormatError(f"tuple constant {index} refers forward")
+            value = tuple(self.constant(item) for item in items)
+        else:
+            raise BytecodeFormatError(f"unknown constant tag {tag}")
+
+        self.constants[index] = value
+        self.decoded[index] = 1
+        return value
+
+    def function_name(self, position: int) -> str:
+        """Name of the function at position in the index"""
+        name, _, _ = INDEX_ENTRY.unpack_from(self.data, self.index_offset + INDEX_ENTRY.size * position)
+        return self.constant(name)
+
+    def function(self, position: int) -> Function:
+        """Decode the function at position in the index"""
+        try:
+            return self.decode_function(position)
+        except (struct.error, IndexError, ValueError) as e:
+            raise BytecodeFormatError(f"corrupt function {position}: {e}")
+
+    def decode_function(self, position: int) -> Function:
+        name, offset, size = INDEX_ENTRY.unpack_from(
+            self.data, self.index_offset + INDEX_ENTRY.size * position)
+        if offset + size > len(self.data):
+            raise BytecodeFormatError(f"function {position} runs past the end of the image")
+
+        data = self.data
+        (param_count,) = U32.unpack_from(data, offset)
+        param_names, offset = self.u32s(offset + U32.size)
+        local_names, offset = self.u32s(offset)
+        table, offset = self.u32s(offset)
+        (count,) = U32.unpack_from(data, offset)
+        offset += U32.size
+
+        code = CompactCode(operand_table=[self.constant(i) for i in table])
+        code.opcodes.frombytes(data[offset:offset + 4 * count])
+        code.operands.frombytes(data[offset + 4 * count:offset + 8 * count])
+        if sys.byteorder == "big":
+            code.opcodes.byteswap()
+            code.operands.byteswap()
+
+        if len(code.operands) != count:
+            raise BytecodeFormatError(f"truncated code in function {position}")
+        if count and (min(code.opcodes) < 1 or max(code.opcodes) > MAX_OPCODE or
+                      min(code.operands) < 0 or max(code.operands) >= len(table)):
+            raise BytecodeFormatError(f"invalid instruction in function {position}")
+
+        return Function(
+            name=self.constant(name),
+            param_count=param_count,
+            param_names=[self.constant(i) for i in param_names],
+            code=code,
+            local_names=[self.constant(i) for i in local_names],
+        )
+
+    def module(self) -> BytecodeModule:
+        """Module whose functions are decoded lazily from this image"""
+        return BytecodeModule(functions=LazyFunctions(self), entry_point=self.constant(self.entry_point),
+                              symbols=self.symbols)
+
+
+def read_image(data) -> ImageReader:
+    """Reader over an in-memory .1bc image (bytes or mmap)"""
+    try:
+        return ImageReader(data)
+    except (struct.error, IndexError, ValueError) as e:
+        raise BytecodeFormatError(f"corrupt image: {e}")
+
+
+def open_image(path: str) -> ImageReader:
+    """Reader over a memory-mapped .1bc file"""
+    with open(path, "rb") as f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # Empty file
+            raise BytecodeFormatError("truncated header")
+    return read_image(data)
+
+
+def loads_module(data) -> BytecodeModule:
+    """Module from an in-memory .1bc image; function bodies load lazily"""
+    reader = read_image(data)
+    try:
+        return reader.module()
+    except (struct.error, IndexError, ValueError) as e:
+        raise BytecodeFormatError(f"corrupt image: {e}")
+
+
+def load_module(path: str) -> BytecodeModule:
+    """Map a .1bc file and return its module; function bodies load lazily"""
+    reader = open_image(path)
+    try:
+        return reader.module()
+    except (struct.error, IndexError, ValueError) as e:
+        raise BytecodeFormatError(f"corrupt image: {e}")
+
+
+def is_image(path: str) -> bool:
+    """Check if path is a .1bc image (by its magic bytes)"""
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
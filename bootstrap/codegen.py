@@ -3,11 +3,17 @@ Bytecode generator for 1 language bootstrap compiler.
 Generates stack-based bytecode for the 1 VM.
 """
 
+import struct
+from array import array
+from collections.abc import Mapping
 from enum import Enum, auto
 from dataclasses import dataclass, field
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Callable, Iterator, Optional
 import parser as parser_module
 from parser import *
+from one_builtins import BUILTINS
+from resolver import resolve_function
+from type_checker import ListType
 
 
 class OpCode(Enum):
@@ -17,6 +23,9 @@ class OpCode(Enum):
     LOAD_VAR = auto()        # Load variable onto stack
     STORE_VAR = auto()       # Store top of stack to variable
     POP = auto()             # Pop top of stack
+    DUP = auto()             # Duplicate top of stack
+    LOAD_FAST = auto()       # Load local slot onto stack
+    STORE_FAST = auto()      # Store top of stack to local slot
 
     # Arithmetic operations
     ADD = auto()             # a + b
@@ -44,9 +53,18 @@ class OpCode(Enum):
     JUMP = auto()            # Unconditional jump
     JUMP_IF_FALSE = auto()   # Jump if top of stack is false
     JUMP_IF_TRUE = auto()    # Jump if top of stack is true
+    JUMP_IF_FALSE_OR_POP = auto()  # Jump keeping top if false, else pop it
+    JUMP_IF_TRUE_OR_POP = auto()   # Jump keeping top if true, else pop it
+    JUMP_IF_NOT_EQ = auto()  # Pop b, a; jump unless a == b
+    JUMP_IF_NOT_NE = auto()  # Pop b, a; jump unless a != b
+    JUMP_IF_NOT_LT = auto()  # Pop b, a; jump unless a < b
+    JUMP_IF_NOT_GT = auto()  # Pop b, a; jump unless a > b
+    JUMP_IF_NOT_LE = auto()  # Pop b, a; jump unless a <= b
+    JUMP_IF_NOT_GE = auto()  # Pop b, a; jump unless a >= b
 
     # Function operations
     CALL = auto()            # Call function
+    TAIL_CALL = auto()       # Call function in place of the current frame
     RETURN = auto()          # Return from function
     HALT = auto()            # Stop execution
 
@@ -58,6 +76,67 @@ class OpCode(Enum):
     PRINT = auto()           # Print value
     PRINTLN = auto()         # Print value with newline
 
+    # Type-specialized operations, emitted where the checker proved the
+    # operand types (added last so existing opcode values do not change)
+    ADD_INT = auto()         # a + b, both Integer
+    ADD_FLOAT = auto()       # a + b, both numeric, at least one Float
+    CONCAT_STR = auto()      # a + b, both String
+    INDEX_STR = auto()       # a[i], a String and i Integer
+    INDEX_LIST = auto()      # a[i], a List and i Integer
+
+
+# Compare-and-branch opcode for each comparison operator
+COMPARE_JUMPS = {
+    '==': OpCode.JUMP_IF_NOT_EQ,
+    '!=': OpCode.JUMP_IF_NOT_NE,
+    '<': OpCode.JUMP_IF_NOT_LT,
+    '>': OpCode.JUMP_IF_NOT_GT,
+    '<=': OpCode.JUMP_IF_NOT_LE,
+    '>=': OpCode.JUMP_IF_NOT_GE,
+}
+
+# Opcode for each non-short-circuit binary operator
+BINARY_OPCODES = {
+    '+': OpCode.ADD,
+    '-': OpCode.SUB,
+    '*': OpCode.MUL,
+    '/': OpCode.DIV,
+    '%': OpCode.MOD,
+    '**': OpCode.POW,
+    '==': OpCode.EQ,
+    '!=': OpCode.NE,
+    '<': OpCode.LT,
+    '>': OpCode.GT,
+    '<=': OpCode.LE,
+    '>=': OpCode.GE,
+}
+
+# Specialized opcode for a binary operator over the types the checker
+# recorded for its operands; other combinations use BINARY_OPCODES
+TYPED_BINARY_OPCODES = {
+    ('+', 'Integer', 'Integer'): OpCode.ADD_INT,
+    ('+', 'Integer', 'Float'): OpCode.ADD_FLOAT,
+    ('+', 'Float', 'Integer'): OpCode.ADD_FLOAT,
+    ('+', 'Float', 'Float'): OpCode.ADD_FLOAT,
+    ('+', 'String', 'String'): OpCode.CONCAT_STR,
+}
+
+# Specialized INDEX for (object type, index type)
+TYPED_INDEX_OPCODES = {
+    ('String', 'Integer'): OpCode.INDEX_STR,
+    ('List', 'Integer'): OpCode.INDEX_LIST,
+}
+
+# Opcodes whose operand is an instruction index
+JUMP_OPCODES = frozenset({
+    OpCode.JUMP, OpCode.JUMP_IF_FALSE, OpCode.JUMP_IF_TRUE,
+    OpCode.JUMP_IF_FALSE_OR_POP, OpCode.JUMP_IF_TRUE_OR_POP,
+    *COMPARE_JUMPS.values(),
+})
+
+# Opcodes after which control never falls through to the next instruction
+TERMINATOR_OPCODES = frozenset({OpCode.JUMP, OpCode.RETURN, OpCode.TAIL_CALL, OpCode.HALT})
+
 
 @dataclass
 class Instruction:
@@ -72,6 +151,30 @@ class Instruction:
         return self.opcode.name
 
 
+@dataclass
+class CompactCode:
+    """Array-backed instruction stream for one function.
+
+    opcodes[i] is the OpCode value of instruction i and operands[i] indexes
+    operand_table, which holds each distinct operand once.
+    """
+    opcodes: array = field(default_factory=lambda: array('i'))
+    operands: array = field(default_factory=lambda: array('i'))
+    operand_table: List[Any] = field(default_factory=list)
+
+    def __len__(self):
+        return len(self.opcodes)
+
+    def instruction(self, index: int) -> Instruction:
+        """Rebuild the Instruction at index"""
+        return Instruction(OpCode(self.opcodes[index]),
+                           self.operand_table[self.operands[index]])
+
+    def instructions(self) -> List[Instruction]:
+        """Rebuild the full instruction list"""
+        return [self.instruction(i) for i in range(len(self.opcodes))]
+
+
 @dataclass
 class Function:
     """Compiled function"""
@@ -80,6 +183,14 @@ class Function:
     param_names: List[str] = field(default_factory=list)
     instructions: List[Instruction] = field(default_factory=list)
     constants: List[Any] = field(default_factory=list)
+    code: Optional[CompactCode] = None
+    local_names: List[str] = field(default_factory=list)  # Slot -> name, params first
+
+    def get_instructions(self) -> List[Instruction]:
+        """Instruction list, rebuilt from compact code if it was dropped"""
+        if not self.instructions and self.code is not None:
+            return self.code.instructions()
+        return self.instructions
 
 
 @dataclass
@@ -88,6 +199,107 @@ class BytecodeModule:
     functions: Dict[str, Function] = field(default_factory=dict)
     constants: List[Any] = field(default_factory=list)
     entry_point: str = "main"
+    symbols: SymbolTable = field(default_factory=SymbolTable)  # Interned names and strings
+
+
+class DeferredFunctions(Mapping):
+    """Name -> Function mapping that compiles each function on first lookup.
+
+    Holds declarations until the VM first looks one up (normally for a
+    call), then passes it to compile_function and keeps the result.
+    """
+
+    def __init__(self, compile_function: Callable[[parser_module.Function], Function]):
+        self.compile_function = compile_function
+        self.entries: Dict[str, Any] = {}  # Compiled Function, or the declaration
+
+    def defer(self, decl: parser_module.Function):
+        """Add a declaration to compile when it is first looked up"""
+        self.entries[decl.name] = decl  # Later definitions win, as in generate()
+
+    def get(self, name: str, default=None):
+        # The VM looks up every call target here, so hits skip Mapping.get
+        entry = self.entries.get(name)
+        if entry is None:
+            return default
+        if type(entry) is not Function:
+            entry = self.entries[name] = self.compile_function(entry)
+        return entry
+
+    def __getitem__(self, name: str) -> Function:
+        func = self.get(name)
+        if func is None:
+            raise KeyError(name)
+        return func
+
+    def __contains__(self, name) -> bool:
+        return name in self.entries
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.entries)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def compiled(self) -> List[str]:
+        """Names of the functions compiled so far"""
+        return [name for name, entry in self.entries.items() if type(entry) is Function]
+
+
+class Label:
+    """Jump target whose position is filled in when the label is bound"""
+    __slots__ = ('name', 'position')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.position: Optional[int] = None
+
+    def __repr__(self):
+        return self.name
+
+
+class Assembler:
+    """Appends instructions to a function and backpatches label references.
+
+    Each unbound label keeps a fixup list of the instructions that jump to it;
+    binding the label patches exactly those instructions, so resolution is
+    linear in the number of jumps.
+    """
+
+    def __init__(self, instructions: List[Instruction]):
+        self.instructions = instructions
+        self.fixups: Dict[Label, List[int]] = {}
+
+    def emit(self, opcode: OpCode, operand: Any = None, location: SourceLocation = None):
+        """Append an instruction, recording a fixup for unbound label operands"""
+        if isinstance(operand, Label):
+            if operand.position is not None:
+                operand = operand.position
+            else:
+                self.fixups.setdefault(operand, []).append(len(self.instructions))
+        self.instructions.append(Instruction(opcode, operand, location))
+
+    def bind(self, label: Label):
+        """Bind label to the next instruction position and patch its fixups"""
+        if label.position is not None:
+            raise Exception(f"Label bound twice: {label.name}")
+
+        label.position = len(self.instructions)
+        for index in self.fixups.pop(label, ()):
+            self.instructions[index].operand = label.position
+
+    def finish(self):
+        """Check that every referenced label was bound"""
+        if self.fixups:
+            names = ", ".join(label.name for label in self.fixups)
+            raise Exception(f"Unbound labels: {names}")
+
+
+# Steps on CodeGenerator.run_steps's explicit stack
+STEP_EXPRESSION = 0  # (kind, expr): generate expr
+STEP_BRANCH = 1      # (kind, cond, target, jump_if): jump to target when cond == jump_if
+STEP_EMIT = 2        # (kind, opcode, operand): emit one instruction
+STEP_BIND = 3        # (kind, label): bind label here
 
 
 class CodeGenerator:
@@ -96,11 +308,28 @@ class CodeGenerator:
     def __init__(self):
         self.module = BytecodeModule()
         self.current_function: Optional[Function] = None
+        self.assembler: Optional[Assembler] = None
+        self.slots: Dict[str, int] = {}  # Local name -> slot in current function
         self.label_counter = 0
         self.loop_stack: List[tuple] = []  # Stack of (break_label, continue_label)
 
-    def generate(self, program: Program) -> BytecodeModule:
-        """Generate bytecode for entire program"""
+    def generate(self, program: Program,
+                 compile_function: Optional[Callable[[parser_module.Function], Function]] = None
+                 ) -> BytecodeModule:
+        """Generate bytecode for entire program.
+
+        With compile_function, nothing is generated here: each function is
+        passed to compile_function the first time the VM looks it up.
+        """
+        self.module.symbols = program.symbols
+
+        if compile_function is not None:
+            self.module.functions = DeferredFunctions(compile_function)
+            for decl in program.declarations:
+                if isinstance(decl, parser_module.Function):
+                    self.module.functions.defer(decl)
+            return self.module
+
         # Generate code for each function
         for decl in program.declarations:
             if isinstance(decl, parser_module.Function):
@@ -113,13 +342,21 @@ class CodeGenerator:
         # Extract parameter names
         param_names = [param.name for param in func.inputs]
 
+        # Locals are function-scoped in the VM: every parameter and assigned
+        # name gets one slot, parameters first. Resolving again here also
+        # binds identifiers the optimizer copied or moved.
+        scope = resolve_function(func)
+
         compiled_func = Function(
             name=func.name,
             param_count=len(func.inputs),
-            param_names=param_names
+            param_names=param_names,
+            local_names=scope.local_names
         )
 
         self.current_function = compiled_func
+        self.assembler = Assembler(compiled_func.instructions)
+        self.slots = scope.slots
 
         # Generate function body
         if func.body:
@@ -127,13 +364,17 @@ class CodeGenerator:
 
         # Add implicit return if not present
         if not compiled_func.instructions or \
-           compiled_func.instructions[-1].opcode != OpCode.RETURN:
+           compiled_func.instructions[-1].opcode not in (OpCode.RETURN, OpCode.TAIL_CALL):
             self.emit(OpCode.LOAD_CONST, None)  # Return None/void
             self.emit(OpCode.RETURN)
 
+        self.assembler.finish()
+
         # Add function to module
         self.module.functions[func.name] = compiled_func
         self.current_function = None
+        self.assembler = None
+        self.slots = {}
 
     def generate_block(self, block: Block):
         """Generate bytecode for a block"""
@@ -163,6 +404,13 @@ class CodeGenerator:
 
     def generate_return(self, ret: Return):
         """Generate return statement"""
+        if self.is_tail_call(ret.value):
+            # `return f(...)`: f replaces the current frame instead of pushing one
+            for arg in ret.value.arguments:
+                self.generate_expression(arg)
+            self.emit(OpCode.TAIL_CALL, (ret.value.function.name, len(ret.value.arguments)))
+            return
+
         if ret.value:
             self.generate_expression(ret.value)
         else:
@@ -170,16 +418,19 @@ class CodeGenerator:
 
         self.emit(OpCode.RETURN)
 
+    def is_tail_call(self, expr: Optional[ASTNode]) -> bool:
+        """Check if a returned expression is a call to a user function"""
+        return isinstance(expr, Call) and isinstance(expr.function, Identifier) and \
+            expr.function.name not in BUILTINS and \
+            expr.function.name not in ("print", "println")
+
     def generate_if(self, if_stmt: If):
         """Generate if statement"""
-        # Generate condition
-        self.generate_expression(if_stmt.condition)
-
-        # Jump to else/end if false
         else_label = self.new_label()
         end_label = self.new_label()
 
-        self.emit(OpCode.JUMP_IF_FALSE, else_label)
+        # Jump to else/end if the condition is false
+        self.generate_branch(if_stmt.condition, else_label, False)
 
         # Generate then block
         self.generate_block(if_stmt.then_block)
@@ -194,23 +445,23 @@ class CodeGenerator:
 
     def generate_while(self, while_stmt: While):
         """Generate while loop"""
+        start_label = self.new_label()
         end_label = self.new_label()
 
         # Record loop start position
-        start_pos = len(self.current_function.instructions)
+        self.patch_label(start_label)
 
         # Push loop labels for break/continue
-        self.loop_stack.append((end_label, start_pos))
+        self.loop_stack.append((end_label, start_label))
 
         # Generate condition
-        self.generate_expression(while_stmt.condition)
-        self.emit(OpCode.JUMP_IF_FALSE, end_label)
+        self.generate_branch(while_stmt.condition, end_label, False)
 
         # Generate body
         self.generate_block(while_stmt.body)
 
         # Jump back to start position
-        self.emit(OpCode.JUMP, start_pos)
+        self.emit(OpCode.JUMP, start_label)
 
         # Loop end
         self.patch_label(end_label)
@@ -221,12 +472,10 @@ class CodeGenerator:
     def generate_ensure(self, ensure_stmt: Ensure):
         """Generate ensure/otherwise statement"""
         # Similar to if statement
-        self.generate_expression(ensure_stmt.condition)
-
         else_label = self.new_label()
         end_label = self.new_label()
 
-        self.emit(OpCode.JUMP_IF_FALSE, else_label)
+        self.generate_branch(ensure_stmt.condition, else_label, False)
 
         # Generate then block
         self.generate_block(ensure_stmt.then_block)
@@ -249,7 +498,7 @@ class CodeGenerator:
             # Handle compound assignment
             if assign.operator != '=':
                 # Load current value
-                self.emit(OpCode.LOAD_VAR, assign.target.name)
+                self.generate_identifier(assign.target)
 
                 # Apply operation
                 if assign.operator == '+=':
@@ -261,7 +510,7 @@ class CodeGenerator:
                 elif assign.operator == '/=':
                     self.emit(OpCode.DIV)
 
-            self.emit(OpCode.STORE_VAR, assign.target.name)
+            self.emit(OpCode.STORE_FAST, assign.target.binding.slot)
 
     def generate_break(self):
         """Generate break statement"""
@@ -281,142 +530,270 @@ class CodeGenerator:
 
     def generate_expression(self, expr: ASTNode):
         """Generate bytecode for expression"""
+        self.run_steps([(STEP_EXPRESSION, expr)])
+
+    def generate_branch(self, cond: ASTNode, target: Label, jump_if: bool):
+        """Generate a jump to target taken when cond's truth value equals jump_if"""
+        self.run_steps([(STEP_BRANCH, cond, target, jump_if)])
+
+    def run_steps(self, steps: List[tuple]):
+        """Carry out code generation steps, last in the list first.
+
+        Expanding a node returns the steps for its sub-expressions in order
+        instead of recursing, so nesting depth is not limited by the Python
+        stack.
+        """
+        while steps:
+            step = steps.pop()
+            kind = step[0]
+            if kind == STEP_EXPRESSION:
+                more = self.expression_steps(step[1])
+            elif kind == STEP_BRANCH:
+                more = self.branch_steps(step[1], step[2], step[3])
+            elif kind == STEP_EMIT:
+                self.emit(step[1], step[2])
+                continue
+            else:
+                self.patch_label(step[1])
+                continue
+
+            if more:
+                steps.extend(reversed(more))
+
+    def expression_steps(self, expr: ASTNode) -> List[tuple]:
+        """Steps that generate an expression"""
         if isinstance(expr, Literal):
-            self.generate_literal(expr)
+            return self.generate_literal(expr)
         elif isinstance(expr, Identifier):
-            self.generate_identifier(expr)
+            return self.generate_identifier(expr)
         elif isinstance(expr, BinaryOp):
-            self.generate_binary_op(expr)
+            return self.generate_binary_op(expr)
         elif isinstance(expr, UnaryOp):
-            self.generate_unary_op(expr)
+            return self.generate_unary_op(expr)
         elif isinstance(expr, Call):
-            self.generate_call(expr)
+            return self.generate_call(expr)
         elif isinstance(expr, Index):
-            self.generate_index(expr)
+            return self.generate_index(expr)
         elif isinstance(expr, ListLiteral):
-            self.generate_list_literal(expr)
+            return self.generate_list_literal(expr)
         else:
             # Unknown expression - push null
             self.emit(OpCode.LOAD_CONST, None)
+            return []
 
-    def generate_literal(self, lit: Literal):
+    def generate_literal(self, lit: Literal) -> List[tuple]:
         """Generate literal value"""
         self.emit(OpCode.LOAD_CONST, lit.value)
+        return []
 
-    def generate_identifier(self, ident: Identifier):
+    def generate_identifier(self, ident: Identifier) -> List[tuple]:
         """Generate identifier reference"""
-        self.emit(OpCode.LOAD_VAR, ident.name)
+        binding = ident.binding
+        # A name with no binding in scope may still be assigned elsewhere in
+        # the function, and then reads its slot like any other local
+        slot = binding.slot if binding is not None else self.slots.get(ident.name)
+        if slot is not None:
+            self.emit(OpCode.LOAD_FAST, slot)
+        else:
+            self.emit(OpCode.LOAD_VAR, ident.name)
+        return []
+
+    def branch_steps(self, cond: ASTNode, target: Label, jump_if: bool) -> List[tuple]:
+        """Steps that jump to target when cond's truth value equals jump_if.
+
+        and/or/not become jump sequences and comparisons use the fused
+        compare-and-branch opcodes, so no intermediate booleans are pushed.
+        """
+        if isinstance(cond, BinaryOp) and cond.operator in ('and', 'or'):
+            # `and` with jump_if=False, or `or` with jump_if=True: both sides share the target
+            if (cond.operator == 'and') != jump_if:
+                return [(STEP_BRANCH, cond.left, target, jump_if),
+                        (STEP_BRANCH, cond.right, target, jump_if)]
+
+            # The left side alone decides the opposite outcome
+            skip_label = self.new_label()
+            return [(STEP_BRANCH, cond.left, skip_label, not jump_if),
+                    (STEP_BRANCH, cond.right, target, jump_if),
+                    (STEP_BIND, skip_label)]
+
+        elif isinstance(cond, UnaryOp) and cond.operator == 'not':
+            return [(STEP_BRANCH, cond.operand, target, not jump_if)]
+
+        elif isinstance(cond, BinaryOp) and cond.operator in COMPARE_JUMPS and not jump_if:
+            return [(STEP_EXPRESSION, cond.left),
+                    (STEP_EXPRESSION, cond.right),
+                    (STEP_EMIT, COMPARE_JUMPS[cond.operator], target)]
 
-    def generate_binary_op(self, binop: BinaryOp):
-        """Generate binary operation"""
-        # Generate left and right operands
-        self.generate_expression(binop.left)
-        self.generate_expression(binop.right)
-
-        # Generate operation
-        op_map = {
-            '+': OpCode.ADD,
-            '-': OpCode.SUB,
-            '*': OpCode.MUL,
-            '/': OpCode.DIV,
-            '%': OpCode.MOD,
-            '**': OpCode.POW,
-            '==': OpCode.EQ,
-            '!=': OpCode.NE,
-            '<': OpCode.LT,
-            '>': OpCode.GT,
-            '<=': OpCode.LE,
-            '>=': OpCode.GE,
-            'and': OpCode.AND,
-            'or': OpCode.OR,
-        }
-
-        opcode = op_map.get(binop.operator)
-        if opcode:
-            self.emit(opcode)
         else:
+            return [(STEP_EXPRESSION, cond),
+                    (STEP_EMIT, OpCode.JUMP_IF_TRUE if jump_if else OpCode.JUMP_IF_FALSE, target)]
+
+    def generate_logical_op(self, binop: BinaryOp) -> List[tuple]:
+        """Generate short-circuit and/or that leaves the deciding operand's value"""
+        end_label = self.new_label()
+        if binop.operator == 'and':
+            jump = OpCode.JUMP_IF_FALSE_OR_POP
+        else:
+            jump = OpCode.JUMP_IF_TRUE_OR_POP
+
+        return [(STEP_EXPRESSION, binop.left),
+                (STEP_EMIT, jump, end_label),
+                (STEP_EXPRESSION, binop.right),
+                (STEP_BIND, end_label)]
+
+    def generate_binary_op(self, binop: BinaryOp) -> List[tuple]:
+        """Generate binary operation"""
+        if binop.operator in ('and', 'or'):
+            return self.generate_logical_op(binop)
+
+        opcode = TYPED_BINARY_OPCODES.get(
+            (binop.operator, checked_type(binop.left), checked_type(binop.right)))
+        if opcode is None:
+            opcode = BINARY_OPCODES.get(binop.operator)
+        if opcode is None:
             raise Exception(f"Unknown binary operator: {binop.operator}")
 
-    def generate_unary_op(self, unop: UnaryOp):
-        """Generate unary operation"""
-        self.generate_expression(unop.operand)
+        return [(STEP_EXPRESSION, binop.left),
+                (STEP_EXPRESSION, binop.right),
+                (STEP_EMIT, opcode, None)]
 
+    def generate_unary_op(self, unop: UnaryOp) -> List[tuple]:
+        """Generate unary operation"""
         if unop.operator == '-':
-            self.emit(OpCode.NEG)
+            opcode = OpCode.NEG
         elif unop.operator == 'not':
-            self.emit(OpCode.NOT)
+            opcode = OpCode.NOT
         else:
             raise Exception(f"Unknown unary operator: {unop.operator}")
 
-    def generate_call(self, call: Call):
+        return [(STEP_EXPRESSION, unop.operand), (STEP_EMIT, opcode, None)]
+
+    def generate_call(self, call: Call) -> List[tuple]:
         """Generate function call"""
-        # Generate arguments (in order)
-        for arg in call.arguments:
-            self.generate_expression(arg)
-
-        # Get function name
-        if isinstance(call.function, Identifier):
-            func_name = call.function.name
-
-            # Check for built-in functions
-            if func_name == "print":
-                self.emit(OpCode.PRINT)
-            elif func_name == "println":
-                self.emit(OpCode.PRINTLN)
-            else:
-                # Regular function call
-                self.emit(OpCode.CALL, (func_name, len(call.arguments)))
-        else:
+        if not isinstance(call.function, Identifier):
             raise Exception("Only simple function calls supported in bootstrap")
 
-    def generate_index(self, index: Index):
+        # Arguments are evaluated in order
+        steps = [(STEP_EXPRESSION, arg) for arg in call.arguments]
+
+        # Check for built-in functions
+        func_name = call.function.name
+        if func_name == "print":
+            steps.append((STEP_EMIT, OpCode.PRINT, None))
+        elif func_name == "println":
+            steps.append((STEP_EMIT, OpCode.PRINTLN, None))
+        else:
+            # Regular function call
+            steps.append((STEP_EMIT, OpCode.CALL, (func_name, len(call.arguments))))
+
+        return steps
+
+    def generate_index(self, index: Index) -> List[tuple]:
         """Generate index access"""
-        self.generate_expression(index.object)
-        self.generate_expression(index.index)
-        self.emit(OpCode.INDEX)
+        opcode = TYPED_INDEX_OPCODES.get(
+            (checked_type(index.object), checked_type(index.index)), OpCode.INDEX)
+        return [(STEP_EXPRESSION, index.object),
+                (STEP_EXPRESSION, index.index),
+                (STEP_EMIT, opcode, None)]
 
-    def generate_list_literal(self, lst: ListLiteral):
+    def generate_list_literal(self, lst: ListLiteral) -> List[tuple]:
         """Generate list literal"""
-        # Generate each element
-        for elem in lst.elements:
-            self.generate_expression(elem)
-
-        # Build list from n elements
-        self.emit(OpCode.BUILD_LIST, len(lst.elements))
+        # Generate each element, then build a list from n elements
+        steps = [(STEP_EXPRESSION, elem) for elem in lst.elements]
+        steps.append((STEP_EMIT, OpCode.BUILD_LIST, len(lst.elements)))
+        return steps
 
     def emit(self, opcode: OpCode, operand: Any = None, location: SourceLocation = None):
         """Emit an instruction"""
-        inst = Instruction(opcode, operand, location)
-        self.current_function.instructions.append(inst)
+        if type(operand) is str:
+            operand = self.module.symbols.intern(operand)
+        self.assembler.emit(opcode, operand, location)
 
-    def new_label(self) -> str:
+    def new_label(self) -> Label:
         """Create a new label"""
-        label = f"L{self.label_counter}"
+        label = Label(f"L{self.label_counter}")
         self.label_counter += 1
         return label
 
-    def patch_label(self, label: str):
-        """Patch a label to current position"""
-        pos = len(self.current_function.instructions)
+    def patch_label(self, label: Label):
+        """Bind a label to the current position and backpatch jumps to it"""
+        self.assembler.bind(label)
 
-        # Replace all references to this label with the actual position
-        for inst in self.current_function.instructions:
-            if inst.operand == label:
-                inst.operand = pos
 
+def checked_type(node: ASTNode) -> Optional[str]:
+    """Name of the type the checker recorded for node ('List' for any
+    list), or None if the node was never checked"""
+    typ = node.metadata.get('type')
+    if typ is None:
+        return None
+    if isinstance(typ, ListType):
+        return 'List'
+    return str(typ)
 
-def generate_bytecode(program: Program) -> BytecodeModule:
-    """Generate bytecode from AST"""
+
+def generate_bytecode(program: Program,
+                      compile_function: Optional[Callable[[parser_module.Function], Function]] = None
+                      ) -> BytecodeModule:
+    """Generate bytecode from AST (see CodeGenerator.generate)"""
     generator = CodeGenerator()
-    return generator.generate(program)
+    return generator.generate(program, compile_function)
+
+
+def constant_key(value: Any) -> tuple:
+    """Pool key that keeps True/1/1.0 and 0.0/-0.0 apart"""
+    if type(value) is tuple:
+        return (tuple, tuple(constant_key(item) for item in value))
+    if type(value) is float:
+        return (float, struct.pack("<d", value))
+    return (type(value), value)
+
+
+def compact_function(func: Function) -> CompactCode:
+    """Pack a function's instructions into a CompactCode (cached on the function)"""
+    if func.code is not None:
+        return func.code
+
+    code = CompactCode()
+    opcodes = code.opcodes
+    operands = code.operands
+    table = code.operand_table
+    index: Dict[tuple, int] = {}
+
+    for inst in func.instructions:
+        operand = inst.operand
+        key = constant_key(operand)
+        slot = index.get(key)
+        if slot is None:
+            slot = index[key] = len(table)
+            table.append(operand)
+        opcodes.append(inst.opcode.value)
+        operands.append(slot)
+
+    func.code = code
+    return code
+
+
+def compact_module(module: BytecodeModule, drop_instructions: bool = False) -> BytecodeModule:
+    """Pack every function; optionally drop the Instruction lists to save memory"""
+    for func in module.functions.values():
+        compact_function(func)
+        if drop_instructions:
+            func.instructions = []
+    return module
 
 
 def disassemble_function(func: Function) -> str:
     """Disassemble a function for debugging"""
     lines = [f"Function {func.name} ({func.param_count} params):"]
+    if func.local_names:
+        lines.append(f"  locals: {', '.join(func.local_names)}")
 
-    for i, inst in enumerate(func.instructions):
-        lines.append(f"  {i:4d}: {inst}")
+    for i, inst in enumerate(func.get_instructions()):
+        if inst.opcode in (OpCode.LOAD_FAST, OpCode.STORE_FAST) and \
+           inst.operand < len(func.local_names):
+            lines.append(f"  {i:4d}: {inst} ({func.local_names[inst.operand]})")
+        else:
+            lines.append(f"  {i:4d}: {inst}")
 
     return "\n".join(lines)
 
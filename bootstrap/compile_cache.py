@@ -0,0 +1,118 @@
+"""
+On-disk compile cache for the 1 language bootstrap compiler.
+Stores compiled modules under a key derived from the source text, the
+compiler's own source and the compile options, so an unchanged program
+skips straight to the VM.
+"""
+
+import hashlib
+import os
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, Optional
+
+from codegen import BytecodeModule
+from bytecode_image import BytecodeFormatError, dumps_module, open_image
+
+# Name of the cache directory created next to each source file
+CACHE_DIR_NAME = "__1cache__"
+
+# Bump when the layout of cache entries changes
+CACHE_FORMAT = 2
+
+
+def compiler_version() -> str:
+    """Hash of the bootstrap compiler's own source files.
+
+    Any change to the compiler invalidates every cache entry, so a stale
+    entry can never be run by a newer compiler.
+    """
+    digest = hashlib.sha256(f"{CACHE_FORMAT} {sys.version_info[:2]}".encode())
+    for path in sorted(Path(__file__).resolve().parent.glob("*.py")):
+        digest.update(path.name.encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+class CompileCache:
+    """Content-addressed store of compiled modules.
+
+    Each entry is a .1bc image whose source_hash field holds the key.
+    Entries are written to a temporary file and renamed into place, so a
+    reader sees either a complete entry or none, and concurrent compilers
+    writing the same key just replace it with identical content. A missing,
+    unreadable or corrupt entry counts as a miss.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        self.cache_dir = cache_dir  # None: a __1cache__ directory next to each source
+        self.version = compiler_version()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.errors = 0  # Entries that could not be read or written
+
+    def key(self, source: bytes, options: str = "") -> str:
+        """Cache key for source compiled with options"""
+        digest = hashlib.sha256(self.version.encode())
+        digest.update(options.encode())
+        digest.update(b"\0")
+        digest.update(source)
+        return digest.hexdigest()
+
+    def path(self, filename: str, key: str) -> Path:
+        """Where the entry for key compiled from filename lives"""
+        source = Path(filename)
+        directory = Path(self.cache_dir) if self.cache_dir else source.parent / CACHE_DIR_NAME
+        return directory / f"{source.stem}.{key[:32]}.1bc"
+
+    def load(self, filename: str, key: str) -> Optional[BytecodeModule]:
+        """The cached module for key, or None on a miss"""
+        path = self.path(filename, key)
+        try:
+            image = open_image(str(path))
+            if image.source_hash != bytes.fromhex(key):
+                raise BytecodeFormatError("entry is for a different key")
+            module = image.module()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, BytecodeFormatError):
+            self.errors += 1
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return module
+
+    def store(self, filename: str, key: str, module: BytecodeModule) -> Optional[Path]:
+        """Atomically write module as the entry for key; returns its path"""
+        path = self.path(filename, key)
+        try:
+            image = dumps_module(module, bytes.fromhex(key))
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, temp = tempfile.mkstemp(dir=str(path.parent), prefix=".", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(image)
+                os.chmod(temp, 0o644)  # mkstemp creates it owner-only
+                os.replace(temp, str(path))
+            except BaseException:
+                os.unlink(temp)
+                raise
+        except (OSError, BytecodeFormatError):
+            self.errors += 1
+            return None
+
+        self.writes += 1
+        return path
+
+    def stats(self) -> Dict[str, int]:
+        """Counts of cache events"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'writes': self.writes,
+            'errors': self.errors,
+        }
@@ -3,16 +3,31 @@ Main compiler for the 1 programming language bootstrap.
 Ties together all compilation stages.
 """
 
+import os
 import sys
+import time
 import argparse
+import hashlib
+from contextlib import contextmanager
 from pathlib import Path
-
-from lexer import lex_file, lex_string, LexerError
-from parser import parse_file, parse_string, ParseError, Program
-from type_checker import type_check_program, TypeCheckError
-from codegen import generate_bytecode, disassemble_module, BytecodeModule
-from vm import run_bytecode, VM
-import pickle
+from typing import Dict, Optional
+
+import parser as parser_module
+from lexer import lex_file, lex_string, LexerError, LEXERS, SymbolTable
+from parser import parse_file, parse_string, parse_stream, ParseError, Program, ASTNode, StreamingParser
+from type_checker import type_check_program, TypeCheckError, TypeChecker
+from codegen import (generate_bytecode, disassemble_module, BytecodeModule, CodeGenerator, Function,
+                     DeferredFunctions)
+from ast_optimizer import optimize_ast, ASTOptimizer
+from peephole import optimize_module, optimize_function, format_stats
+from vm import run_bytecode, VM, ENGINES
+from compile_cache import CompileCache
+from bytecode_image import dumps_module, load_module, is_image, BytecodeFormatError
+from incremental import DeclarationUnit, split_declarations, referenced_names
+from parallel import compile_functions
+
+# Seconds between checks of the input file in --watch mode
+WATCH_INTERVAL = 0.5
 
 
 class CompilationError(Exception):
@@ -20,40 +35,63 @@ class CompilationError(Exception):
     pass
 
 
+@contextmanager
+def compilation_errors():
+    """Report any error raised inside as a CompilationError naming its stage"""
+    try:
+        yield
+    except LexerError as e:
+        raise CompilationError(f"Lexical error: {e}")
+    except ParseError as e:
+        raise CompilationError(f"Parse error: {e}")
+    except TypeCheckError as e:
+        raise CompilationError(f"Type error: {e}")
+    except Exception as e:
+        raise CompilationError(f"Compilation error: {e}")
+
+
 class Compiler:
     """Main compiler class"""
 
-    def __init__(self, verbose: bool = False, debug: bool = False):
+    def __init__(self, verbose: bool = False, debug: bool = False, optimize: bool = False,
+                 lexer: str = "regex", stream: bool = False, cache: Optional[CompileCache] = None,
+                 lazy: bool = False, jobs: int = 1):
         self.verbose = verbose
         self.debug = debug
+        self.optimize = optimize
+        self.lexer = lexer
+        self.stream = stream
+        self.cache = cache
+        self.lazy = lazy  # Parse brace bodies, check and generate each function on its first call
+        self.jobs = jobs  # Worker processes for checking and generating function bodies
 
     def compile_file(self, filename: str) -> BytecodeModule:
         """Compile a file"""
         if self.verbose:
             print(f"Compiling {filename}...")
 
-        try:
-            # Stage 1: Lexical analysis
-            if self.verbose:
-                print("  Stage 1: Lexical analysis...")
-
-            tokens = lex_file(filename)
-
-            if self.debug:
-                print("\n=== Tokens ===")
-                for token in tokens[:20]:  # Show first 20 tokens
-                    print(f"  {token}")
-                if len(tokens) > 20:
-                    print(f"  ... and {len(tokens) - 20} more")
-                print()
-
-            # Stage 2: Parsing
-            if self.verbose:
-                print("  Stage 2: Parsing...")
-
-            from parser import Parser
-            parser = Parser(tokens)
-            ast = parser.parse()
+        with compilation_errors():
+            cache_key = None
+            if self.cache is not None:
+                cache_key = self.cache.key(Path(filename).read_bytes(), self.cache_options())
+
+                # Debug output needs every stage to run, so it never reads the cache
+                if not self.debug:
+                    bytecode = self.cache.load(filename, cache_key)
+                    if bytecode is not None:
+                        if self.verbose:
+                            print(f"  Cache hit: {self.cache.path(filename, cache_key)}")
+                        return bytecode
+
+            if self.stream:
+                # Stages 1-2: the parser pulls tokens from the lexer as it goes
+                if self.verbose:
+                    print("  Stages 1-2: Streaming lexical analysis and parsing...")
+
+                with open(filename, 'rb') as f:
+                    ast = parse_stream(f, filename)
+            else:
+                ast = self.lex_and_parse(filename)
 
             if self.debug:
                 print("\n=== AST ===")
@@ -61,17 +99,58 @@ class Compiler:
                 print()
 
             # Stage 3: Type checking
-            if self.verbose:
-                print("  Stage 3: Type checking...")
-
-            if not type_check_program(ast):
+            checker = TypeChecker()
+            parallel = self.parallel()
+            if parallel:
+                # Stages 3-4 together: worker processes check and generate the bodies
+                if self.verbose:
+                    print(f"  Stages 3-4: Type checking and code generation in {self.jobs} processes...")
+
+                bytecode = compile_functions(ast, checker, self.jobs)
+                for error in checker.errors:
+                    print(f"Type error: {error}")
+            else:
+                if self.verbose:
+                    print("  Stage 3: Type checking...")
+
+                type_check_program(ast, checker)
+
+            if checker.errors:
                 raise CompilationError("Type checking failed")
 
+            # Stage 3b: AST optimization
+            if self.optimize and not self.lazy:
+                if self.verbose:
+                    print("  Stage 3b: Constant folding...")
+
+                ast_stats = optimize_ast(ast)
+
+                if self.verbose:
+                    for name, count in ast_stats.items():
+                        print(f"    {name:<20} {count}")
+
             # Stage 4: Code generation
-            if self.verbose:
-                print("  Stage 4: Code generation...")
+            if self.lazy:
+                if self.verbose:
+                    print("  Stage 4: Code generation deferred to each function's first call...")
 
-            bytecode = generate_bytecode(ast)
+                bytecode = generate_bytecode(
+                    ast, lambda func: self.compile_deferred(func, checker, ast.symbols))
+            elif not parallel:
+                if self.verbose:
+                    print("  Stage 4: Code generation...")
+
+                bytecode = generate_bytecode(ast)
+
+            # Stage 5: Bytecode optimization
+            if self.optimize and not self.lazy:
+                if self.verbose:
+                    print("  Stage 5: Peephole optimization...")
+
+                stats = optimize_module(bytecode)
+
+                if self.verbose:
+                    print(format_stats(stats))
 
             if self.debug:
                 print("\n=== Bytecode ===")
@@ -80,35 +159,106 @@ class Compiler:
             if self.verbose:
                 print("  Compilation successful!")
 
+            # Storing a lazy module would compile every function now
+            if cache_key is not None and not self.lazy:
+                path = self.cache.store(filename, cache_key, bytecode)
+                if self.verbose and path is not None:
+                    print(f"  Cached as {path}")
+
             return bytecode
 
-        except LexerError as e:
-            raise CompilationError(f"Lexical error: {e}")
-        except ParseError as e:
-            raise CompilationError(f"Parse error: {e}")
-        except TypeCheckError as e:
-            raise CompilationError(f"Type error: {e}")
-        except Exception as e:
-            raise CompilationError(f"Compilation error: {e}")
+    def parallel(self) -> bool:
+        """Whether stages 3-4 run in worker processes.
+
+        -O inlines across functions between the two stages, and a lazy
+        build compiles bodies one at a time as they are called, so both
+        stay in this process. So does -d, which prints each stage.
+        """
+        return self.jobs > 1 and not (self.optimize or self.lazy or self.debug)
+
+    def cache_options(self) -> str:
+        """Options that change the generated code, as part of the cache key"""
+        return f"optimize={int(self.optimize)}"
+
+    def lex_and_parse(self, filename: str) -> Program:
+        """Stages 1-2 with the whole token list built before parsing"""
+        # Stage 1: Lexical analysis
+        if self.verbose:
+            print("  Stage 1: Lexical analysis...")
+
+        symbols = SymbolTable()
+        tokens = lex_file(filename, self.lexer, symbols)
+
+        if self.debug:
+            print("\n=== Tokens ===")
+            for token in tokens[:20]:  # Show first 20 tokens
+                print(f"  {token}")
+            if len(tokens) > 20:
+                print(f"  ... and {len(tokens) - 20} more")
+            print()
+
+        # Stage 2: Parsing
+        if self.verbose:
+            print("  Stage 2: Parsing...")
+
+        # The parser builds each Token from the packed buffer as it reaches it
+        parser = StreamingParser(tokens, symbols, lazy_bodies=self.lazy)
+        return parser.parse()
+
+    def compile_deferred(self, func: parser_module.Function, checker: TypeChecker,
+                         symbols: SymbolTable) -> Function:
+        """Stages 2-5 for one function of a lazy build, run on its first call"""
+        with compilation_errors():
+            if func.deferred_body is not None:
+                func.parse_body()
+
+                # Globals are the ones the eager stages checked everything else with
+                checker.errors = []
+                checker.check_function(func)
+                if checker.errors:
+                    for error in checker.errors:
+                        print(f"Type error: {error}")
+                    raise CompilationError("Type checking failed")
+
+            if self.optimize:
+                ASTOptimizer().optimize_function(func)
+
+            generator = CodeGenerator()
+            generator.module.symbols = symbols
+            generator.generate_function(func)
+            compiled = generator.module.functions[func.name]
+
+            if self.optimize:
+                optimize_function(compiled, {})
+
+            return compiled
 
     def compile_string(self, source: str, filename: str = "<input>") -> BytecodeModule:
         """Compile a string"""
         try:
             # Stage 1: Lexical analysis
-            tokens = lex_string(source, filename)
+            symbols = SymbolTable()
+            tokens = lex_string(source, filename, self.lexer, symbols)
 
             # Stage 2: Parsing
-            from parser import Parser
-            parser = Parser(tokens)
+            parser = StreamingParser(tokens, symbols)
             ast = parser.parse()
 
             # Stage 3: Type checking
             if not type_check_program(ast):
                 raise CompilationError("Type checking failed")
 
+            # Stage 3b: AST optimization
+            if self.optimize:
+                optimize_ast(ast)
+
             # Stage 4: Code generation
             bytecode = generate_bytecode(ast)
 
+            # Stage 5: Bytecode optimization
+            if self.optimize:
+                optimize_module(bytecode)
+
             return bytecode
 
         except Exception as e:
@@ -123,69 +273,294 @@ class Compiler:
             for decl in node.declarations:
                 self.print_ast(decl, indent + 2)
 
-        elif hasattr(node, '__class__'):
+        elif isinstance(node, ASTNode):
             print(f"{prefix}{node.__class__.__name__}")
-            if hasattr(node, '__dict__'):
-                for key, value in node.__dict__.items():
-                    if key in ['location', 'metadata', 'node_type']:
-                        continue
-                    if isinstance(value, list):
-                        if value:
-                            print(f"{prefix}  {key}:")
-                            for item in value:
-                                self.print_ast(item, indent + 4)
-                    elif hasattr(value, '__class__') and hasattr(value, '__dict__'):
+            for key, value in node.fields():
+                if isinstance(value, list):
+                    if value:
                         print(f"{prefix}  {key}:")
-                        self.print_ast(value, indent + 4)
-                    elif value is not None:
-                        print(f"{prefix}  {key}: {value}")
+                        for item in value:
+                            self.print_ast(item, indent + 4)
+                elif isinstance(value, ASTNode):
+                    print(f"{prefix}  {key}:")
+                    self.print_ast(value, indent + 4)
+                elif value is not None:
+                    print(f"{prefix}  {key}: {value}")
+
+        else:
+            print(f"{prefix}{node.__class__.__name__}")
+
+
+class IncrementalCompiler(Compiler):
+    """Compiler for an edit-compile-run loop on one file.
+
+    Keeps the AST, signature and code built from each top-level function.
+    The next build of the file lexes, parses, checks and generates only
+    the functions whose text changed, plus unchanged functions that refer
+    to a name whose type changed.
+    """
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.filename: Optional[str] = None
+        self.symbols = SymbolTable()
+        self.signatures = TypeChecker()  # Only used to resolve declared types
+        self.units: Dict[tuple, DeclarationUnit] = {}  # (text, occurrence) -> unit
+        self.build_stats: Dict[str, int] = {}
+
+    def compile_file(self, filename: str) -> BytecodeModule:
+        """Compile a file, reusing what the last build of it produced"""
+        # -O inlines across functions and -d prints every stage, so both
+        # rebuild the whole file
+        if self.optimize or self.debug:
+            bytecode = super().compile_file(filename)
+            self.build_stats = {'functions': len(bytecode.functions), 'reused': 0,
+                                'recompiled': len(bytecode.functions), 'dependents': 0}
+            return bytecode
+
+        if self.verbose:
+            print(f"Compiling {filename} incrementally...")
+
+        with compilation_errors():
+            with open(filename, 'r', encoding='utf-8') as f:
+                source = f.read()
+            return self.build(source, filename)
+
+    def build(self, source: str, filename: str) -> BytecodeModule:
+        """Stages 1-4 over the functions that need them"""
+        if filename != self.filename:
+            self.filename = filename
+            self.units = {}
+
+        # Stages 1-2: only slices not seen in the last build
+        previous = dict(self.units)
+        entries = []  # (key, unit, fresh)
+        occurrences: Dict[str, int] = {}
+        try:
+            for first_line, text in split_declarations(source):
+                occurrence = occurrences[text] = occurrences.get(text, -1) + 1
+                key = (text, occurrence)
+                unit = previous.pop(key, None)
+                if unit is None:
+                    entries.append((key, self.parse_unit(text, first_line, filename), True))
+                else:
+                    unit.move_to(first_line)
+                    entries.append((key, unit, False))
+        except (LexerError, ParseError):
+            # The whole file gives the real error, or compiles if a cut was wrong
+            return self.full_build(source, filename)
+
+        self.units = {key: unit for key, unit, _ in entries}
+
+        # Stage 3: every signature is known before any body is checked
+        checker = TypeChecker()
+        for _, unit, _ in entries:
+            for decl, signature in zip(unit.declarations, unit.signatures):
+                checker.global_env.define(decl.name, signature)
+
+        errors = []
+        functions = recompiled = dependents = 0
+        for _, unit, fresh in entries:
+            functions += len(unit.declarations)
+            referenced = unit.referenced_types(checker.global_env)
+            if not fresh and unit.checked_against == referenced:
+                continue
+
+            recompiled += len(unit.declarations)
+            if unit.checked_against is not None:
+                dependents += len(unit.declarations)
+
+            checker.errors = []
+            for decl in unit.declarations:
+                checker.check_function(decl)
+            errors.extend(checker.errors)
+            unit.checked_against = None if checker.errors else referenced
+            unit.compiled = None
+
+        self.build_stats = {'functions': functions, 'reused': functions - recompiled,
+                            'recompiled': recompiled, 'dependents': dependents}
+
+        if errors:
+            for error in errors:
+                print(f"Type error: {error}")
+            raise CompilationError("Type checking failed")
+
+        # Stage 4: code for checked functions; the rest is reused as is
+        bytecode = BytecodeModule(symbols=self.symbols)
+        for _, unit, _ in entries:
+            if unit.compiled is None:
+                generator = CodeGenerator()
+                generator.module.symbols = self.symbols
+                unit.compiled = []
+                for decl in unit.declarations:
+                    generator.generate_function(decl)
+                    unit.compiled.append(generator.module.functions[decl.name])
+
+            for function in unit.compiled:
+                bytecode.functions[function.name] = function
+
+        return bytecode
+
+    def parse_unit(self, text: str, first_line: int, filename: str) -> DeclarationUnit:
+        """Lex and parse one slice of the source"""
+        tokens = lex_string(text, filename, self.lexer, self.symbols)
+        declarations = StreamingParser(tokens, self.symbols).parse().declarations
+
+        references = set()
+        for decl in declarations:
+            references |= referenced_names(decl)
+
+        unit = DeclarationUnit(text, 1, declarations,
+                               [self.signatures.function_type(decl) for decl in declarations],
+                               references)
+        unit.move_to(first_line)
+        return unit
+
+    def full_build(self, source: str, filename: str) -> BytecodeModule:
+        """Compile source in one piece; the next build starts from scratch"""
+        tokens = lex_string(source, filename, self.lexer, self.symbols)
+        ast = StreamingParser(tokens, self.symbols).parse()
+        if not type_check_program(ast):
+            raise CompilationError("Type checking failed")
+        bytecode = generate_bytecode(ast)
+
+        self.units = {}
+        self.build_stats = {'functions': len(bytecode.functions), 'reused': 0,
+                            'recompiled': len(bytecode.functions), 'dependents': 0}
+        return bytecode
+
+    def format_build_stats(self) -> str:
+        """One-line summary of the last build"""
+        stats = self.build_stats
+        return (f"Build: {stats['functions']} functions, {stats['reused']} reused, "
+                f"{stats['recompiled']} recompiled ({stats['dependents']} for a changed dependency)")
+
+
+def write_outputs(args, bytecode: BytecodeModule):
+    """Save, disassemble and run a compiled module as the options ask"""
+    # Save bytecode if requested
+    if args.output:
+        source_hash = hashlib.sha256(Path(args.input).read_bytes()).digest()
+        # Encode first: with --lazy this compiles the deferred bodies, and a
+        # body that fails must not leave a truncated file behind
+        image = dumps_module(bytecode, source_hash)
+        with open(args.output, 'wb') as f:
+            f.write(image)
+        if args.verbose:
+            print(f"Bytecode saved to {args.output}")
+
+    # Disassemble if requested
+    if args.disassemble:
+        print("\n=== Disassembly ===")
+        print(disassemble_module(bytecode))
+
+    # Run if requested
+    if args.run:
+        if args.verbose:
+            print("\n=== Running ===\n")
+
+        result = run_bytecode(bytecode, debug=args.debug, engine=args.engine)
+
+        if args.verbose:
+            print(f"\n=== Program exited with: {result} ===")
+            if isinstance(bytecode.functions, DeferredFunctions):
+                print(f"Compiled {len(bytecode.functions.compiled())} of "
+                      f"{len(bytecode.functions)} functions on first call")
+
+
+def watch(args, compiler: IncrementalCompiler):
+    """Rebuild (and run, with --run) the input each time it changes, until interrupted"""
+    seen = None
+    while True:
+        try:
+            stat = os.stat(args.input)
+            current = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            current = None
+
+        if current is not None and current != seen:
+            seen = current
+            try:
+                bytecode = compiler.compile_file(args.input)
+                print(compiler.format_build_stats())
+                write_outputs(args, bytecode)
+            except Exception as e:
+                # Report and keep watching; the next save may fix it
+                print(f"Error: {e}", file=sys.stderr)
+            sys.stdout.flush()
+
+        time.sleep(WATCH_INTERVAL)
 
 
 def main():
     """Main entry point"""
     parser = argparse.ArgumentParser(description="1 language bootstrap compiler")
 
-    parser.add_argument("input", help="Input .one file")
+    parser.add_argument("input", help="Input .one file, or a .1bc file to run")
     parser.add_argument("-o", "--output", help="Output bytecode file (.1bc)")
     parser.add_argument("-r", "--run", action="store_true", help="Run after compiling")
     parser.add_argument("-d", "--debug", action="store_true", help="Debug mode")
     parser.add_argument("-v", "--verbose", action="store_true", help="Verbose output")
     parser.add_argument("-t", "--disassemble", action="store_true", help="Disassemble bytecode")
+    parser.add_argument("-O", "--optimize", action="store_true", help="Optimize generated code")
+    parser.add_argument("--engine", choices=ENGINES, default="table",
+                        help="VM dispatch engine (default: table)")
+    parser.add_argument("--lexer", choices=LEXERS, default="regex",
+                        help="Lexer implementation (default: regex)")
+    parser.add_argument("--stream", action="store_true",
+                        help="Lex and parse in one streaming pass")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Always compile from source; do not read or write the compile cache")
+    parser.add_argument("--cache-dir",
+                        help="Compile cache directory (default: __1cache__ next to the source)")
+    parser.add_argument("--lazy", action="store_true",
+                        help="Parse, check and generate each function body on its first call")
+    parser.add_argument("-j", "--jobs", type=int, default=1, metavar="N",
+                        help="Type check and generate function bodies in N processes (default: 1)")
+    parser.add_argument("--watch", action="store_true",
+                        help="Rebuild each time the input changes, recompiling only edited functions")
 
     args = parser.parse_args()
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
 
     try:
-        # Create compiler
-        compiler = Compiler(verbose=args.verbose, debug=args.debug)
-
-        # Compile
-        bytecode = compiler.compile_file(args.input)
-
-        # Save bytecode if requested
-        if args.output:
-            with open(args.output, 'wb') as f:
-                pickle.dump(bytecode, f)
-            if args.verbose:
-                print(f"Bytecode saved to {args.output}")
+        if args.watch:
+            compiler = IncrementalCompiler(verbose=args.verbose, debug=args.debug,
+                                           optimize=args.optimize, lexer=args.lexer)
+            try:
+                watch(args, compiler)
+            except KeyboardInterrupt:
+                pass
+            return
 
-        # Disassemble if requested
-        if args.disassemble:
-            print("\n=== Disassembly ===")
-            print(disassemble_module(bytecode))
+        # Create compiler
+        cache = None if args.no_cache else CompileCache(args.cache_dir)
+        compiler = Compiler(verbose=args.verbose, debug=args.debug, optimize=args.optimize,
+                            lexer=args.lexer, stream=args.stream, cache=cache, lazy=args.lazy,
+                            jobs=args.jobs)
 
-        # Run if requested
-        if args.run:
+        if is_image(args.input):
+            # Already compiled: functions are decoded as they are first called
             if args.verbose:
-                print("\n=== Running ===\n")
+                print(f"Loading {args.input}...")
+            bytecode = load_module(args.input)
+        else:
+            # Compile
+            bytecode = compiler.compile_file(args.input)
 
-            result = run_bytecode(bytecode, debug=args.debug)
+            if args.verbose and cache is not None:
+                print("  Compile cache: " + ", ".join(f"{name} {count}"
+                                                      for name, count in cache.stats().items()))
 
-            if args.verbose:
-                print(f"\n=== Program exited with: {result} ===")
+        write_outputs(args, bytecode)
 
     except CompilationError as e:
         print(f"Error: {e}", file=sys.stderr)
         sys.exit(1)
+    except BytecodeFormatError as e:
+        print(f"Error: Invalid bytecode file {args.input}: {e}", file=sys.stderr)
+        sys.exit(1)
     except FileNotFoundError:
         print(f"Error: File not found: {args.input}", file=sys.stderr)
         sys.exit(1)
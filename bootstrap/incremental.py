@@ -0,0 +1,104 @@
+"""
+Bookkeeping for incremental builds in the 1 language bootstrap compiler.
+A source file is cut into one unit per top-level function; a unit keeps
+its AST, signature and compiled code so an unchanged function is not
+lexed, parsed, checked or generated again.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+import codegen
+from parser import *
+from type_checker import FunctionType, Type, TypeEnvironment
+
+# A top-level declaration starts a line. The same text inside a block
+# comment or a multi-line string leaves the slice before it unterminated,
+# which fails to lex, so a wrong cut is always noticed.
+DECLARATION_START = re.compile(r'^[ \t]*function\b', re.MULTILINE)
+
+
+def split_declarations(source: str) -> List[Tuple[int, str]]:
+    """(first line, text) of each top-level slice of source.
+
+    The first slice holds anything before the first function (usually
+    comments); the slices joined together are exactly source.
+    """
+    starts = [m.start() for m in DECLARATION_START.finditer(source)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+
+    slices = []
+    line = 1
+    for start, end in zip(starts, starts[1:] + [len(source)]):
+        text = source[start:end]
+        slices.append((line, text))
+        line += text.count('\n')
+    return slices
+
+
+def ast_children(node: ASTNode) -> List[ASTNode]:
+    """Every AST node directly held by node"""
+    children = []
+    for _, value in node.fields():
+        if isinstance(value, ASTNode):
+            children.append(value)
+        elif isinstance(value, list):
+            children.extend(item for item in value if isinstance(item, ASTNode))
+    return children
+
+
+def referenced_names(func: Function) -> Set[str]:
+    """Names a function's body reads, calls or assigns"""
+    names = set()
+    pending = [func.body] if func.body else []
+    while pending:
+        node = pending.pop()
+        if isinstance(node, Identifier):
+            names.add(node.name)
+        else:
+            pending.extend(ast_children(node))
+    return names
+
+
+def shift_locations(node: ASTNode, lines: int):
+    """Move node and everything under it down by lines"""
+    shifted: Dict[SourceLocation, SourceLocation] = {}  # Keeps shared locations shared
+    pending = [node]
+    while pending:
+        node = pending.pop()
+        location = node.location
+        moved = shifted.get(location)
+        if moved is None:
+            moved = shifted[location] = location._replace(line=location.line + lines)
+        node.location = moved
+        pending.extend(ast_children(node))
+
+
+@dataclass
+class DeclarationUnit:
+    """One top-level slice of a source file and what was built from it"""
+    text: str
+    first_line: int
+    declarations: List[Function]
+    signatures: List[FunctionType]
+    references: Set[str]  # Names whose global type the bodies depend on
+
+    # Global types of references the bodies last checked cleanly against;
+    # None until they do
+    checked_against: Optional[Dict[str, Optional[Type]]] = None
+
+    # Code for each declaration; None until generated for the current check
+    compiled: Optional[List[codegen.Function]] = None
+
+    def move_to(self, first_line: int):
+        """Relocate the unit's AST after lines were added or removed above it"""
+        if first_line != self.first_line:
+            for decl in self.declarations:
+                shift_locations(decl, first_line - self.first_line)
+            self.first_line = first_line
+
+    def referenced_types(self, env: TypeEnvironment) -> Dict[str, Optional[Type]]:
+        """Current type in env of each referenced name"""
+        return {name: env.lookup(name) for name in self.references}
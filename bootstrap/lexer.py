@@ -3,9 +3,16 @@ Lexer for the 1 programming language bootstrap compiler.
 Converts source code into tokens.
 """
 
+import codecs
+import io
+import re
+import sys
+from array import array
+from bisect import bisect_right
+from collections.abc import Sequence
 from enum import Enum, auto
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional
 
 
 class TokenType(Enum):
@@ -98,9 +105,8 @@ class TokenType(Enum):
     COMMENT = auto()
 
 
-@dataclass
-class SourceLocation:
-    """Location in source code"""
+class SourceLocation(NamedTuple):
+    """Location in source code (immutable, so tokens and AST nodes share one)"""
     filename: str
     line: int
     column: int
@@ -108,6 +114,12 @@ class SourceLocation:
     def __str__(self):
         return f"{self.filename}:{self.line}:{self.column}"
 
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
 
 @dataclass
 class Token:
@@ -129,6 +141,170 @@ class LexerError(Exception):
         super().__init__(f"{location}: {message}")
 
 
+class SymbolTable:
+    """Interned identifier and string-literal text for one compilation.
+
+    The lexer passes every name and string value through intern(), so equal
+    names are one str object from the tokens through to bytecode operands
+    and frame locals, and comparing them short-circuits on identity.
+    """
+
+    def __init__(self):
+        self.strings: Dict[str, str] = {}
+
+    def intern(self, text: str) -> str:
+        """The shared copy of text"""
+        symbol = self.strings.get(text)
+        if symbol is None:
+            symbol = self.strings[text] = sys.intern(text)
+        return symbol
+
+    def __len__(self) -> int:
+        return len(self.strings)
+
+    def __contains__(self, text) -> bool:
+        return text in self.strings
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.strings)
+
+
+ESCAPE_PATTERN = re.compile(r'\\(.)')
+ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', '\\': '\\', '"': '"'}
+
+
+def decode_string(lexeme: str) -> str:
+    """Value of a string literal whose escapes are already known to be valid"""
+    body = lexeme[1:-1]
+    if '\\' not in body:
+        return body
+    return ESCAPE_PATTERN.sub(lambda m: ESCAPES[m.group(1)], body)
+
+
+# TokenType for each TokenType.value, for decoding packed kinds
+TOKEN_TYPES = [None] + list(TokenType)
+
+# Packed kinds whose Token is just the source text with no literal value
+PLAIN_KINDS = frozenset(token_type.value for token_type in TokenType) - {
+    token_type.value for token_type in (TokenType.IDENTIFIER, TokenType.NEWLINE, TokenType.STRING,
+                                        TokenType.INTEGER, TokenType.FLOAT, TokenType.TRUE,
+                                        TokenType.FALSE)}
+
+
+def token_text(token_type: TokenType, text: str, symbols: SymbolTable):
+    """(lexeme, literal) of a token spanning text in the source"""
+    if token_type == TokenType.IDENTIFIER:
+        return symbols.intern(text), None
+    if token_type == TokenType.NEWLINE:
+        return '\\n', None
+    if token_type == TokenType.STRING:
+        value = symbols.intern(decode_string(text))
+        return f'"{value}"', value
+    if token_type == TokenType.INTEGER:
+        return text, int(text)
+    if token_type == TokenType.FLOAT:
+        return text, float(text)
+    if token_type == TokenType.TRUE:
+        return text, True
+    if token_type == TokenType.FALSE:
+        return text, False
+    return text, None
+
+
+class TokenBuffer(Sequence):
+    """Tokens packed as typed arrays of kinds, start offsets and lengths over the source.
+
+    Token and SourceLocation objects are built only when an index is read,
+    and the last few are cached because the parser peeks at the same token
+    repeatedly.
+    """
+
+    CACHE_SIZE = 8
+
+    def __init__(self, source: str, filename: str, line_starts: List[int], symbols: SymbolTable):
+        self.source = source
+        self.filename = filename
+        self.line_starts = line_starts
+        self.symbols = symbols
+        self.kinds = array('B')    # TokenType.value
+        self.starts = array('I')   # Offset of the first character
+        self.lengths = array('I')  # Characters spanned in the source
+        self.cache_keys = [-1] * self.CACHE_SIZE
+        self.cache: List[Optional[Token]] = [None] * self.CACHE_SIZE
+
+    def append(self, token_type: TokenType, start: int, length: int):
+        """Add a token covering source[start:start + length]"""
+        self.kinds.append(token_type.value)
+        self.starts.append(start)
+        self.lengths.append(length)
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self.kinds)
+
+        slot = index % self.CACHE_SIZE
+        if self.cache_keys[slot] == index:
+            return self.cache[slot]
+
+        token = self.make_token(index)
+        self.cache_keys[slot] = index
+        self.cache[slot] = token
+        return token
+
+    def __iter__(self) -> Iterator[Token]:
+        return self.iter_from(0)
+
+    def iter_from(self, first: int) -> Iterator[Token]:
+        """Tokens from index first on"""
+        # Same tokens as make_token, tracking the line incrementally
+        source = self.source
+        filename = self.filename
+        line_starts = self.line_starts
+        symbols = self.symbols
+        plain = PLAIN_KINDS
+        line = bisect_right(line_starts, self.starts[first]) if first < len(self.kinds) else 1
+        line_start = line_starts[line - 1]
+        next_line_start = line_starts[line] if line < len(line_starts) else len(source) + 1
+
+        for kind, start, length in zip(memoryview(self.kinds)[first:], memoryview(self.starts)[first:],
+                                       memoryview(self.lengths)[first:]):
+            while start >= next_line_start:
+                line += 1
+                line_start = next_line_start
+                next_line_start = line_starts[line] if line < len(line_starts) else len(source) + 1
+
+            location = SourceLocation(filename, line, start - line_start + 1)
+            if kind in plain:
+                yield Token(TOKEN_TYPES[kind], source[start:start + length], location)
+            else:
+                token_type = TOKEN_TYPES[kind]
+                lexeme, literal = token_text(token_type, source[start:start + length], symbols)
+                yield Token(token_type, lexeme, location, literal)
+
+    def type_at(self, index: int) -> TokenType:
+        """Token type without building the Token"""
+        return TOKEN_TYPES[self.kinds[index]]
+
+    def location(self, index: int) -> SourceLocation:
+        """Source location of a token, via the line-start table"""
+        offset = self.starts[index]
+        line = bisect_right(self.line_starts, offset)
+        return SourceLocation(self.filename, line, offset - self.line_starts[line - 1] + 1)
+
+    def make_token(self, index: int) -> Token:
+        """Build the Token the character-level lexer would have produced"""
+        token_type = TOKEN_TYPES[self.kinds[index]]
+        start = self.starts[index]
+        lexeme, literal = token_text(token_type, self.source[start:start + self.lengths[index]],
+                                     self.symbols)
+        return Token(token_type, lexeme, self.location(index), literal)
+
+
 class Lexer:
     """Tokenizes 1 source code"""
 
@@ -170,9 +346,36 @@ class Lexer:
         'use_syntax': TokenType.USE_SYNTAX,
     }
 
-    def __init__(self, source: str, filename: str = "<input>"):
+    SINGLE_CHAR_TOKENS = {
+        '+': TokenType.PLUS,
+        '-': TokenType.MINUS,
+        '*': TokenType.STAR,
+        '/': TokenType.SLASH,
+        '%': TokenType.PERCENT,
+        '<': TokenType.LT,
+        '>': TokenType.GT,
+        '=': TokenType.ASSIGN,
+        '&': TokenType.AMPERSAND,
+        '|': TokenType.PIPE,
+        '^': TokenType.CARET,
+        '~': TokenType.TILDE,
+        '(': TokenType.LPAREN,
+        ')': TokenType.RPAREN,
+        '{': TokenType.LBRACE,
+        '}': TokenType.RBRACE,
+        '[': TokenType.LBRACKET,
+        ']': TokenType.RBRACKET,
+        ',': TokenType.COMMA,
+        ':': TokenType.COLON,
+        ';': TokenType.SEMICOLON,
+        '.': TokenType.DOT,
+        '?': TokenType.QUESTION,
+    }
+
+    def __init__(self, source: str, filename: str = "<input>", symbols: Optional[SymbolTable] = None):
         self.source = source
         self.filename = filename
+        self.symbols = symbols if symbols is not None else SymbolTable()
         self.pos = 0
         self.line = 1
         self.column = 1
@@ -277,6 +480,7 @@ class Lexer:
 
         self.advance()  # consume closing "
 
+        value = self.symbols.intern(value)
         return Token(TokenType.STRING, f'"{value}"', location, value)
 
     def tokenize_number(self) -> Token:
@@ -309,6 +513,8 @@ class Lexer:
 
         # Check if it's a keyword
         token_type = self.KEYWORDS.get(lexeme, TokenType.IDENTIFIER)
+        if token_type == TokenType.IDENTIFIER:
+            lexeme = self.symbols.intern(lexeme)
 
         # Set literal value for boolean keywords
         literal = None
@@ -331,175 +537,465 @@ class Lexer:
     def tokenize(self) -> List[Token]:
         """Tokenize entire source code"""
         while not self.is_at_end():
-            self.skip_whitespace()
+            self.scan_token()
 
-            if self.is_at_end():
-                break
+        # Add EOF token
+        self.tokens.append(Token(TokenType.EOF, '', self.current_location()))
 
-            location = self.current_location()
-            char = self.peek()
+        return self.tokens
 
-            # Comments
-            if char == '/' and self.peek(1) == '/':
-                self.skip_line_comment()
-                continue
+    def scan_token(self):
+        """Scan whitespace and then one token (or comment) at the current position"""
+        self.skip_whitespace()
 
-            if char == '/' and self.peek(1) == '*':
-                self.advance()  # consume /
-                self.skip_block_comment()
-                continue
+        if self.is_at_end():
+            return
 
-            # Newlines (significant in 1)
-            if char == '\n':
-                self.advance()
-                self.tokens.append(Token(TokenType.NEWLINE, '\\n', location))
-                continue
-
-            # String literals
-            if char == '"':
-                self.tokens.append(self.tokenize_string())
-                continue
-
-            # Numbers
-            if char.isdigit():
-                self.tokens.append(self.tokenize_number())
-                continue
-
-            # Identifiers and keywords
-            if char.isalpha() or char == '_':
-                self.tokens.append(self.tokenize_identifier())
-                continue
-
-            # Two-character operators
-            if char == '=' and self.peek(1) == '=':
-                self.advance()
-                self.advance()
-                self.tokens.append(Token(TokenType.EQ, '==', location))
-                continue
+        location = self.current_location()
+        char = self.peek()
 
-            if char == '!' and self.peek(1) == '=':
-                self.advance()
-                self.advance()
-                self.tokens.append(Token(TokenType.NE, '!=', location))
-                continue
+        # Comments
+        if char == '/' and self.peek(1) == '/':
+            self.skip_line_comment()
+            return
 
-            if char == '<' and self.peek(1) == '=':
-                self.advance()
-                self.advance()
-                self.tokens.append(Token(TokenType.LE, '<=', location))
-                continue
+        if char == '/' and self.peek(1) == '*':
+            self.advance()  # consume /
+            self.skip_block_comment()
+            return
 
-            if char == '>' and self.peek(1) == '=':
-                self.advance()
-                self.advance()
-                self.tokens.append(Token(TokenType.GE, '>=', location))
-                continue
+        # Newlines (significant in 1)
+        if char == '\n':
+            self.advance()
+            self.tokens.append(Token(TokenType.NEWLINE, '\\n', location))
+            return
+
+        # String literals
+        if char == '"':
+            self.tokens.append(self.tokenize_string())
+            return
+
+        # Numbers
+        if char.isdigit():
+            self.tokens.append(self.tokenize_number())
+            return
+
+        # Identifiers and keywords
+        if char.isalpha() or char == '_':
+            self.tokens.append(self.tokenize_identifier())
+            return
+
+        # Two-character operators
+        if char == '=' and self.peek(1) == '=':
+            self.advance()
+            self.advance()
+            self.tokens.append(Token(TokenType.EQ, '==', location))
+            return
 
-            if char == '<' and self.peek(1) == '<':
-                self.advance()
-                self.advance()
-                self.tokens.append(Token(TokenType.LSHIFT, '<<', location))
-                continue
+        if char == '!' and self.peek(1) == '=':
+            self.advance()
+            self.advance()
+            self.tokens.append(Token(TokenType.NE, '!=', location))
+            return
 
-            if char == '>' and self.peek(1) == '>':
-                self.advance()
-                self.advance()
-                self.tokens.append(Token(TokenType.RSHIFT, '>>', location))
-                continue
+        if char == '<' and self.peek(1) == '=':
+            self.advance()
+            self.advance()
+            self.tokens.append(Token(TokenType.LE, '<=', location))
+            return
 
-            if char == '+' and self.peek(1) == '=':
-                self.advance()
-                self.advance()
-                self.tokens.append(Token(TokenType.PLUS_ASSIGN, '+=', location))
-                continue
+        if char == '>' and self.peek(1) == '=':
+            self.advance()
+            self.advance()
+            self.tokens.append(Token(TokenType.GE, '>=', location))
+            return
 
-            if char == '-' and self.peek(1) == '=':
-                self.advance()
-                self.advance()
-                self.tokens.append(Token(TokenType.MINUS_ASSIGN, '-=', location))
-                continue
+        if char == '<' and self.peek(1) == '<':
+            self.advance()
+            self.advance()
+            self.tokens.append(Token(TokenType.LSHIFT, '<<', location))
+            return
 
-            if char == '*' and self.peek(1) == '=':
-                self.advance()
-                self.advance()
-                self.tokens.append(Token(TokenType.STAR_ASSIGN, '*=', location))
-                continue
+        if char == '>' and self.peek(1) == '>':
+            self.advance()
+            self.advance()
+            self.tokens.append(Token(TokenType.RSHIFT, '>>', location))
+            return
 
-            if char == '/' and self.peek(1) == '=':
-                self.advance()
-                self.advance()
-                self.tokens.append(Token(TokenType.SLASH_ASSIGN, '/=', location))
-                continue
+        if char == '+' and self.peek(1) == '=':
+            self.advance()
+            self.advance()
+            self.tokens.append(Token(TokenType.PLUS_ASSIGN, '+=', location))
+            return
 
-            if char == '-' and self.peek(1) == '>':
-                self.advance()
-                self.advance()
-                self.tokens.append(Token(TokenType.ARROW, '->', location))
-                continue
+        if char == '-' and self.peek(1) == '=':
+            self.advance()
+            self.advance()
+            self.tokens.append(Token(TokenType.MINUS_ASSIGN, '-=', location))
+            return
 
-            if char == '=' and self.peek(1) == '>':
-                self.advance()
-                self.advance()
-                self.tokens.append(Token(TokenType.FAT_ARROW, '=>', location))
-                continue
+        if char == '*' and self.peek(1) == '=':
+            self.advance()
+            self.advance()
+            self.tokens.append(Token(TokenType.STAR_ASSIGN, '*=', location))
+            return
 
-            if char == '*' and self.peek(1) == '*':
-                self.advance()
-                self.advance()
-                self.tokens.append(Token(TokenType.POWER, '**', location))
-                continue
-
-            # Single-character tokens
-            single_char_tokens = {
-                '+': TokenType.PLUS,
-                '-': TokenType.MINUS,
-                '*': TokenType.STAR,
-                '/': TokenType.SLASH,
-                '%': TokenType.PERCENT,
-                '<': TokenType.LT,
-                '>': TokenType.GT,
-                '=': TokenType.ASSIGN,
-                '&': TokenType.AMPERSAND,
-                '|': TokenType.PIPE,
-                '^': TokenType.CARET,
-                '~': TokenType.TILDE,
-                '(': TokenType.LPAREN,
-                ')': TokenType.RPAREN,
-                '{': TokenType.LBRACE,
-                '}': TokenType.RBRACE,
-                '[': TokenType.LBRACKET,
-                ']': TokenType.RBRACKET,
-                ',': TokenType.COMMA,
-                ':': TokenType.COLON,
-                ';': TokenType.SEMICOLON,
-                '.': TokenType.DOT,
-                '?': TokenType.QUESTION,
-            }
-
-            if char in single_char_tokens:
-                self.advance()
-                self.tokens.append(Token(single_char_tokens[char], char, location))
-                continue
+        if char == '/' and self.peek(1) == '=':
+            self.advance()
+            self.advance()
+            self.tokens.append(Token(TokenType.SLASH_ASSIGN, '/=', location))
+            return
 
-            # Unknown character
-            raise LexerError(f"Unexpected character: '{char}'", location)
+        if char == '-' and self.peek(1) == '>':
+            self.advance()
+            self.advance()
+            self.tokens.append(Token(TokenType.ARROW, '->', location))
+            return
 
-        # Add EOF token
-        self.tokens.append(Token(TokenType.EOF, '', self.current_location()))
+        if char == '=' and self.peek(1) == '>':
+            self.advance()
+            self.advance()
+            self.tokens.append(Token(TokenType.FAT_ARROW, '=>', location))
+            return
 
-        return self.tokens
+        if char == '*' and self.peek(1) == '*':
+            self.advance()
+            self.advance()
+            self.tokens.append(Token(TokenType.POWER, '**', location))
+            return
+
+        # Single-character tokens
+        if char in self.SINGLE_CHAR_TOKENS:
+            self.advance()
+            self.tokens.append(Token(self.SINGLE_CHAR_TOKENS[char], char, location))
+            return
+
+        # Unknown character
+        raise LexerError(f"Unexpected character: '{char}'", location)
+
+
+class RegexLexer(Lexer):
+    """Tokenizes 1 source code by matching whole tokens with one master regex.
+
+    Produces exactly the tokens and errors of Lexer. Input the pattern does not
+    cover (non-ASCII names and digits, bad escapes, unterminated strings, stray
+    characters) is handed to Lexer.scan_token at that position.
+    """
+
+    OPERATOR_TOKENS = {
+        '==': TokenType.EQ,
+        '!=': TokenType.NE,
+        '<=': TokenType.LE,
+        '>=': TokenType.GE,
+        '<<': TokenType.LSHIFT,
+        '>>': TokenType.RSHIFT,
+        '+=': TokenType.PLUS_ASSIGN,
+        '-=': TokenType.MINUS_ASSIGN,
+        '*=': TokenType.STAR_ASSIGN,
+        '/=': TokenType.SLASH_ASSIGN,
+        '->': TokenType.ARROW,
+        '=>': TokenType.FAT_ARROW,
+        '**': TokenType.POWER,
+        **Lexer.SINGLE_CHAR_TOKENS,
+    }
+
+    # Leading blanks are skipped inside the match; the alternatives are tried
+    # in the same order as the checks in scan_token
+    TOKEN_PATTERN = re.compile(r"""
+        [ \t\r]*
+        (?:
+          (?P<newline>\n)
+        | (?P<line_comment>//[^\n]*)
+        | (?P<block_comment>/\*(?:.*?\*/)?)
+        | (?P<string>"[^"\\]*(?:\\[ntr\\"][^"\\]*)*")
+        | (?P<float>[0-9]+\.[0-9]+)
+        | (?P<integer>[0-9]+)
+        | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+        | (?P<operator>==|!=|<=|>=|<<|>>|\+=|-=|\*=|/=|->|=>|\*\*|[-+*/%<>=&|^~(){}\[\],:;.?])
+        | (?P<other>.)
+        )
+    """, re.VERBOSE | re.DOTALL)
+
+    KEYWORD_LITERALS = {TokenType.TRUE: True, TokenType.FALSE: False}
+
+    def __init__(self, source: str, filename: str = "<input>", symbols: Optional[SymbolTable] = None):
+        super().__init__(source, filename, symbols)
+        self.line_starts = [0] + [m.end() for m in re.finditer('\n', source)]
+
+    def location_at(self, offset: int) -> SourceLocation:
+        """Source location of a character offset, via the line-start table"""
+        line = bisect_right(self.line_starts, offset)
+        return SourceLocation(self.filename, line, offset - self.line_starts[line - 1] + 1)
+
+    def build_token(self, kind: str, lexeme: str, location: SourceLocation) -> Token:
+        """Token for a match of one of the TOKEN_PATTERN token groups"""
+        if kind == 'name':
+            token_type = self.KEYWORDS.get(lexeme)
+            if token_type is None:
+                return Token(TokenType.IDENTIFIER, self.symbols.intern(lexeme), location)
+            return Token(token_type, lexeme, location, self.KEYWORD_LITERALS.get(token_type))
+        if kind == 'operator':
+            return Token(self.OPERATOR_TOKENS[lexeme], lexeme, location)
+        if kind == 'newline':
+            return Token(TokenType.NEWLINE, '\\n', location)
+        if kind == 'integer':
+            return Token(TokenType.INTEGER, lexeme, location, int(lexeme))
+        if kind == 'float':
+            return Token(TokenType.FLOAT, lexeme, location, float(lexeme))
+        value = self.symbols.intern(decode_string(lexeme))
+        return Token(TokenType.STRING, f'"{value}"', location, value)
+
+    def tokenize(self) -> 'TokenBuffer':
+        """Tokenize entire source code into a packed TokenBuffer"""
+        source = self.source
+        tokens = TokenBuffer(source, self.filename, self.line_starts, self.symbols)
+        kinds = tokens.kinds
+        starts = tokens.starts
+        lengths = tokens.lengths
+
+        keywords = {name: token_type.value for name, token_type in self.KEYWORDS.items()}
+        operators = {op: token_type.value for op, token_type in self.OPERATOR_TOKENS.items()}
+        identifier = TokenType.IDENTIFIER.value
+        newline = TokenType.NEWLINE.value
+        string = TokenType.STRING.value
+        numbers = {'integer': TokenType.INTEGER.value, 'float': TokenType.FLOAT.value}
+        end = len(source)
+
+        pos = 0
+        while pos < end:
+            fallback = None
+            for m in self.TOKEN_PATTERN.finditer(source, pos):
+                kind = m.lastgroup
+                start = m.start(kind)
+                stop = m.end()
+
+                if kind == 'name':
+                    code = keywords.get(m.group(kind), identifier)
+                elif kind == 'operator':
+                    code = operators[m.group(kind)]
+                elif kind == 'newline':
+                    code = newline
+                elif kind == 'line_comment':
+                    continue
+                elif kind == 'string':
+                    code = string
+                elif kind == 'block_comment':
+                    if stop - start == 2:
+                        raise LexerError("Unterminated block comment", self.location_at(end))
+                    continue
+                elif kind == 'other':
+                    fallback = start
+                    break
+                else:
+                    code = numbers[kind]
+
+                # Names and numbers run on through non-ASCII letters and digits
+                if code != newline and code != string and kind != 'operator' and \
+                   not source[stop:stop + 2].isascii():
+                    fallback = start
+                    break
 
+                kinds.append(code)
+                starts.append(start)
+                lengths.append(stop - start)
 
-def lex_file(filename: str) -> List[Token]:
+            if fallback is None:
+                break
+
+            # Let the character-level lexer scan this token, then resume after it
+            location = self.location_at(fallback)
+            self.pos = fallback
+            self.line = location.line
+            self.column = location.column
+            self.tokens = []
+            self.scan_token()
+            for token in self.tokens:
+                tokens.append(token.type, fallback, self.pos - fallback)
+            pos = self.pos
+
+        tokens.append(TokenType.EOF, end, 0)
+        return tokens
+
+
+class StreamingLexer(RegexLexer):
+    """Tokenizes text chunks as they arrive, holding only the unlexed tail.
+
+    A match is emitted once more input can no longer change it: it ends at
+    least two characters (scan_token's longest lookahead) before the end of
+    the buffer, or the input is exhausted. Tokens and errors match Lexer.
+    """
+
+    def __init__(self, chunks: Iterable[str], filename: str = "<input>",
+                 symbols: Optional[SymbolTable] = None):
+        super().__init__("", filename, symbols)
+        self.chunks = iter(chunks)
+
+    def read_more(self, buffer: str, minimum: int):
+        """Append chunks until buffer holds minimum chars; returns (buffer, exhausted)"""
+        parts = [buffer]
+        size = len(buffer)
+        while size < minimum:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                return ''.join(parts), True
+            parts.append(chunk)
+            size += len(chunk)
+        return ''.join(parts), False
+
+    def __iter__(self) -> Iterator[Token]:
+        filename = self.filename
+        pattern = self.TOKEN_PATTERN
+        build_token = self.build_token
+
+        buffer, final = self.read_more('', 1)
+        base = 0  # Offset of buffer[0] in the whole input
+        pos = 0
+        line = 1
+        line_start = 0  # Offset of the current line in the whole input
+
+        while True:
+            limit = len(buffer) if final else len(buffer) - 2
+            resume = None
+            fallback = False
+
+            for m in pattern.finditer(buffer, pos):
+                kind = m.lastgroup
+                start = m.start(kind)
+                end = m.end()
+
+                if end > limit:
+                    resume = start
+                    break
+
+                if kind == 'block_comment' and end - start == 2:
+                    if not final:
+                        resume = start
+                        break
+                    newlines = buffer.count('\n', start)
+                    if newlines:
+                        line += newlines
+                        line_start = base + buffer.rfind('\n') + 1
+                    location = SourceLocation(filename, line, base + len(buffer) - line_start + 1)
+                    raise LexerError("Unterminated block comment", location)
+
+                if kind == 'other' or (kind in ('name', 'integer', 'float') and
+                                       not buffer[end:end + 2].isascii()):
+                    resume = start
+                    fallback = True
+                    break
+
+                pos = end
+                if kind == 'line_comment':
+                    continue
+
+                if kind != 'block_comment':
+                    location = SourceLocation(filename, line, base + start - line_start + 1)
+                    yield build_token(kind, m.group(kind), location)
+
+                if kind == 'newline':
+                    line += 1
+                    line_start = base + end
+                elif kind == 'string' or kind == 'block_comment':
+                    newlines = buffer.count('\n', start, end)
+                    if newlines:
+                        line += newlines
+                        line_start = base + buffer.rfind('\n', start, end) + 1
+
+            if fallback:
+                # Let the character-level lexer scan this token from the buffer
+                self.source = buffer
+                self.pos = resume
+                self.line = line
+                self.column = base + resume - line_start + 1
+                self.tokens = []
+                try:
+                    self.scan_token()
+                    complete = final or self.pos <= limit
+                except (LexerError, ValueError):
+                    # May just be the buffer ending mid-token (ValueError is
+                    # int()/float() on odd Unicode digits, as in Lexer)
+                    if final:
+                        raise
+                    complete = False
+
+                if complete:
+                    yield from self.tokens
+                    pos = self.pos
+                    line = self.line
+                    line_start = base + self.pos - self.column + 1
+                    continue
+
+            if resume is None:
+                if final:
+                    break
+                resume = pos
+
+            # Drop the consumed text and read at least as much again
+            buffer = buffer[resume:]
+            base += resume
+            pos = 0
+            buffer, final = self.read_more(buffer, 2 * len(buffer) + 1)
+
+        yield Token(TokenType.EOF, '', SourceLocation(filename, line, base + len(buffer) - line_start + 1))
+
+
+# Lexer implementations selectable with --lexer
+LEXERS = {
+    'regex': RegexLexer,
+    'char': Lexer,
+}
+
+
+def lex_file(filename: str, engine: str = 'regex', symbols: Optional[SymbolTable] = None) -> Sequence:
     """Tokenize a file"""
     with open(filename, 'r', encoding='utf-8') as f:
         source = f.read()
 
-    lexer = Lexer(source, filename)
+    lexer = LEXERS[engine](source, filename, symbols)
     return lexer.tokenize()
 
 
-def lex_string(source: str, filename: str = "<input>") -> List[Token]:
+def lex_string(source: str, filename: str = "<input>", engine: str = 'regex',
+               symbols: Optional[SymbolTable] = None) -> Sequence:
     """Tokenize a string"""
-    lexer = Lexer(source, filename)
+    lexer = LEXERS[engine](source, filename, symbols)
     return lexer.tokenize()
+
+
+# Characters read per chunk when streaming from a file or mmap
+CHUNK_SIZE = 64 * 1024
+
+
+def read_chunks(source, chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    """Text chunks from a str, a text or binary file object, or an mmap.
+
+    Bytes are decoded as UTF-8 with newline translation, the same way
+    lex_file reads a file in text mode.
+    """
+    if isinstance(source, str):
+        yield source
+        return
+
+    decoder = None
+    while True:
+        data = source.read(chunk_size)
+        if not data:
+            break
+        if isinstance(data, bytes):
+            if decoder is None:
+                decoder = io.IncrementalNewlineDecoder(
+                    codecs.getincrementaldecoder('utf-8')(), translate=True)
+            data = decoder.decode(data)
+        if data:
+            yield data
+
+    if decoder is not None:
+        tail = decoder.decode(b'', final=True)
+        if tail:
+            yield tail
+
+
+def iter_tokens(source, filename: str = "<input>", chunk_size: int = CHUNK_SIZE,
+                symbols: Optional[SymbolTable] = None) -> Iterator[Token]:
+    """Lazily tokenize a str, a text or binary file object, or an mmap"""
+    return iter(StreamingLexer(read_chunks(source, chunk_size), filename, symbols))
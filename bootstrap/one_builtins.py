@@ -3,13 +3,23 @@ Built-in functions for 1 language.
 These are available to all 1 programs.
 """
 
+from pvector import PVector
+from rope import Rope, StringBuilder, ROPE_MIN_LENGTH, concat, as_text
+
+
+def as_vector(lst):
+    """Runtime list value as a PVector (plain lists come from older bytecode)"""
+    if isinstance(lst, PVector):
+        return lst
+    return PVector.from_iterable(lst)
+
 def builtin_len(value):
     """Get length of string or list"""
     return len(value)
 
 def builtin_substr(s, start, end):
     """Get substring from start to end"""
-    return s[start:end]
+    return as_text(s)[start:end]
 
 def builtin_char_at(s, index):
     """Get character at index"""
@@ -18,17 +28,25 @@ def builtin_char_at(s, index):
     return s[index]
 
 def builtin_str_concat(a, b):
-    """Concatenate two strings"""
-    return str(a) + str(b)
+    """Concatenate two strings (long results become a lazily flattened Rope)"""
+    if type(a) is str and type(b) is str and len(a) + len(b) < ROPE_MIN_LENGTH:
+        return a + b
+    if not isinstance(a, (str, Rope)):
+        a = str(a)
+    if not isinstance(b, (str, Rope)):
+        b = str(b)
+    return concat(a, b)
 
 def builtin_str_eq(a, b):
-    """Compare two strings"""
+    """Compare two strings (interned names and literals match by identity)"""
+    if a is b:
+        return True
     return str(a) == str(b)
 
 def builtin_str_to_int(s):
     """Convert string to integer"""
     try:
-        return int(s)
+        return int(as_text(s))
     except ValueError:
         return 0
 
@@ -38,24 +56,22 @@ def builtin_int_to_str(n):
 
 def builtin_is_digit(s):
     """Check if string is a digit"""
-    result = len(s) == 1 and s.isdigit()
+    result = len(s) == 1 and as_text(s).isdigit()
     return 1 if result else 0
 
 def builtin_is_alpha(s):
     """Check if string is alphabetic"""
-    result = len(s) == 1 and s.isalpha()
+    result = len(s) == 1 and as_text(s).isalpha()
     return 1 if result else 0
 
 def builtin_is_alnum(s):
     """Check if string is alphanumeric"""
-    result = len(s) == 1 and s.isalnum()
+    result = len(s) == 1 and as_text(s).isalnum()
     return 1 if result else 0
 
 def builtin_list_append(lst, item):
-    """Append item to list (returns new list)"""
-    new_list = lst.copy()
-    new_list.append(item)
-    return new_list
+    """Append item to list (returns new list sharing structure with lst)"""
+    return as_vector(lst).append(item)
 
 def builtin_list_get(lst, index):
     """Get item from list at index"""
@@ -64,11 +80,23 @@ def builtin_list_get(lst, index):
     return lst[index]
 
 def builtin_list_set(lst, index, value):
-    """Set item in list (returns new list)"""
-    new_list = lst.copy()
-    if 0 <= index < len(lst):
-        new_list[index] = value
-    return new_list
+    """Set item in list (returns new list sharing structure with lst)"""
+    vector = as_vector(lst)
+    if 0 <= index < len(vector):
+        return vector.set(index, value)
+    return vector
+
+def builtin_sb_new():
+    """Create an empty string builder"""
+    return StringBuilder()
+
+def builtin_sb_append(sb, s):
+    """Append to a string builder in place (returns the same builder)"""
+    return sb.append(s)
+
+def builtin_sb_build(sb):
+    """Get the string built so far"""
+    return sb.build()
 
 def builtin_exit(code):
     """Exit program with code"""
@@ -90,5 +118,8 @@ BUILTINS = {
     'list_append': builtin_list_append,
     'list_get': builtin_list_get,
     'list_set': builtin_list_set,
+    'sb_new': builtin_sb_new,
+    'sb_append': builtin_sb_append,
+    'sb_build': builtin_sb_build,
     'exit': builtin_exit,
 }
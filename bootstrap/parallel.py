@@ -0,0 +1,110 @@
+"""
+Parallel compilation for the 1 language bootstrap compiler.
+Once every signature is in the global environment, each function body
+can be checked and generated on its own, so a pool of worker processes
+compiles the bodies in chunks and the results are merged in source order.
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+
+import parser as parser_module
+from parser import Program
+from lexer import SymbolTable
+from type_checker import TypeChecker, TypeCheckError, Type
+from codegen import BytecodeModule, CodeGenerator, Function, compact_function
+
+# Chunks per worker: enough to even out functions of different sizes,
+# few enough that each task is worth sending
+CHUNKS_PER_JOB = 4
+
+# Set in each worker by init_worker; with fork they are inherited, not pickled
+_declarations: List[parser_module.Function] = []
+_global_types: Dict[str, Type] = {}
+_symbols = SymbolTable()
+
+
+def init_worker(declarations: List[parser_module.Function], global_types: Dict[str, Type],
+                symbols: SymbolTable):
+    """Give a worker the program's functions and signatures"""
+    global _declarations, _global_types, _symbols
+    _declarations = declarations
+    _global_types = global_types
+    _symbols = symbols
+
+
+def compile_chunk(chunk: Tuple[int, int]) -> Tuple[List[TypeCheckError], List[Function]]:
+    """Check declarations[start:end]; generate them if they check cleanly.
+
+    Functions come back as compact code only, as from a .1bc image:
+    pickling Instruction lists would cost more than generating them.
+    """
+    start, end = chunk
+    declarations = _declarations[start:end]
+
+    checker = TypeChecker()
+    checker.global_env.bindings = _global_types
+    for decl in declarations:
+        checker.check_function(decl)
+    if checker.errors:
+        return checker.errors, []
+
+    generator = CodeGenerator()
+    generator.module.symbols = _symbols
+    compiled = []
+    for decl in declarations:
+        generator.generate_function(decl)
+        func = generator.module.functions[decl.name]
+        compact_function(func)
+        func.instructions = []
+        compiled.append(func)
+    return [], compiled
+
+
+def chunks(count: int, jobs: int) -> List[Tuple[int, int]]:
+    """Split range(count) into contiguous (start, end) chunks for jobs workers"""
+    size = max(1, -(-count // (jobs * CHUNKS_PER_JOB)))
+    return [(start, min(start + size, count)) for start in range(0, count, size)]
+
+
+def intern_names(func: Function, symbols: SymbolTable):
+    """Share func's names and string operands with the rest of the module"""
+    intern = symbols.intern
+    func.name = intern(func.name)
+    func.param_names = [intern(name) for name in func.param_names]
+    func.local_names = [intern(name) for name in func.local_names]
+    table = func.code.operand_table
+    for i, operand in enumerate(table):
+        if type(operand) is str:
+            table[i] = intern(operand)
+
+
+def compile_functions(program: Program, checker: TypeChecker, jobs: int) -> BytecodeModule:
+    """Stages 3-4 with function bodies spread over jobs processes.
+
+    Errors land in checker.errors in the order a serial check reports
+    them, and functions enter the module in declaration order, so the
+    result does not depend on which worker finished first. The module
+    is only complete when there are no errors.
+    """
+    checker.errors = []
+    checker.declare_functions(program)
+
+    declarations = [decl for decl in program.declarations
+                    if isinstance(decl, parser_module.Function)]
+    module = BytecodeModule(symbols=program.symbols)
+
+    # fork shares the parsed program with the workers instead of pickling it
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=context, initializer=init_worker,
+                             initargs=(declarations, checker.global_env.bindings,
+                                       program.symbols)) as pool:
+        for errors, compiled in pool.map(compile_chunk, chunks(len(declarations), jobs)):
+            checker.errors.extend(errors)
+            for func in compiled:
+                intern_names(func, program.symbols)
+                module.functions[func.name] = func
+
+    return module
@@ -4,9 +4,9 @@ Converts tokens into an Abstract Syntax Tree (AST).
 """
 
 from dataclasses import dataclass, field
-from typing import List, Optional, Union, Any
+from typing import Iterable, Iterator, List, Optional, Sequence, Union, Any
 from enum import Enum, auto
-from lexer import Token, TokenType, SourceLocation
+from lexer import Token, TokenType, SourceLocation, SymbolTable, TokenBuffer
 
 
 class ASTNodeType(Enum):
@@ -52,26 +52,56 @@ class ASTNodeType(Enum):
     LAMBDA = auto()
 
 
-@dataclass
 class ASTNode:
-    """Base class for AST nodes"""
-    node_type: ASTNodeType
-    location: SourceLocation
-    metadata: dict = field(default_factory=dict)
+    """Base class for AST nodes.
+
+    Nodes use __slots__ and create their metadata dict on first access.
+    """
+    __slots__ = ('node_type', 'location', '_metadata')
+
+    def __init__(self, node_type: ASTNodeType, location: SourceLocation):
+        self.node_type = node_type
+        self.location = location
+        self._metadata = None
+
+    @property
+    def metadata(self) -> dict:
+        """Per-node annotations (e.g. the inferred type), created on first use"""
+        metadata = self._metadata
+        if metadata is None:
+            metadata = self._metadata = {}
+        return metadata
+
+    @metadata.setter
+    def metadata(self, value: dict):
+        self._metadata = value
+
+    def fields(self):
+        """(name, value) of each node-specific attribute, in declaration order"""
+        for cls in reversed(type(self).__mro__):
+            for name in cls.__dict__.get('__slots__', ()):
+                if name not in ASTNode.__slots__:
+                    yield name, getattr(self, name)
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={value!r}" for name, value in self.fields())
+        return f"{type(self).__name__}({fields})"
 
 
-@dataclass
 class Program(ASTNode):
     """Root program node"""
-    declarations: List[ASTNode] = field(default_factory=list)
+    __slots__ = ('declarations', 'symbols')
 
-    def __init__(self, location: SourceLocation):
+    def __init__(self, location: SourceLocation, symbols: Optional[SymbolTable] = None):
         super().__init__(ASTNodeType.PROGRAM, location)
-        self.declarations = []
+        self.declarations: List[ASTNode] = []
+        self.symbols = symbols if symbols is not None else SymbolTable()
 
 
 class Parameter(ASTNode):
     """Function parameter"""
+    __slots__ = ('name', 'type_annotation', 'constraint')
+
     def __init__(self, location: SourceLocation, name: str):
         super().__init__(ASTNodeType.PARAMETER, location)
         self.name = name
@@ -81,6 +111,8 @@ class Parameter(ASTNode):
 
 class TypeAnnotation(ASTNode):
     """Type annotation"""
+    __slots__ = ('name', 'type_args')
+
     def __init__(self, location: SourceLocation, name: str):
         super().__init__(ASTNodeType.TYPE_ANNOTATION, location)
         self.name = name
@@ -89,6 +121,8 @@ class TypeAnnotation(ASTNode):
 
 class Constraint(ASTNode):
     """Where clause constraint"""
+    __slots__ = ('expression',)
+
     def __init__(self, location: SourceLocation, expression: ASTNode):
         super().__init__(ASTNodeType.CONSTRAINT, location)
         self.expression = expression
@@ -96,6 +130,8 @@ class Constraint(ASTNode):
 
 class Requirement(ASTNode):
     """Function requirement"""
+    __slots__ = ('description',)
+
     def __init__(self, location: SourceLocation, description: str):
         super().__init__(ASTNodeType.REQUIREMENT, location)
         self.description = description
@@ -103,6 +139,8 @@ class Requirement(ASTNode):
 
 class Function(ASTNode):
     """Function declaration"""
+    __slots__ = ('name', 'inputs', 'outputs', 'requirements', 'body', 'deferred_body')
+
     def __init__(self, location: SourceLocation, name: str):
         super().__init__(ASTNodeType.FUNCTION, location)
         self.name = name
@@ -110,10 +148,20 @@ class Function(ASTNode):
         self.outputs: List[Parameter] = []
         self.requirements: List[Requirement] = []
         self.body: Optional['Block'] = None
+        self.deferred_body: Optional['DeferredBody'] = None  # Set instead of body by a lazy parse
+
+    def parse_body(self) -> Optional['Block']:
+        """The body, parsing a deferred one on first use"""
+        if self.deferred_body is not None:
+            self.body = self.deferred_body.parse()
+            self.deferred_body = None
+        return self.body
 
 
 class Block(ASTNode):
     """Block of statements"""
+    __slots__ = ('statements',)
+
     def __init__(self, location: SourceLocation):
         super().__init__(ASTNodeType.BLOCK, location)
         self.statements: List[ASTNode] = []
@@ -121,6 +169,8 @@ class Block(ASTNode):
 
 class Return(ASTNode):
     """Return statement"""
+    __slots__ = ('value',)
+
     def __init__(self, location: SourceLocation, value: Optional[ASTNode] = None):
         super().__init__(ASTNodeType.RETURN, location)
         self.value = value
@@ -128,6 +178,8 @@ class Return(ASTNode):
 
 class If(ASTNode):
     """If statement"""
+    __slots__ = ('condition', 'then_block', 'else_block')
+
     def __init__(self, location: SourceLocation, condition: ASTNode, then_block: Block):
         super().__init__(ASTNodeType.IF, location)
         self.condition = condition
@@ -137,6 +189,8 @@ class If(ASTNode):
 
 class While(ASTNode):
     """While loop"""
+    __slots__ = ('condition', 'body')
+
     def __init__(self, location: SourceLocation, condition: ASTNode, body: Block):
         super().__init__(ASTNodeType.WHILE, location)
         self.condition = condition
@@ -145,6 +199,8 @@ class While(ASTNode):
 
 class Ensure(ASTNode):
     """Ensure/otherwise statement"""
+    __slots__ = ('condition', 'then_block', 'else_block')
+
     def __init__(self, location: SourceLocation, condition: ASTNode, then_block: Block):
         super().__init__(ASTNodeType.ENSURE, location)
         self.condition = condition
@@ -154,6 +210,8 @@ class Ensure(ASTNode):
 
 class Assignment(ASTNode):
     """Assignment statement"""
+    __slots__ = ('target', 'value', 'operator')
+
     def __init__(self, location: SourceLocation, target: ASTNode, value: ASTNode, operator: str = "="):
         super().__init__(ASTNodeType.ASSIGNMENT, location)
         self.target = target
@@ -163,6 +221,8 @@ class Assignment(ASTNode):
 
 class BinaryOp(ASTNode):
     """Binary operation"""
+    __slots__ = ('left', 'operator', 'right')
+
     def __init__(self, location: SourceLocation, left: ASTNode, operator: str, right: ASTNode):
         super().__init__(ASTNodeType.BINARY_OP, location)
         self.left = left
@@ -172,6 +232,8 @@ class BinaryOp(ASTNode):
 
 class UnaryOp(ASTNode):
     """Unary operation"""
+    __slots__ = ('operator', 'operand')
+
     def __init__(self, location: SourceLocation, operator: str, operand: ASTNode):
         super().__init__(ASTNodeType.UNARY_OP, location)
         self.operator = operator
@@ -180,6 +242,8 @@ class UnaryOp(ASTNode):
 
 class Call(ASTNode):
     """Function call"""
+    __slots__ = ('function', 'arguments')
+
     def __init__(self, location: SourceLocation, function: ASTNode):
         super().__init__(ASTNodeType.CALL, location)
         self.function = function
@@ -188,6 +252,8 @@ class Call(ASTNode):
 
 class Member(ASTNode):
     """Member access (obj.member)"""
+    __slots__ = ('object', 'member')
+
     def __init__(self, location: SourceLocation, object: ASTNode, member: str):
         super().__init__(ASTNodeType.MEMBER, location)
         self.object = object
@@ -196,6 +262,8 @@ class Member(ASTNode):
 
 class Index(ASTNode):
     """Index access (obj[index])"""
+    __slots__ = ('object', 'index')
+
     def __init__(self, location: SourceLocation, object: ASTNode, index: ASTNode):
         super().__init__(ASTNodeType.INDEX, location)
         self.object = object
@@ -204,6 +272,8 @@ class Index(ASTNode):
 
 class Literal(ASTNode):
     """Literal value"""
+    __slots__ = ('value',)
+
     def __init__(self, location: SourceLocation, value: Any):
         super().__init__(ASTNodeType.LITERAL, location)
         self.value = value
@@ -211,18 +281,40 @@ class Literal(ASTNode):
 
 class Identifier(ASTNode):
     """Identifier"""
+    __slots__ = ('name', 'binding')
+
     def __init__(self, location: SourceLocation, name: str):
         super().__init__(ASTNodeType.IDENTIFIER, location)
         self.name = name
+        self.binding = None  # resolver.Binding of a local; None for a global
 
 
 class ListLiteral(ASTNode):
     """List literal [a, b, c]"""
+    __slots__ = ('elements',)
+
     def __init__(self, location: SourceLocation):
         super().__init__(ASTNodeType.LIST_LITERAL, location)
         self.elements: List[ASTNode] = []
 
 
+def expression_children(expr: ASTNode) -> List[ASTNode]:
+    """Direct sub-expressions of an expression node, in evaluation order"""
+    if isinstance(expr, BinaryOp):
+        return [expr.left, expr.right]
+    if isinstance(expr, UnaryOp):
+        return [expr.operand]
+    if isinstance(expr, Call):
+        return [expr.function, *expr.arguments]
+    if isinstance(expr, Member):
+        return [expr.object]
+    if isinstance(expr, Index):
+        return [expr.object, expr.index]
+    if isinstance(expr, ListLiteral):
+        return expr.elements
+    return []
+
+
 class ParseError(Exception):
     """Parsing error"""
     def __init__(self, message: str, location: SourceLocation):
@@ -231,12 +323,103 @@ class ParseError(Exception):
         super().__init__(f"{location}: {message}")
 
 
+# Binding power of each binary operator; higher binds tighter. Every level
+# is left-associative. Adding an operator only takes an entry here.
+BINDING_POWER = {
+    TokenType.OR: 1,
+    TokenType.AND: 2,
+    TokenType.EQ: 3,
+    TokenType.NE: 3,
+    TokenType.LT: 4,
+    TokenType.GT: 4,
+    TokenType.LE: 4,
+    TokenType.GE: 4,
+    TokenType.PLUS: 5,
+    TokenType.MINUS: 5,
+    TokenType.STAR: 6,
+    TokenType.SLASH: 6,
+    TokenType.PERCENT: 6,
+}
+
+# Prefix operators; they bind tighter than any binary operator
+UNARY_OPERATORS = frozenset({TokenType.MINUS, TokenType.NOT, TokenType.TILDE})
+
+# Tokens that parse as a Literal node
+LITERAL_TOKENS = frozenset({TokenType.TRUE, TokenType.FALSE, TokenType.NULL,
+                            TokenType.INTEGER, TokenType.FLOAT, TokenType.STRING})
+
+# Frames on Parser.expression's explicit stack, one per construct still
+# waiting for a sub-expression
+FRAME_BINARY = 0   # (kind, min_power, left, operator)
+FRAME_UNARY = 1    # (kind, operator)
+FRAME_GROUP = 2    # (kind, min_power)
+FRAME_CALL = 3     # (kind, min_power, call)
+FRAME_INDEX = 4    # (kind, min_power, object)
+FRAME_LIST = 5     # (kind, min_power, list_literal)
+
+
+def tokens_from(tokens: Sequence[Token], start: int) -> Iterator[Token]:
+    """Iterate tokens from index start on"""
+    if isinstance(tokens, TokenBuffer):
+        return tokens.iter_from(start)
+    return (tokens[index] for index in range(start, len(tokens)))
+
+
+def token_kinds(tokens: Sequence[Token]) -> bytes:
+    """TokenType value of each token, one byte each"""
+    if isinstance(tokens, TokenBuffer):
+        return tokens.kinds.tobytes()
+    return bytes(token.type.value for token in tokens)
+
+
+def block_end(kinds: bytes, start: int) -> int:
+    """Index just past the '}' matching the '{' at start, or -1 if unmatched"""
+    lbrace = TokenType.LBRACE.value
+    rbrace = TokenType.RBRACE.value
+    index = start
+    depth = 0
+    while True:
+        close = kinds.find(rbrace, index)
+        if close < 0:
+            return -1
+
+        opening = kinds.find(lbrace, index, close)
+        if opening >= 0:
+            depth += 1
+            index = opening + 1
+        else:
+            depth -= 1
+            index = close + 1
+            if depth == 0:
+                return index
+
+
+class DeferredBody:
+    """Token span of a brace-delimited function body that has not been parsed"""
+    __slots__ = ('tokens', 'start', 'end', 'symbols')
+
+    def __init__(self, tokens: List[Token], start: int, end: int, symbols: SymbolTable):
+        self.tokens = tokens
+        self.start = start  # Index of the opening '{'
+        self.end = end      # Index just past the matching '}'
+        self.symbols = symbols
+
+    def parse(self) -> 'Block':
+        """The Block an eager parse would have built"""
+        return StreamingParser(tokens_from(self.tokens, self.start), self.symbols).block()
+
+    def __repr__(self):
+        return f"DeferredBody(tokens {self.start}..{self.end})"
+
+
 class Parser:
     """Parses tokens into AST"""
 
-    def __init__(self, tokens: List[Token]):
+    def __init__(self, tokens: List[Token], symbols: Optional[SymbolTable] = None):
         self.tokens = tokens
         self.current = 0
+        self.symbols = symbols if symbols is not None else SymbolTable()
+        self.lazy_bodies = False
 
     def is_at_end(self) -> bool:
         """Check if at end of tokens"""
@@ -290,7 +473,7 @@ class Parser:
 
     def parse(self) -> Program:
         """Parse entire program"""
-        program = Program(SourceLocation("<program>", 1, 1))
+        program = Program(SourceLocation("<program>", 1, 1), self.symbols)
 
         self.skip_newlines()
 
@@ -346,7 +529,10 @@ class Parser:
         self.consume(TokenType.COLON, "Expected ':' after 'implementation'")
         self.skip_newlines()
 
-        function.body = self.block()
+        if self.lazy_bodies and self.check(TokenType.LBRACE):
+            function.deferred_body = self.deferred_block()
+        else:
+            function.body = self.block()
 
         return function
 
@@ -570,167 +756,222 @@ class Parser:
         return expr
 
     def expression(self) -> ASTNode:
-        """Parse expression"""
-        return self.or_expression()
-
-    def or_expression(self) -> ASTNode:
-        """Parse or expression"""
-        left = self.and_expression()
-
-        while self.match(TokenType.OR):
-            operator = self.previous().lexeme
-            right = self.and_expression()
-            left = BinaryOp(left.location, left, operator, right)
-
-        return left
-
-    def and_expression(self) -> ASTNode:
-        """Parse and expression"""
-        left = self.equality()
-
-        while self.match(TokenType.AND):
-            operator = self.previous().lexeme
-            right = self.equality()
-            left = BinaryOp(left.location, left, operator, right)
-
-        return left
-
-    def equality(self) -> ASTNode:
-        """Parse equality expression"""
-        left = self.comparison()
+        """Parse expression.
 
-        while self.match(TokenType.EQ, TokenType.NE):
-            operator = self.previous().lexeme
-            right = self.comparison()
-            left = BinaryOp(left.location, left, operator, right)
-
-        return left
-
-    def comparison(self) -> ASTNode:
-        """Parse comparison expression"""
-        left = self.addition()
-
-        while self.match(TokenType.LT, TokenType.GT, TokenType.LE, TokenType.GE):
-            operator = self.previous().lexeme
-            right = self.addition()
-            left = BinaryOp(left.location, left, operator, right)
-
-        return left
-
-    def addition(self) -> ASTNode:
-        """Parse addition expression"""
-        left = self.multiplication()
-
-        while self.match(TokenType.PLUS, TokenType.MINUS):
-            operator = self.previous().lexeme
-            right = self.multiplication()
-            left = BinaryOp(left.location, left, operator, right)
-
-        return left
-
-    def multiplication(self) -> ASTNode:
-        """Parse multiplication expression"""
-        left = self.unary()
-
-        while self.match(TokenType.STAR, TokenType.SLASH, TokenType.PERCENT):
-            operator = self.previous().lexeme
-            right = self.unary()
-            left = BinaryOp(left.location, left, operator, right)
-
-        return left
-
-    def unary(self) -> ASTNode:
-        """Parse unary expression"""
-        if self.match(TokenType.MINUS, TokenType.NOT, TokenType.TILDE):
-            operator = self.previous().lexeme
-            operand = self.unary()
-            return UnaryOp(self.previous().location, operator, operand)
-
-        return self.postfix()
-
-    def postfix(self) -> ASTNode:
-        """Parse postfix expression (calls, member access, indexing)"""
-        expr = self.primary()
+        Precedence climbing over BINDING_POWER, driven by an explicit stack
+        of pending frames instead of recursion, so nesting depth is limited
+        by memory rather than the Python stack.
+        """
+        stack: List[tuple] = []
+        min_power = 0      # Binary operators must bind tighter than this
+        expr = None        # Completed operand, or None while one is expected
 
         while True:
-            if self.match(TokenType.LPAREN):
-                # Function call
+            if expr is None:
+                # Prefix operators, then a primary; ( and [ open a nested expression
+                token_type = self.peek().type
+                while token_type in UNARY_OPERATORS:
+                    stack.append((FRAME_UNARY, self.advance().lexeme))
+                    token_type = self.peek().type
+
+                if token_type == TokenType.LPAREN:
+                    self.advance()
+                    stack.append((FRAME_GROUP, min_power))
+                    min_power = 0
+                    continue
+
+                if token_type == TokenType.LBRACKET:
+                    list_lit = ListLiteral(self.advance().location)
+                    if not self.check(TokenType.RBRACKET):
+                        stack.append((FRAME_LIST, min_power, list_lit))
+                        min_power = 0
+                        continue
+                    self.advance()
+                    expr = list_lit
+                else:
+                    expr = self.primary()
+
+            # Postfix operators (calls, member access, indexing)
+            token_type = self.peek().type
+            if token_type == TokenType.LPAREN:
+                self.advance()
                 call = Call(expr.location, expr)
+                if self.check(TokenType.RPAREN):
+                    self.advance()
+                    expr = call
+                else:
+                    stack.append((FRAME_CALL, min_power, call))
+                    min_power = 0
+                    expr = None
+                continue
+
+            if token_type == TokenType.DOT:
+                self.advance()
+                member_token = self.consume(TokenType.IDENTIFIER, "Expected member name")
+                expr = Member(expr.location, expr, member_token.lexeme)
+                continue
 
-                if not self.check(TokenType.RPAREN):
-                    while True:
-                        call.arguments.append(self.expression())
-                        if not self.match(TokenType.COMMA):
-                            break
-
+            if token_type == TokenType.LBRACKET:
+                self.advance()
+                stack.append((FRAME_INDEX, min_power, expr))
+                min_power = 0
+                expr = None
+                continue
+
+            # The operand is complete; prefix operators apply to all of it
+            while stack and stack[-1][0] == FRAME_UNARY:
+                expr = UnaryOp(self.previous().location, stack.pop()[1], expr)
+
+            # A tighter-binding operator takes expr as its left operand
+            power = BINDING_POWER.get(token_type)
+            if power is not None and power > min_power:
+                stack.append((FRAME_BINARY, min_power, expr, self.advance().lexeme))
+                min_power = power
+                expr = None
+                continue
+
+            if not stack:
+                return expr
+
+            # Otherwise expr completes the innermost pending frame
+            frame = stack.pop()
+            kind = frame[0]
+            if kind == FRAME_BINARY:
+                left = frame[2]
+                expr = BinaryOp(left.location, left, frame[3], expr)
+
+            elif kind == FRAME_GROUP:
+                self.consume(TokenType.RPAREN, "Expected ')' after expression")
+
+            elif kind == FRAME_CALL:
+                call = frame[2]
+                call.arguments.append(expr)
+                if self.match(TokenType.COMMA):
+                    stack.append(frame)
+                    expr = None
+                    continue
                 self.consume(TokenType.RPAREN, "Expected ')' after arguments")
                 expr = call
 
-            elif self.match(TokenType.DOT):
-                # Member access
-                member_token = self.consume(TokenType.IDENTIFIER, "Expected member name")
-                expr = Member(expr.location, expr, member_token.lexeme)
-
-            elif self.match(TokenType.LBRACKET):
-                # Index access
-                index = self.expression()
+            elif kind == FRAME_INDEX:
                 self.consume(TokenType.RBRACKET, "Expected ']' after index")
-                expr = Index(expr.location, expr, index)
+                expr = Index(frame[2].location, frame[2], expr)
 
             else:
-                break
+                list_lit = frame[2]
+                list_lit.elements.append(expr)
+                if self.match(TokenType.COMMA):
+                    stack.append(frame)
+                    expr = None
+                    continue
+                self.consume(TokenType.RBRACKET, "Expected ']' after list elements")
+                expr = list_lit
 
-        return expr
+            min_power = frame[1]
 
     def primary(self) -> ASTNode:
-        """Parse primary expression"""
-        # Literals
-        if self.match(TokenType.TRUE, TokenType.FALSE, TokenType.NULL):
-            return Literal(self.previous().location, self.previous().literal)
-
-        if self.match(TokenType.INTEGER, TokenType.FLOAT):
-            return Literal(self.previous().location, self.previous().literal)
-
-        if self.match(TokenType.STRING):
-            return Literal(self.previous().location, self.previous().literal)
-
-        # Identifier
-        if self.match(TokenType.IDENTIFIER):
-            return Identifier(self.previous().location, self.previous().lexeme)
-
-        # Parenthesized expression
-        if self.match(TokenType.LPAREN):
-            expr = self.expression()
-            self.consume(TokenType.RPAREN, "Expected ')' after expression")
-            return expr
+        """Parse a literal or identifier"""
+        token = self.peek()
+
+        if token.type in LITERAL_TOKENS:
+            self.advance()
+            return Literal(token.location, token.literal)
+
+        if token.type == TokenType.IDENTIFIER:
+            self.advance()
+            return Identifier(token.location, token.lexeme)
+
+        raise self.error(f"Unexpected token: {token.lexeme}")
+
+
+class StreamingParser(Parser):
+    """Parser that pulls tokens from an iterator on demand.
+
+    Tokens live in a small ring buffer holding the previous token, the
+    current one and `lookahead` more, so the full token list never exists.
+    Iterating a TokenBuffer this way builds each Token exactly once.
+
+    With lazy_bodies, tokens must be a sequence: a brace-delimited function
+    body is skipped by matching braces, without building its tokens, and
+    kept as a DeferredBody to parse on first use.
+    """
+
+    def __init__(self, tokens: Iterable[Token], symbols: Optional[SymbolTable] = None,
+                 lookahead: int = 2, lazy_bodies: bool = False):
+        self.stream = iter(tokens)
+        self.symbols = symbols if symbols is not None else SymbolTable()
+        self.lazy_bodies = lazy_bodies
+        if lazy_bodies:
+            self.tokens = tokens
+            self.kinds = token_kinds(tokens)
+        self.size = lookahead + 2
+        self.ring: List[Optional[Token]] = [None] * self.size
+        self.lookahead = lookahead
+        self.current = 0   # Index of the current token in the whole stream
+        self.fetched = 0   # Number of tokens pulled from the stream so far
+        self.eof: Optional[Token] = None
 
-        # List literal
-        if self.match(TokenType.LBRACKET):
-            list_lit = ListLiteral(self.previous().location)
-
-            if not self.check(TokenType.RBRACKET):
-                while True:
-                    list_lit.elements.append(self.expression())
-                    if not self.match(TokenType.COMMA):
-                        break
-
-            self.consume(TokenType.RBRACKET, "Expected ']' after list elements")
-            return list_lit
+    def peek(self, offset: int = 0) -> Token:
+        """Look ahead at token"""
+        pos = self.current + offset
+        if pos < self.fetched:
+            return self.ring[pos % self.size]
+
+        if offset > self.lookahead:
+            raise ValueError(f"peek({offset}) is beyond the {self.lookahead}-token lookahead")
+        while self.fetched <= pos:
+            if self.eof is not None:
+                return self.eof  # Return EOF
+            token = next(self.stream)
+            self.ring[self.fetched % self.size] = token
+            self.fetched += 1
+            if token.type == TokenType.EOF:
+                self.eof = token
+        return self.ring[pos % self.size]
 
-        raise self.error(f"Unexpected token: {self.peek().lexeme}")
+    def previous(self) -> Token:
+        """Get previous token"""
+        return self.ring[(self.current - 1) % self.size]
+
+    def deferred_block(self) -> DeferredBody:
+        """Skip a brace-delimited block, recording its token span"""
+        start = self.current
+        end = block_end(self.kinds, start)
+        if end < 0:
+            self.current = len(self.kinds) - 1
+            self.fetched = self.current
+            self.stream = tokens_from(self.tokens, self.current)
+            raise self.error("Expected '}' after block")
+
+        # Carry on reading just after the block
+        self.current = self.fetched = end
+        self.ring[(end - 1) % self.size] = self.tokens[end - 1]
+        self.eof = None
+        self.stream = tokens_from(self.tokens, end)
+        return DeferredBody(self.tokens, start, end, self.symbols)
 
 
 def parse_file(filename: str) -> Program:
     """Parse a file"""
     from lexer import lex_file
-    tokens = lex_file(filename)
-    parser = Parser(tokens)
+    symbols = SymbolTable()
+    tokens = lex_file(filename, symbols=symbols)
+    parser = StreamingParser(tokens, symbols)
     return parser.parse()
 
 
 def parse_string(source: str, filename: str = "<input>") -> Program:
     """Parse a string"""
     from lexer import lex_string
-    tokens = lex_string(source, filename)
-    parser = Parser(tokens)
+    symbols = SymbolTable()
+    tokens = lex_string(source, filename, symbols=symbols)
+    parser = StreamingParser(tokens, symbols)
+    return parser.parse()
+
+
+def parse_stream(source, filename: str = "<input>") -> Program:
+    """Lex and parse a str, file object or mmap in one streaming pass"""
+    from lexer import iter_tokens
+    symbols = SymbolTable()
+    parser = StreamingParser(iter_tokens(source, filename, symbols=symbols), symbols)
     return parser.parse()
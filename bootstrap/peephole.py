@@ -0,0 +1,200 @@
+"""
+Peephole optimizer for 1 language bootstrap compiler.
+Rewrites generated bytecode to drop redundant jumps, dead code and
+store/load pairs before the module reaches the VM.
+"""
+
+from typing import List, Dict, Set, Tuple, Callable
+from codegen import (OpCode, Instruction, Function, BytecodeModule,
+                     JUMP_OPCODES, TERMINATOR_OPCODES)
+
+
+def delete_instructions(instructions: List[Instruction], dead: Set[int]) -> List[Instruction]:
+    """Remove instructions by index and remap jump targets.
+
+    A jump to a removed instruction lands on the next instruction that is kept.
+    """
+    if not dead:
+        return instructions
+
+    # new_index[i] = number of kept instructions before i
+    new_index = []
+    kept = 0
+    for i in range(len(instructions) + 1):
+        new_index.append(kept)
+        if i < len(instructions) and i not in dead:
+            kept += 1
+
+    result = []
+    for i, inst in enumerate(instructions):
+        if i in dead:
+            continue
+        if inst.opcode in JUMP_OPCODES:
+            inst.operand = new_index[inst.operand]
+        result.append(inst)
+    return result
+
+
+def jump_targets(instructions: List[Instruction]) -> Set[int]:
+    """Indexes that some jump lands on"""
+    return {inst.operand for inst in instructions if inst.opcode in JUMP_OPCODES}
+
+
+def thread_jumps(instructions: List[Instruction]) -> List[Instruction]:
+    """Collapse jump-to-jump chains so every jump goes straight to its destination"""
+    count = len(instructions)
+
+    for inst in instructions:
+        if inst.opcode not in JUMP_OPCODES:
+            continue
+
+        target = inst.operand
+        seen = set()
+        while target < count and target not in seen and \
+              instructions[target].opcode == OpCode.JUMP:
+            seen.add(target)
+            target = instructions[target].operand
+        inst.operand = target
+
+    return instructions
+
+
+def remove_jumps_to_next(instructions: List[Instruction]) -> List[Instruction]:
+    """Drop unconditional jumps to the following instruction.
+
+    A JUMP_IF_FALSE/JUMP_IF_TRUE to the next instruction only needs to
+    discard its condition, so it becomes a POP. Other conditional jumps
+    leave the stack in a state that depends on the outcome and are kept.
+    """
+    dead = set()
+
+    for i, inst in enumerate(instructions):
+        if inst.opcode in JUMP_OPCODES and inst.operand == i + 1:
+            if inst.opcode == OpCode.JUMP:
+                dead.add(i)
+            elif inst.opcode in (OpCode.JUMP_IF_FALSE, OpCode.JUMP_IF_TRUE):
+                instructions[i] = Instruction(OpCode.POP, None, inst.location)
+
+    return delete_instructions(instructions, dead)
+
+
+def remove_unreachable(instructions: List[Instruction]) -> List[Instruction]:
+    """Remove instructions that no path from the function entry reaches"""
+    count = len(instructions)
+    reachable = set()
+    pending = [0] if count else []
+
+    while pending:
+        i = pending.pop()
+        while i < count and i not in reachable:
+            reachable.add(i)
+            inst = instructions[i]
+            if inst.opcode in JUMP_OPCODES:
+                pending.append(inst.operand)
+            if inst.opcode in TERMINATOR_OPCODES:
+                break
+            i += 1
+
+    dead = set(range(count)) - reachable
+    return delete_instructions(instructions, dead)
+
+
+def eliminate_store_load(instructions: List[Instruction]) -> List[Instruction]:
+    """Rewrite `STORE x; LOAD x` pairs.
+
+    If that LOAD is the only read of x in the function, the store is dead and
+    both instructions go away, leaving the value on the stack. Otherwise the
+    pair becomes `DUP; STORE x`.
+    """
+    pairs = {OpCode.STORE_FAST: OpCode.LOAD_FAST, OpCode.STORE_VAR: OpCode.LOAD_VAR}
+
+    loads: Dict[Tuple[OpCode, object], int] = {}
+    for inst in instructions:
+        if inst.opcode in (OpCode.LOAD_FAST, OpCode.LOAD_VAR):
+            key = (inst.opcode, inst.operand)
+            loads[key] = loads.get(key, 0) + 1
+
+    targets = jump_targets(instructions)
+    dead = set()
+
+    i = 0
+    while i < len(instructions) - 1:
+        store = instructions[i]
+        load = instructions[i + 1]
+        load_opcode = pairs.get(store.opcode)
+
+        if load_opcode is not None and load.opcode == load_opcode and \
+           load.operand == store.operand and (i + 1) not in targets:
+            key = (load_opcode, load.operand)
+            if loads[key] == 1:
+                dead.update((i, i + 1))
+                loads[key] = 0
+            else:
+                instructions[i] = Instruction(OpCode.DUP, None, store.location)
+                instructions[i + 1] = store
+            i += 2
+        else:
+            i += 1
+
+    return delete_instructions(instructions, dead)
+
+
+# Passes in the order they run; the whole list repeats until nothing changes
+PASSES: List[Tuple[str, Callable[[List[Instruction]], List[Instruction]]]] = [
+    ("thread jumps", thread_jumps),
+    ("jumps to next", remove_jumps_to_next),
+    ("unreachable code", remove_unreachable),
+    ("store/load pairs", eliminate_store_load),
+]
+
+MAX_ROUNDS = 10
+
+
+def optimize_function(func: Function, stats: Dict[str, int]):
+    """Optimize one function in place, adding removed-instruction counts to stats"""
+    instructions = func.instructions
+
+    for _ in range(MAX_ROUNDS):
+        changed = False
+        for name, run_pass in PASSES:
+            before = [(inst.opcode, inst.operand) for inst in instructions]
+            instructions = run_pass(instructions)
+            after = [(inst.opcode, inst.operand) for inst in instructions]
+            stats[name] = stats.get(name, 0) + len(before) - len(after)
+            if before != after:
+                changed = True
+        if not changed:
+            break
+
+    func.instructions = instructions
+    func.code = None  # Any packed copy is stale now
+
+
+def optimize_module(module: BytecodeModule) -> Dict[str, int]:
+    """Run the peephole passes over every function.
+
+    Returns the number of instructions each pass removed, plus the module
+    totals under 'before' and 'after'.
+    """
+    stats: Dict[str, int] = {name: 0 for name, _ in PASSES}
+    before = sum(len(func.instructions) for func in module.functions.values())
+
+    for func in module.functions.values():
+        optimize_function(func, stats)
+
+    stats["before"] = before
+    stats["after"] = sum(len(func.instructions) for func in module.functions.values())
+    return stats
+
+
+def format_stats(stats: Dict[str, int]) -> str:
+    """Render optimize_module stats as per-pass instruction-count deltas"""
+    lines = []
+    for name, _ in PASSES:
+        lines.append(f"    {name:<20} -{stats.get(name, 0)}")
+
+    before = stats.get("before", 0)
+    after = stats.get("after", 0)
+    percent = (before - after) * 100.0 / before if before else 0.0
+    lines.append(f"    {'total':<20} {before} -> {after} instructions ({percent:.1f}% smaller)")
+    return "\n".join(lines)
@@ -0,0 +1,193 @@
+"""
+Persistent vector for the 1 language runtime.
+Immutable list with structural sharing: a 32-way bit-partitioned trie plus
+a tail buffer, so append, set and get copy at most one path of small nodes
+instead of the whole list.
+"""
+
+from functools import total_ordering
+from typing import Any, Iterable, Iterator, List
+
+BITS = 5
+WIDTH = 1 << BITS
+MASK = WIDTH - 1
+
+
+def _new_path(level: int, node: list) -> list:
+    """Wrap node in single-child branches down from level"""
+    while level > 0:
+        node = [node]
+        level -= BITS
+    return node
+
+
+@total_ordering
+class PVector:
+    """Immutable vector; every update returns a new PVector sharing structure"""
+
+    __slots__ = ('_count', '_shift', '_root', '_tail')
+
+    def __init__(self, count: int = 0, shift: int = BITS, root: list = None, tail: list = None):
+        self._count = count
+        self._shift = shift
+        self._root = root if root is not None else []
+        self._tail = tail if tail is not None else []
+
+    @classmethod
+    def from_iterable(cls, items: Iterable[Any]) -> 'PVector':
+        """Build a vector in one pass, packing full leaves bottom-up"""
+        items = list(items)
+        count = len(items)
+        if count <= WIDTH:
+            return cls(count, BITS, [], items)
+
+        tail_start = ((count - 1) >> BITS) << BITS
+        nodes = [items[i:i + WIDTH] for i in range(0, tail_start, WIDTH)]
+        shift = BITS
+        while len(nodes) > WIDTH:
+            nodes = [nodes[i:i + WIDTH] for i in range(0, len(nodes), WIDTH)]
+            shift += BITS
+
+        return cls(count, shift, nodes, items[tail_start:])
+
+    def _tail_offset(self) -> int:
+        """Index of the first element held in the tail"""
+        if self._count < WIDTH:
+            return 0
+        return ((self._count - 1) >> BITS) << BITS
+
+    def _leaf_for(self, index: int) -> list:
+        """Leaf node (or the tail) that holds index"""
+        if index >= self._tail_offset():
+            return self._tail
+
+        node = self._root
+        level = self._shift
+        while level > 0:
+            node = node[(index >> level) & MASK]
+            level -= BITS
+        return node
+
+    def _check_index(self, index: int) -> int:
+        """Normalize a negative index and bounds-check it like list does"""
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("list index out of range")
+        return index
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return PVector.from_iterable(self.to_list()[index])
+        index = self._check_index(index)
+
+        # Inlined _leaf_for: this is the hot path for INDEX and list_get
+        count = self._count
+        if count < WIDTH or index >= ((count - 1) >> BITS) << BITS:
+            return self._tail[index & MASK]
+        node = self._root
+        level = self._shift
+        while level > 0:
+            node = node[(index >> level) & MASK]
+            level -= BITS
+        return node[index & MASK]
+
+    def __iter__(self) -> Iterator[Any]:
+        for start in range(0, self._tail_offset(), WIDTH):
+            yield from self._leaf_for(start)
+        yield from self._tail
+
+    def append(self, value: Any) -> 'PVector':
+        """New vector with value added at the end"""
+        count = self._count
+
+        # Room in the tail: copy only the tail
+        if count - self._tail_offset() < WIDTH:
+            return PVector(count + 1, self._shift, self._root, self._tail + [value])
+
+        # Tail is full: push it into the trie and start a new tail
+        shift = self._shift
+        if (count >> BITS) > (1 << shift):
+            root = [self._root, _new_path(shift, self._tail)]
+            shift += BITS
+        else:
+            root = self._push_tail(shift, self._root, self._tail)
+        return PVector(count + 1, shift, root, [value])
+
+    def _push_tail(self, level: int, parent: list, tail: list) -> list:
+        """Copy the path to the rightmost leaf slot and put tail there"""
+        subindex = ((self._count - 1) >> level) & MASK
+        node = list(parent)
+
+        if level == BITS:
+            child = tail
+        elif subindex < len(parent):
+            child = self._push_tail(level - BITS, parent[subindex], tail)
+        else:
+            child = _new_path(level - BITS, tail)
+
+        if subindex < len(node):
+            node[subindex] = child
+        else:
+            node.append(child)
+        return node
+
+    def set(self, index: int, value: Any) -> 'PVector':
+        """New vector with the element at index replaced"""
+        index = self._check_index(index)
+
+        if index >= self._tail_offset():
+            tail = list(self._tail)
+            tail[index & MASK] = value
+            return PVector(self._count, self._shift, self._root, tail)
+
+        root = list(self._root)
+        node = root
+        level = self._shift
+        while level > 0:
+            subindex = (index >> level) & MASK
+            child = list(node[subindex])
+            node[subindex] = child
+            node = child
+            level -= BITS
+        node[index & MASK] = value
+        return PVector(self._count, self._shift, root, self._tail)
+
+    def to_list(self) -> List[Any]:
+        """Copy the elements into a plain list"""
+        return list(self)
+
+    def __eq__(self, other):
+        if isinstance(other, (PVector, list)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __lt__(self, other):
+        if isinstance(other, (PVector, list)):
+            return self.to_list() < list(other)
+        return NotImplemented
+
+    __hash__ = None  # Mutable-list semantics: not hashable
+
+    def __add__(self, other):
+        if isinstance(other, (PVector, list)):
+            return PVector.from_iterable(self.to_list() + list(other))
+        return NotImplemented
+
+    def __radd__(self, other):
+        if isinstance(other, list):
+            return PVector.from_iterable(other + self.to_list())
+        return NotImplemented
+
+    def __mul__(self, times):
+        if isinstance(times, int):
+            return PVector.from_iterable(self.to_list() * times)
+        return NotImplemented
+
+    __rmul__ = __mul__
+
+    def __repr__(self):
+        return repr(self.to_list())
@@ -0,0 +1,144 @@
+"""
+Scope resolution for the 1 language bootstrap compiler.
+Walks a function once, in the type checker's order, and binds every
+local name to a (depth, index) coordinate so later passes index flat
+tables instead of searching chains of dictionaries.
+"""
+
+from typing import Dict, List, Optional
+from parser import *
+
+
+class Binding:
+    """One local variable as the type checker scopes it.
+
+    depth is the block nesting level that declares it (0 for parameters
+    and the function body) and index its position in the function's flat
+    table of local types. slot is the VM slot of its name: the VM keeps
+    one slot per name for the whole function, however blocks scope it.
+    """
+    __slots__ = ('name', 'depth', 'index', 'slot')
+
+    def __init__(self, name: str, depth: int, index: int, slot: int):
+        self.name = name
+        self.depth = depth
+        self.index = index
+        self.slot = slot
+
+    def __repr__(self):
+        return f"Binding({self.name!r}, depth={self.depth}, index={self.index}, slot={self.slot})"
+
+
+class FunctionScope:
+    """Bindings of one function, in the order they were declared"""
+
+    def __init__(self):
+        self.params: List[Binding] = []    # Binding of each parameter, in order
+        self.bindings: List[Binding] = []  # Every binding; bindings[i].index == i
+        self.local_names: List[str] = []   # VM slot -> name, parameters first
+        self.slots: Dict[str, int] = {}    # Name -> VM slot
+
+
+# Work items of the statement walk
+STEP_STATEMENT = 0   # (kind, statement)
+STEP_ENTER = 1       # (kind, None): open a block scope
+STEP_EXIT = 2        # (kind, None): close the innermost block scope
+
+
+class ScopeResolver:
+    """Resolves the locals of one function.
+
+    Mirrors the type checker's scoping: parameters and the body share
+    the function scope, each if/else/while/ensure block opens a child
+    scope, an assignment declares its target in the innermost scope
+    unless that scope already has it, and the value is resolved before
+    the target. Each Identifier read or assigned gets its Binding in
+    `binding`; a read with no local in scope gets None (a global).
+    """
+
+    def __init__(self):
+        self.scope = FunctionScope()
+        self.depth = 0
+        self.visible: Dict[str, List[Binding]] = {}  # Name -> bindings in scope, innermost last
+        self.blocks: List[List[Binding]] = [[]]      # Bindings declared by each open scope
+
+    def declare(self, name: str) -> Binding:
+        """Binding of name in the innermost scope, declaring it if needed"""
+        shadowed = self.visible.setdefault(name, [])
+        if shadowed and shadowed[-1].depth == self.depth:
+            return shadowed[-1]
+
+        scope = self.scope
+        slot = scope.slots.get(name)
+        if slot is None:
+            slot = scope.slots[name] = len(scope.local_names)
+            scope.local_names.append(name)
+
+        binding = Binding(name, self.depth, len(scope.bindings), slot)
+        scope.bindings.append(binding)
+        shadowed.append(binding)
+        self.blocks[-1].append(binding)
+        return binding
+
+    def resolve_expression(self, expr: ASTNode):
+        """Bind every identifier read by expr"""
+        visible = self.visible
+        pending = [expr]
+        while pending:
+            node = pending.pop()
+            if isinstance(node, Identifier):
+                bindings = visible.get(node.name)
+                node.binding = bindings[-1] if bindings else None
+            elif not isinstance(node, Literal):
+                pending.extend(expression_children(node))
+
+    def resolve_function(self, func: Function) -> FunctionScope:
+        """Resolve func's parameters and body"""
+        for param in func.inputs:
+            self.scope.params.append(self.declare(param.name))
+
+        # Explicit stack so deeply nested blocks do not hit the recursion limit
+        pending = []
+        if func.body:
+            pending.extend((STEP_STATEMENT, stmt) for stmt in reversed(func.body.statements))
+
+        while pending:
+            kind, node = pending.pop()
+            if kind == STEP_ENTER:
+                self.depth += 1
+                self.blocks.append([])
+            elif kind == STEP_EXIT:
+                for binding in self.blocks.pop():
+                    self.visible[binding.name].pop()
+                self.depth -= 1
+            elif isinstance(node, Assignment):
+                self.resolve_expression(node.value)
+                if isinstance(node.target, Identifier):
+                    node.target.binding = self.declare(node.target.name)
+            elif isinstance(node, (If, Ensure)):
+                self.resolve_expression(node.condition)
+                if node.else_block:
+                    self.push_block(pending, node.else_block)
+                self.push_block(pending, node.then_block)
+            elif isinstance(node, While):
+                self.resolve_expression(node.condition)
+                self.push_block(pending, node.body)
+            elif isinstance(node, Return):
+                if node.value:
+                    self.resolve_expression(node.value)
+            elif node.node_type not in (ASTNodeType.BREAK, ASTNodeType.CONTINUE):
+                self.resolve_expression(node)  # Expression statement
+
+        return self.scope
+
+    @staticmethod
+    def push_block(pending: list, block: Block):
+        """Queue block's statements inside a scope of their own"""
+        pending.append((STEP_EXIT, None))
+        pending.extend((STEP_STATEMENT, stmt) for stmt in reversed(block.statements))
+        pending.append((STEP_ENTER, None))
+
+
+def resolve_function(func: Function) -> FunctionScope:
+    """Bind the locals of func; see ScopeResolver"""
+    return ScopeResolver().resolve_function(func)
@@ -0,0 +1,129 @@
+"""
+Rope and string builder values for the 1 language runtime.
+Long concatenation chains build a tree of pieces that is flattened into a
+plain str only when its characters are actually needed.
+"""
+
+from functools import total_ordering
+from typing import List, Union
+
+# Results shorter than this are concatenated eagerly as plain strings
+ROPE_MIN_LENGTH = 256
+
+
+@total_ordering
+class Rope:
+    """Lazy concatenation of two strings or ropes"""
+
+    __slots__ = ('_left', '_right', '_length', '_flat')
+
+    def __init__(self, left: Union[str, 'Rope'], right: Union[str, 'Rope']):
+        self._left = left
+        self._right = right
+        self._length = len(left) + len(right)
+        self._flat = None
+
+    def flatten(self) -> str:
+        """Join all pieces into one str (cached; the tree is released)"""
+        if self._flat is not None:
+            return self._flat
+
+        # Iterative walk: concatenation chains are as deep as they are long
+        pieces = []
+        pending = [self]
+        while pending:
+            node = pending.pop()
+            if isinstance(node, str):
+                pieces.append(node)
+            elif node._flat is not None:
+                pieces.append(node._flat)
+            else:
+                pending.append(node._right)
+                pending.append(node._left)
+
+        self._flat = ''.join(pieces)
+        self._left = self._right = None
+        return self._flat
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __str__(self) -> str:
+        return self.flatten()
+
+    def __repr__(self) -> str:
+        return repr(self.flatten())
+
+    def __getitem__(self, index):
+        return self.flatten()[index]
+
+    def __eq__(self, other):
+        if isinstance(other, (str, Rope)):
+            return len(self) == len(other) and self.flatten() == str(other)
+        return NotImplemented
+
+    def __lt__(self, other):
+        if isinstance(other, (str, Rope)):
+            return self.flatten() < str(other)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.flatten())
+
+    def __add__(self, other):
+        if isinstance(other, (str, Rope)):
+            return concat(self, other)
+        return NotImplemented
+
+    def __radd__(self, other):
+        if isinstance(other, str):
+            return concat(other, self)
+        return NotImplemented
+
+
+def concat(a: Union[str, Rope], b: Union[str, Rope]) -> Union[str, Rope]:
+    """Concatenate two strings, deferring the copy for long results"""
+    if len(a) + len(b) < ROPE_MIN_LENGTH:
+        return str(a) + str(b)
+    if not b:
+        return a
+    if not a:
+        return b
+
+    # Appending a short piece: extend the rope's short right leaf in a new
+    # node instead of adding one node per piece
+    if type(b) is str and type(a) is Rope and a._flat is None:
+        right = a._right
+        if type(right) is str and len(right) + len(b) < ROPE_MIN_LENGTH:
+            return Rope(a._left, right + b)
+    return Rope(a, b)
+
+
+def as_text(value) -> str:
+    """Flatten a rope; other values pass through unchanged"""
+    if isinstance(value, Rope):
+        return value.flatten()
+    return value
+
+
+class StringBuilder:
+    """Mutable builder for explicit linear-time string construction"""
+
+    __slots__ = ('parts',)
+
+    def __init__(self):
+        self.parts: List[str] = []
+
+    def append(self, text) -> 'StringBuilder':
+        """Add text to the end (in place) and return the builder"""
+        self.parts.append(str(text))
+        return self
+
+    def build(self) -> str:
+        """Join everything appended so far"""
+        if len(self.parts) > 1:
+            self.parts = [''.join(self.parts)]
+        return self.parts[0] if self.parts else ''
+
+    def __repr__(self):
+        return f"<StringBuilder {len(self.parts)} parts>"
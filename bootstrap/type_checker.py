@@ -6,6 +6,7 @@ This is a simplified version - no complex constraint solving.
 from typing import Dict, Optional, List
 from dataclasses import dataclass
 from parser import *
+from resolver import resolve_function
 
 
 class Type:
@@ -60,6 +61,20 @@ BOOLEAN_TYPE = PrimitiveType("Boolean")
 VOID_TYPE = VoidType()
 
 
+def literal_type(value) -> Type:
+    """Type of a literal value"""
+    if isinstance(value, int):
+        return INTEGER_TYPE
+    elif isinstance(value, float):
+        return FLOAT_TYPE
+    elif isinstance(value, str):
+        return STRING_TYPE
+    elif isinstance(value, bool):
+        return BOOLEAN_TYPE
+    else:
+        return VOID_TYPE
+
+
 class TypeCheckError(Exception):
     """Type checking error"""
     def __init__(self, message: str, location: SourceLocation):
@@ -67,9 +82,17 @@ class TypeCheckError(Exception):
         self.location = location
         super().__init__(f"{location}: {message}")
 
+    def __reduce__(self):
+        # Rebuilt from message and location when sent between processes
+        return TypeCheckError, (self.message, self.location)
+
 
 class TypeEnvironment:
-    """Type environment for tracking variable types"""
+    """Type environment for tracking global types.
+
+    Locals are not kept here: the resolver numbers them and the checker
+    keeps their types in a flat list indexed by Binding.index.
+    """
 
     def __init__(self, parent: Optional['TypeEnvironment'] = None):
         self.parent = parent
@@ -97,7 +120,7 @@ class TypeChecker:
 
     def __init__(self):
         self.global_env = TypeEnvironment()
-        self.current_env = self.global_env
+        self.local_types: List[Optional[Type]] = []  # Binding.index -> type, current function
         self.errors: List[TypeCheckError] = []
 
         # Built-in functions
@@ -126,6 +149,11 @@ class TypeChecker:
         self.global_env.define("list_get", FunctionType([INTEGER_TYPE, INTEGER_TYPE], INTEGER_TYPE))
         self.global_env.define("list_set", FunctionType([INTEGER_TYPE, INTEGER_TYPE, INTEGER_TYPE], INTEGER_TYPE))
 
+        # String builder functions (builder handle treated as Integer, like lists)
+        self.global_env.define("sb_new", FunctionType([], INTEGER_TYPE))
+        self.global_env.define("sb_append", FunctionType([INTEGER_TYPE, STRING_TYPE], INTEGER_TYPE))
+        self.global_env.define("sb_build", FunctionType([INTEGER_TYPE], STRING_TYPE))
+
         # System functions
         self.global_env.define("exit", FunctionType([INTEGER_TYPE], VOID_TYPE))
 
@@ -165,42 +193,50 @@ class TypeChecker:
         self.errors = []
 
         # First pass: collect function declarations
+        self.declare_functions(program)
+
+        # Second pass: check function bodies
         for decl in program.declarations:
             if isinstance(decl, Function):
-                param_types = []
-                for param in decl.inputs:
-                    param_types.append(self.resolve_type_annotation(param.type_annotation))
+                self.check_function(decl)
 
-                return_type = VOID_TYPE
-                if decl.outputs:
-                    return_type = self.resolve_type_annotation(decl.outputs[0].type_annotation)
+        return len(self.errors) == 0
 
-                func_type = FunctionType(param_types, return_type)
-                self.global_env.define(decl.name, func_type)
+    def declare_functions(self, program: Program):
+        """Define every function's signature in the global environment.
 
-        # Second pass: check function bodies
+        After this each body can be checked on its own, in any order.
+        """
         for decl in program.declarations:
             if isinstance(decl, Function):
-                self.check_function(decl)
+                self.global_env.define(decl.name, self.function_type(decl))
 
-        return len(self.errors) == 0
+    def function_type(self, func: Function) -> FunctionType:
+        """Type declared by a function's inputs and outputs"""
+        param_types = []
+        for param in func.inputs:
+            param_types.append(self.resolve_type_annotation(param.type_annotation))
+
+        return_type = VOID_TYPE
+        if func.outputs:
+            return_type = self.resolve_type_annotation(func.outputs[0].type_annotation)
+
+        return FunctionType(param_types, return_type)
 
     def check_function(self, func: Function):
         """Type check a function"""
-        # Create new environment for function
-        self.current_env = self.global_env.child()
+        scope = resolve_function(func)
+        self.local_types = [None] * len(scope.bindings)
 
         # Add parameters to environment
-        for param in func.inputs:
-            param_type = self.resolve_type_annotation(param.type_annotation)
-            self.current_env.define(param.name, param_type)
+        for param, binding in zip(func.inputs, scope.params):
+            self.local_types[binding.index] = self.resolve_type_annotation(param.type_annotation)
 
         # Check function body
         if func.body:
             self.check_block(func.body)
 
-        # Restore environment
-        self.current_env = self.global_env
+        self.local_types = []
 
     def check_block(self, block: Block) -> Type:
         """Type check a block"""
@@ -241,14 +277,11 @@ class TypeChecker:
 
         # Condition should be boolean (but we're lenient in bootstrap)
 
-        self.current_env = self.current_env.child()
+        # Blocks scope their assignments; the resolver already bound them
         then_type = self.check_block(if_stmt.then_block)
-        self.current_env = self.current_env.parent
 
         if if_stmt.else_block:
-            self.current_env = self.current_env.child()
             else_type = self.check_block(if_stmt.else_block)
-            self.current_env = self.current_env.parent
 
         return VOID_TYPE
 
@@ -256,9 +289,7 @@ class TypeChecker:
         """Type check while loop"""
         cond_type = self.check_expression(while_stmt.condition)
 
-        self.current_env = self.current_env.child()
         self.check_block(while_stmt.body)
-        self.current_env = self.current_env.parent
 
         return VOID_TYPE
 
@@ -266,14 +297,10 @@ class TypeChecker:
         """Type check ensure statement"""
         cond_type = self.check_expression(ensure_stmt.condition)
 
-        self.current_env = self.current_env.child()
         self.check_block(ensure_stmt.then_block)
-        self.current_env = self.current_env.parent
 
         if ensure_stmt.else_block:
-            self.current_env = self.current_env.child()
             self.check_block(ensure_stmt.else_block)
-            self.current_env = self.current_env.parent
 
         return VOID_TYPE
 
@@ -281,14 +308,35 @@ class TypeChecker:
         """Type check assignment"""
         value_type = self.check_expression(assign.value)
 
-        # For identifiers, define or update in environment
+        # For identifiers, define or update the binding's type
         if isinstance(assign.target, Identifier):
-            self.current_env.define(assign.target.name, value_type)
+            self.local_types[assign.target.binding.index] = value_type
 
         return value_type
 
     def check_expression(self, expr: ASTNode) -> Type:
-        """Type check expression"""
+        """Type check expression and record each node's type in metadata['type'].
+
+        Uses an explicit stack instead of recursion so deeply nested
+        expressions do not hit the recursion limit. Visiting children right
+        to left and reversing gives every child before its parent, in
+        left-to-right order.
+        """
+        order = []
+        pending = [expr]
+        while pending:
+            node = pending.pop()
+            order.append(node)
+            if not isinstance(node, (Literal, Identifier)):
+                pending.extend(expression_children(node))
+
+        for node in reversed(order):
+            node.metadata['type'] = self.expression_type(node)
+
+        return expr.metadata['type']
+
+    def expression_type(self, expr: ASTNode) -> Type:
+        """Type of an expression whose sub-expressions are already checked"""
         if isinstance(expr, Literal):
             return self.check_literal(expr)
         elif isinstance(expr, Identifier):
@@ -311,22 +359,15 @@ class TypeChecker:
 
     def check_literal(self, lit: Literal) -> Type:
         """Type check literal"""
-        value = lit.value
-
-        if isinstance(value, int):
-            return INTEGER_TYPE
-        elif isinstance(value, float):
-            return FLOAT_TYPE
-        elif isinstance(value, str):
-            return STRING_TYPE
-        elif isinstance(value, bool):
-            return BOOLEAN_TYPE
-        else:
-            return VOID_TYPE
+        return literal_type(lit.value)
 
     def check_identifier(self, ident: Identifier) -> Type:
         """Type check identifier"""
-        typ = self.current_env.lookup(ident.name)
+        binding = ident.binding
+        if binding is not None:
+            return self.local_types[binding.index]
+
+        typ = self.global_env.lookup(ident.name)
 
         if typ is None:
             self.error(f"Undefined variable: {ident.name}", ident.location)
@@ -336,8 +377,12 @@ class TypeChecker:
 
     def check_binary_op(self, binop: BinaryOp) -> Type:
         """Type check binary operation"""
-        left_type = self.check_expression(binop.left)
-        right_type = self.check_expression(binop.right)
+        left_type = binop.left.metadata['type']
+        right_type = binop.right.metadata['type']
+
+        # String concatenation
+        if binop.operator == '+' and left_type == STRING_TYPE and right_type == STRING_TYPE:
+            return STRING_TYPE
 
         # Arithmetic operators
         if binop.operator in ['+', '-', '*', '/', '%', '**']:
@@ -364,7 +409,7 @@ class TypeChecker:
 
     def check_unary_op(self, unop: UnaryOp) -> Type:
         """Type check unary operation"""
-        operand_type = self.check_expression(unop.operand)
+        operand_type = unop.operand.metadata['type']
 
         if unop.operator == '-':
             return operand_type
@@ -375,11 +420,7 @@ class TypeChecker:
 
     def check_call(self, call: Call) -> Type:
         """Type check function call"""
-        func_type = self.check_expression(call.function)
-
-        # Check arguments
-        for arg in call.arguments:
-            self.check_expression(arg)
+        func_type = call.function.metadata['type']
 
         # If it's a function type, return the return type
         if isinstance(func_type, FunctionType):
@@ -389,20 +430,21 @@ class TypeChecker:
 
     def check_member(self, member: Member) -> Type:
         """Type check member access"""
-        obj_type = self.check_expression(member.object)
-
         # For bootstrap, just return Integer
         return INTEGER_TYPE
 
     def check_index(self, index: Index) -> Type:
         """Type check index access"""
-        obj_type = self.check_expression(index.object)
-        index_type = self.check_expression(index.index)
+        obj_type = index.object.metadata['type']
 
         # If object is a list, return element type
         if isinstance(obj_type, ListType):
             return obj_type.element_type
 
+        # Indexing a string gives a one-character string
+        if obj_type == STRING_TYPE:
+            return STRING_TYPE
+
         return INTEGER_TYPE
 
     def check_list_literal(self, lst: ListLiteral) -> Type:
@@ -410,19 +452,14 @@ class TypeChecker:
         if not lst.elements:
             return ListType(INTEGER_TYPE)
 
-        # Check first element to determine type
-        first_type = self.check_expression(lst.elements[0])
-
-        # Check remaining elements
-        for elem in lst.elements[1:]:
-            self.check_expression(elem)
-
-        return ListType(first_type)
+        # The first element determines the type
+        return ListType(lst.elements[0].metadata['type'])
 
 
-def type_check_program(program: Program) -> bool:
-    """Type check a program"""
-    checker = TypeChecker()
+def type_check_program(program: Program, checker: Optional[TypeChecker] = None) -> bool:
+    """Type check a program, with checker if given (to check deferred bodies later)"""
+    if checker is None:
+        checker = TypeChecker()
     success = checker.check_program(program)
 
     if not success:
@@ -5,18 +5,44 @@ Executes bytecode generated by the compiler.
 
 from dataclasses import dataclass, field
 from typing import List, Dict, Any, Optional
-from codegen import OpCode, Instruction, Function, BytecodeModule
+from codegen import OpCode, Instruction, Function, BytecodeModule, CompactCode, compact_function
 from one_builtins import BUILTINS
+from pvector import PVector
+from rope import Rope, concat
 import sys
 
 
+class _Unbound:
+    """Marker for a local slot that has not been assigned yet"""
+
+    def __repr__(self):
+        return "<unbound>"
+
+
+UNBOUND = _Unbound()
+
+# Runtime types the type-specialized handlers accept without falling back
+NUMBER_TYPES = (int, float)
+STRING_TYPES = (str, Rope)
+LIST_TYPES = (PVector, list)
+
+
 @dataclass
 class StackFrame:
     """Call stack frame"""
     function: Function
     ip: int = 0  # Instruction pointer
-    locals: Dict[str, Any] = field(default_factory=dict)
+    locals: Dict[str, Any] = field(default_factory=dict)  # Names without a slot
     return_address: int = 0
+    code: Optional[CompactCode] = None  # Packed instruction stream
+    slots: List[Any] = field(default_factory=list)  # Indexed by LOAD_FAST/STORE_FAST
+
+    def named_locals(self) -> Dict[str, Any]:
+        """All bound locals by name (for debugging)"""
+        named = {name: value for name, value in zip(self.function.local_names, self.slots)
+                 if value is not UNBOUND}
+        named.update(self.locals)
+        return named
 
 
 class VMError(Exception):
@@ -24,17 +50,71 @@ class VMError(Exception):
     pass
 
 
+# Dispatch engines understood by VM
+ENGINES = ("table", "switch")
+
+
 class VM:
     """Virtual Machine for executing 1 bytecode"""
 
-    def __init__(self, module: BytecodeModule):
+    def __init__(self, module: BytecodeModule, engine: str = "table"):
+        if engine not in ENGINES:
+            raise VMError(f"Unknown dispatch engine: {engine}")
+
         self.module = module
+        self.engine = engine
         self.stack: List[Any] = []
         self.call_stack: List[StackFrame] = []
         self.globals: Dict[str, Any] = {}
         self.current_frame: Optional[StackFrame] = None
         self.halted = False
 
+        # Handler table indexed by integer opcode
+        self.handlers = self.build_handler_table()
+
+    def build_handler_table(self) -> List[Any]:
+        """Build the opcode -> handler table (index is OpCode.value)"""
+        table = [None] * (max(op.value for op in OpCode) + 1)
+        for op in OpCode:
+            handler = getattr(self, f"op_{op.name.lower()}", None)
+            if handler is None:
+                raise VMError(f"No handler for opcode: {op.name}")
+            table[op.value] = handler
+        return table
+
+    def new_frame(self, func: Function, return_address: int = 0, args: List[Any] = ()) -> StackFrame:
+        """Create a stack frame for a function and bind its arguments"""
+        frame = StackFrame(function=func, return_address=return_address)
+        self.bind_frame(frame, func, args)
+        return frame
+
+    def bind_frame(self, frame: StackFrame, func: Function, args: List[Any]):
+        """(Re)initialize frame to run func from the start with args"""
+        frame.function = func
+        frame.ip = 0
+        if frame.locals:
+            frame.locals.clear()
+
+        # Parameters occupy the first slots; extra arguments keep their argN names
+        slot_count = len(func.local_names)
+        bound = min(len(args), func.param_count, slot_count)
+        if bound == len(args):
+            slots = list(args)
+        else:
+            slots = list(args[:bound])
+            for i in range(bound, len(args)):
+                if i < len(func.param_names):
+                    frame.locals[func.param_names[i]] = args[i]
+                else:
+                    frame.locals[sys.intern(f"arg{i}")] = args[i]
+        slots.extend([UNBOUND] * (slot_count - bound))
+        frame.slots = slots
+
+        if self.engine == "table":
+            frame.code = func.code if func.code is not None else compact_function(func)
+        elif not func.instructions and func.code is not None:
+            func.instructions = func.get_instructions()
+
     def run(self, entry_point: str = "main") -> Any:
         """Run the program starting at entry point"""
         if entry_point not in self.module.functions:
@@ -42,7 +122,7 @@ class VM:
 
         # Call entry point function
         entry_func = self.module.functions[entry_point]
-        frame = StackFrame(function=entry_func)
+        frame = self.new_frame(entry_func)
         self.call_stack.append(frame)
         self.current_frame = frame
 
@@ -55,6 +135,9 @@ class VM:
 
     def execute(self) -> Any:
         """Execute instructions until halt or return"""
+        if self.engine == "table":
+            return self.execute_table()
+
         while not self.halted and self.call_stack:
             frame = self.current_frame
 
@@ -80,11 +163,109 @@ class VM:
             return self.stack[-1]
         return None
 
+    def execute_table(self) -> Any:
+        """Execute the packed instruction stream through the handler table"""
+        handlers = self.handlers
+        frame = None
+        try:
+            while not self.halted and self.call_stack:
+                frame = self.current_frame
+                code = frame.code
+                opcodes = code.opcodes
+                operands = code.operands
+                table = code.operand_table
+                end = len(opcodes)
+
+                # Run the current frame until a handler reports a frame switch
+                while True:
+                    ip = frame.ip
+                    if ip >= end:
+                        # Implicit return
+                        return None
+                    frame.ip = ip + 1
+                    if handlers[opcodes[ip]](table[operands[ip]]):
+                        break
+        except Exception as e:
+            ip = frame.ip - 1
+            print(f"Error executing instruction at {ip}: {frame.code.instruction(ip)}")
+            print(f"  Error: {e}")
+            raise
+
+        # Return top of stack if present
+        if self.stack:
+            return self.stack[-1]
+        return None
+
     def execute_instruction(self, inst: Instruction):
-        """Execute a single instruction"""
+        """Execute a single instruction (reference if/elif engine)"""
         opcode = inst.opcode
 
-        if opcode == OpCode.LOAD_CONST:
+        # Slot locals and fused compare-and-branch run in nearly every loop,
+        # so they are tested before the rest of the chain
+        if opcode == OpCode.LOAD_FAST:
+            value = self.current_frame.slots[inst.operand]
+            if value is UNBOUND:
+                self.op_load_fast(inst.operand)  # Falls back to a global
+            else:
+                self.stack.append(value)
+
+        elif opcode == OpCode.STORE_FAST:
+            self.current_frame.slots[inst.operand] = self.stack.pop()
+
+        elif opcode == OpCode.JUMP_IF_NOT_LT:
+            b = self.stack.pop()
+            a = self.stack.pop()
+            if not (a < b):
+                self.current_frame.ip = inst.operand
+
+        elif opcode == OpCode.JUMP_IF_NOT_EQ:
+            b = self.stack.pop()
+            a = self.stack.pop()
+            if not (a == b):
+                self.current_frame.ip = inst.operand
+
+        elif opcode == OpCode.JUMP_IF_NOT_NE:
+            b = self.stack.pop()
+            a = self.stack.pop()
+            if not (a != b):
+                self.current_frame.ip = inst.operand
+
+        elif opcode == OpCode.JUMP_IF_NOT_GT:
+            b = self.stack.pop()
+            a = self.stack.pop()
+            if not (a > b):
+                self.current_frame.ip = inst.operand
+
+        elif opcode == OpCode.JUMP_IF_NOT_LE:
+            b = self.stack.pop()
+            a = self.stack.pop()
+            if not (a <= b):
+                self.current_frame.ip = inst.operand
+
+        elif opcode == OpCode.JUMP_IF_NOT_GE:
+            b = self.stack.pop()
+            a = self.stack.pop()
+            if not (a >= b):
+                self.current_frame.ip = inst.operand
+
+        # Type-specialized operations; their handlers fall back to the
+        # generic ones when the operands have other types
+        elif opcode == OpCode.ADD_INT:
+            self.op_add_int(inst.operand)
+
+        elif opcode == OpCode.ADD_FLOAT:
+            self.op_add_float(inst.operand)
+
+        elif opcode == OpCode.CONCAT_STR:
+            self.op_concat_str(inst.operand)
+
+        elif opcode == OpCode.INDEX_STR:
+            self.op_index_str(inst.operand)
+
+        elif opcode == OpCode.INDEX_LIST:
+            self.op_index_list(inst.operand)
+
+        elif opcode == OpCode.LOAD_CONST:
             self.stack.append(inst.operand)
 
         elif opcode == OpCode.LOAD_VAR:
@@ -109,6 +290,9 @@ class VM:
         elif opcode == OpCode.POP:
             self.stack.pop()
 
+        elif opcode == OpCode.DUP:
+            self.stack.append(self.stack[-1])
+
         # Arithmetic operations
         elif opcode == OpCode.ADD:
             b = self.stack.pop()
@@ -206,6 +390,18 @@ class VM:
             if condition:
                 self.current_frame.ip = inst.operand
 
+        elif opcode == OpCode.JUMP_IF_FALSE_OR_POP:
+            if self.stack[-1]:
+                self.stack.pop()
+            else:
+                self.current_frame.ip = inst.operand
+
+        elif opcode == OpCode.JUMP_IF_TRUE_OR_POP:
+            if self.stack[-1]:
+                self.current_frame.ip = inst.operand
+            else:
+                self.stack.pop()
+
         # Function operations
         elif opcode == OpCode.CALL:
             func_name, arg_count = inst.operand
@@ -222,17 +418,7 @@ class VM:
             elif func_name in self.module.functions:
                 # User-defined function
                 called_func = self.module.functions[func_name]
-                new_frame = StackFrame(
-                    function=called_func,
-                    return_address=self.current_frame.ip
-                )
-
-                # Store arguments as local variables using actual parameter names
-                for i, arg in enumerate(args):
-                    if i < len(called_func.param_names):
-                        new_frame.locals[called_func.param_names[i]] = arg
-                    else:
-                        new_frame.locals[f"arg{i}"] = arg
+                new_frame = self.new_frame(called_func, self.current_frame.ip, args)
 
                 # Push frame and switch to it
                 self.call_stack.append(new_frame)
@@ -240,6 +426,10 @@ class VM:
             else:
                 raise VMError(f"Undefined function: {func_name}")
 
+        elif opcode == OpCode.TAIL_CALL:
+            # Rebinds the current frame in place, the same as the table engine
+            self.op_tail_call(inst.operand)
+
         elif opcode == OpCode.RETURN:
             return_value = self.stack.pop() if self.stack else None
 
@@ -267,19 +457,19 @@ class VM:
             elements = []
             for _ in range(count):
                 elements.insert(0, self.stack.pop())
-            self.stack.append(elements)
+            self.stack.append(PVector.from_iterable(elements))
 
         elif opcode == OpCode.INDEX:
             index = self.stack.pop()
             obj = self.stack.pop()
 
-            if isinstance(obj, list):
+            if isinstance(obj, (PVector, list)):
                 if not isinstance(index, int):
                     raise VMError(f"List index must be integer, got {type(index)}")
                 if index < 0 or index >= len(obj):
                     raise VMError(f"List index out of range: {index}")
                 self.stack.append(obj[index])
-            elif isinstance(obj, str):
+            elif isinstance(obj, (str, Rope)):
                 if not isinstance(index, int):
                     raise VMError(f"String index must be integer, got {type(index)}")
                 if index < 0 or index >= len(obj):
@@ -300,7 +490,349 @@ class VM:
             self.stack.append(None)  # println returns None
 
         else:
-            raise VMError(f"Unknown opcode: {opcode}")
+            # Any opcode without a branch above still runs through the handler table
+            handler = self.handlers[opcode.value] if isinstance(opcode, OpCode) else None
+            if handler is None:
+                raise VMError(f"Unknown opcode: {opcode}")
+            handler(inst.operand)
+
+    # Opcode handlers used by the table engine; each takes the decoded operand
+    # and returns True when it switched frames or halted the VM
+
+    def op_load_const(self, operand):
+        self.stack.append(operand)
+
+    def op_load_var(self, var_name):
+        frame_locals = self.current_frame.locals
+        if var_name in frame_locals:
+            self.stack.append(frame_locals[var_name])
+        elif var_name in self.globals:
+            self.stack.append(self.globals[var_name])
+        else:
+            raise VMError(f"Undefined variable: {var_name}")
+
+    def op_store_var(self, var_name):
+        self.current_frame.locals[var_name] = self.stack.pop()
+
+    def op_dup(self, operand):
+        self.stack.append(self.stack[-1])
+
+    def op_load_fast(self, slot):
+        value = self.current_frame.slots[slot]
+        if value is UNBOUND:
+            name = self.current_frame.function.local_names[slot]
+            if name not in self.globals:
+                raise VMError(f"Undefined variable: {name}")
+            value = self.globals[name]
+        self.stack.append(value)
+
+    def op_store_fast(self, slot):
+        self.current_frame.slots[slot] = self.stack.pop()
+
+    def op_pop(self, operand):
+        self.stack.pop()
+
+    def op_add(self, operand):
+        stack = self.stack
+        b = stack.pop()
+        a = stack[-1]
+        if isinstance(b, (str, Rope)) and isinstance(a, (str, Rope)):
+            stack[-1] = concat(a, b)
+        else:
+            stack[-1] = a + b
+
+    def op_sub(self, operand):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] = stack[-1] - b
+
+    def op_mul(self, operand):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] = stack[-1] * b
+
+    def op_div(self, operand):
+        stack = self.stack
+        b = stack.pop()
+        a = stack.pop()
+        if b == 0:
+            raise VMError("Division by zero")
+        stack.append(a / b)
+
+    def op_mod(self, operand):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] = stack[-1] % b
+
+    def op_pow(self, operand):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] = stack[-1] ** b
+
+    def op_neg(self, operand):
+        stack = self.stack
+        stack[-1] = -stack[-1]
+
+    def op_eq(self, operand):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] = stack[-1] == b
+
+    def op_ne(self, operand):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] = stack[-1] != b
+
+    def op_lt(self, operand):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] = stack[-1] < b
+
+    def op_gt(self, operand):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] = stack[-1] > b
+
+    def op_le(self, operand):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] = stack[-1] <= b
+
+    def op_ge(self, operand):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] = stack[-1] >= b
+
+    def op_and(self, operand):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] = stack[-1] and b
+
+    def op_or(self, operand):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] = stack[-1] or b
+
+    def op_not(self, operand):
+        stack = self.stack
+        stack[-1] = not stack[-1]
+
+    def op_jump(self, target):
+        self.current_frame.ip = target
+
+    def op_jump_if_false(self, target):
+        if not self.stack.pop():
+            self.current_frame.ip = target
+
+    def op_jump_if_true(self, target):
+        if self.stack.pop():
+            self.current_frame.ip = target
+
+    def op_jump_if_false_or_pop(self, target):
+        if self.stack[-1]:
+            self.stack.pop()
+        else:
+            self.current_frame.ip = target
+
+    def op_jump_if_true_or_pop(self, target):
+        if self.stack[-1]:
+            self.current_frame.ip = target
+        else:
+            self.stack.pop()
+
+    def op_jump_if_not_eq(self, target):
+        stack = self.stack
+        b = stack.pop()
+        if not (stack.pop() == b):
+            self.current_frame.ip = target
+
+    def op_jump_if_not_ne(self, target):
+        stack = self.stack
+        b = stack.pop()
+        if not (stack.pop() != b):
+            self.current_frame.ip = target
+
+    def op_jump_if_not_lt(self, target):
+        stack = self.stack
+        b = stack.pop()
+        if not (stack.pop() < b):
+            self.current_frame.ip = target
+
+    def op_jump_if_not_gt(self, target):
+        stack = self.stack
+        b = stack.pop()
+        if not (stack.pop() > b):
+            self.current_frame.ip = target
+
+    def op_jump_if_not_le(self, target):
+        stack = self.stack
+        b = stack.pop()
+        if not (stack.pop() <= b):
+            self.current_frame.ip = target
+
+    def op_jump_if_not_ge(self, target):
+        stack = self.stack
+        b = stack.pop()
+        if not (stack.pop() >= b):
+            self.current_frame.ip = target
+
+    def op_call(self, operand):
+        func_name, arg_count = operand
+        stack = self.stack
+
+        # Pop arguments from stack
+        if arg_count:
+            args = stack[-arg_count:]
+            del stack[-arg_count:]
+        else:
+            args = []
+
+        builtin = BUILTINS.get(func_name)
+        if builtin is not None:
+            stack.append(builtin(*args))
+            return
+
+        called_func = self.module.functions.get(func_name)
+        if called_func is None:
+            raise VMError(f"Undefined function: {func_name}")
+
+        new_frame = self.new_frame(called_func, self.current_frame.ip, args)
+        self.call_stack.append(new_frame)
+        self.current_frame = new_frame
+        return True
+
+    def op_tail_call(self, operand):
+        func_name, arg_count = operand
+        stack = self.stack
+
+        if arg_count:
+            args = stack[-arg_count:]
+            del stack[-arg_count:]
+        else:
+            args = []
+
+        builtin = BUILTINS.get(func_name)
+        if builtin is not None:
+            stack.append(builtin(*args))
+            return self.op_return(None)
+
+        called_func = self.module.functions.get(func_name)
+        if called_func is None:
+            raise VMError(f"Undefined function: {func_name}")
+
+        # Reuse the current frame: the caller's locals are dead after a tail call
+        self.bind_frame(self.current_frame, called_func, args)
+        return True
+
+    def op_return(self, operand):
+        return_value = self.stack.pop() if self.stack else None
+
+        call_stack = self.call_stack
+        call_stack.pop()
+
+        if call_stack:
+            self.current_frame = call_stack[-1]
+        else:
+            # No more frames - program done
+            self.halted = True
+
+        if return_value is not None:
+            self.stack.append(return_value)
+        return True
+
+    def op_halt(self, operand):
+        self.halted = True
+        return True
+
+    def op_build_list(self, count):
+        stack = self.stack
+        if count:
+            elements = stack[-count:]
+            del stack[-count:]
+        else:
+            elements = []
+        stack.append(PVector.from_iterable(elements))
+
+    def op_index(self, operand):
+        index = self.stack.pop()
+        obj = self.stack.pop()
+
+        if isinstance(obj, (PVector, list)):
+            if not isinstance(index, int):
+                raise VMError(f"List index must be integer, got {type(index)}")
+            if index < 0 or index >= len(obj):
+                raise VMError(f"List index out of range: {index}")
+            self.stack.append(obj[index])
+        elif isinstance(obj, (str, Rope)):
+            if not isinstance(index, int):
+                raise VMError(f"String index must be integer, got {type(index)}")
+            if index < 0 or index >= len(obj):
+                raise VMError(f"String index out of range: {index}")
+            self.stack.append(obj[index])
+        else:
+            raise VMError(f"Cannot index type {type(obj)}")
+
+    # Type-specialized handlers. The checker does not check call arguments,
+    # so a parameter can hold a value of another type than it declares: each
+    # handler makes one type() test and otherwise runs the generic handler.
+
+    def op_add_int(self, operand):
+        stack = self.stack
+        b = stack[-1]
+        a = stack[-2]
+        if type(a) is int and type(b) is int:
+            stack.pop()
+            stack[-1] = a + b
+        else:
+            self.op_add(operand)
+
+    def op_add_float(self, operand):
+        stack = self.stack
+        b = stack[-1]
+        a = stack[-2]
+        if type(a) in NUMBER_TYPES and type(b) in NUMBER_TYPES:
+            stack.pop()
+            stack[-1] = a + b
+        else:
+            self.op_add(operand)
+
+    def op_concat_str(self, operand):
+        stack = self.stack
+        b = stack[-1]
+        a = stack[-2]
+        if type(a) in STRING_TYPES and type(b) in STRING_TYPES:
+            stack.pop()
+            stack[-1] = concat(a, b)
+        else:
+            self.op_add(operand)
+
+    def op_index_str(self, operand):
+        stack = self.stack
+        index = stack[-1]
+        text = stack[-2]
+        if type(index) is int and type(text) in STRING_TYPES and 0 <= index < len(text):
+            stack.pop()
+            stack[-1] = text[index]
+        else:
+            self.op_index(operand)  # Also raises the out-of-range error
+
+    def op_index_list(self, operand):
+        stack = self.stack
+        index = stack[-1]
+        items = stack[-2]
+        if type(index) is int and type(items) in LIST_TYPES and 0 <= index < len(items):
+            stack.pop()
+            stack[-1] = items[index]
+        else:
+            self.op_index(operand)
+
+    def op_print(self, operand):
+        print(self.stack.pop(), end='')
+        self.stack.append(None)  # print returns None
+
+    def op_println(self, operand):
+        print(self.stack.pop())
+        self.stack.append(None)  # println returns None
 
     def dump_state(self):
         """Dump VM state for debugging"""
@@ -313,15 +845,16 @@ class VM:
             print(f"\nCurrent frame:")
             print(f"  Function: {self.current_frame.function.name}")
             print(f"  IP: {self.current_frame.ip}")
-            print(f"  Locals: {self.current_frame.locals}")
+            print(f"  Locals: {self.current_frame.named_locals()}")
 
         print("\nGlobals:", self.globals)
         print("================\n")
 
 
-def run_bytecode(module: BytecodeModule, entry_point: str = "main", debug: bool = False) -> Any:
+def run_bytecode(module: BytecodeModule, entry_point: str = "main", debug: bool = False,
+                 engine: str = "table") -> Any:
     """Run bytecode module"""
-    vm = VM(module)
+    vm = VM(module, engine=engine)
 
     if debug:
         print("=== Starting execution ===")